@@ -0,0 +1,108 @@
+"""
+Compare memory usage and construction time of schedule records and pydantic schedule models
+for a synthetic five week FSC schedule.
+
+    python benchmarks/schedule_records.py
+"""
+import gc
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Callable
+
+from rezervo.providers.brpsystems.schema import (
+    BrpClass,
+    BrpSubdomain,
+    brp_schedule_record_from_raw,
+    rezervo_class_from_brp_class,
+)
+
+WEEKS = 5
+CLASSES_PER_DAY = 60
+REPEATS = 5
+
+
+def brp_date_str(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z"
+
+
+def generate_raw_schedule() -> list[dict[str, Any]]:
+    start_date = datetime(2023, 9, 4, 6)
+    items = []
+    for day in range(WEEKS * 7):
+        for i in range(CLASSES_PER_DAY):
+            start = start_date + timedelta(days=day, minutes=15 * i)
+            items.append(
+                {
+                    "id": day * CLASSES_PER_DAY + i,
+                    "name": f"Class {i}",
+                    "duration": {
+                        "start": brp_date_str(start),
+                        "end": brp_date_str(start + timedelta(minutes=50)),
+                    },
+                    "groupActivityProduct": {"id": i % 40, "name": f"Activity {i}"},
+                    "businessUnit": {
+                        "id": 2,
+                        "name": "Fysio- og Styrkesenter",
+                        "location": "Trondheim",
+                        "companyNameForInvoice": "FSC",
+                    },
+                    "locations": [{"id": 1, "name": "Sal 1"}],
+                    "instructors": [
+                        {"id": 1, "name": "Instructor", "isSubstitute": False}
+                    ],
+                    "bookableEarliest": brp_date_str(start - timedelta(days=2)),
+                    "bookableLatest": brp_date_str(start - timedelta(minutes=5)),
+                    "externalMessage": None,
+                    "internalMessage": None,
+                    "cancelled": False,
+                    "slots": {
+                        "total": 30,
+                        "totalBookable": 28,
+                        "reservedForDropin": 2,
+                        "leftToBook": 10,
+                        "leftToBookIncDropin": 12,
+                        "hasWaitingList": True,
+                        "inWaitingList": 0,
+                    },
+                }
+            )
+    return items
+
+
+def build_models(items: list[dict[str, Any]]) -> list[Any]:
+    return [
+        rezervo_class_from_brp_class(BrpSubdomain.FSC, BrpClass(**item))
+        for item in items
+    ]
+
+
+def build_records(items: list[dict[str, Any]]) -> list[Any]:
+    return [brp_schedule_record_from_raw(BrpSubdomain.FSC, item) for item in items]
+
+
+def retained_bytes(build: Callable[[list[dict[str, Any]]], list[Any]], items) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build(items)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def benchmark():
+    items = generate_raw_schedule()
+    print(f"{len(items)} classes ({WEEKS} weeks, {CLASSES_PER_DAY} classes per day)")
+    for name, build in [
+        ("pydantic models", build_models),
+        ("schedule records", build_records),
+    ]:
+        seconds = min(timeit.repeat(partial(build, items), number=1, repeat=REPEATS))
+        size = retained_bytes(build, items)
+        print(f"{name:>16}: {seconds * 1000:8.1f} ms, {size / 1024:8.1f} KiB retained")
+
+
+if __name__ == "__main__":
+    benchmark()
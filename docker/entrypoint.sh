@@ -9,8 +9,12 @@ tail -f /var/log/rezervo.log &
 echo "Migrating database to most recent alembic version"
 (cd rezervo && alembic upgrade head)
 
+rezervo schedule sync
+
 rezervo sessions pull
 
+rezervo cron schedulejob
+
 rezervo cron sessionsjob
 
 rezervo cron refresh
@@ -18,5 +22,10 @@ rezervo cron refresh
 echo "Starting cron service..."
 cron
 
+if [ "${BOOKING_SCHEDULER_ENABLED,,}" = "true" ]; then
+  echo "Starting booking scheduler..."
+  rezervo scheduler >> /var/log/rezervo.log 2>&1 &
+fi
+
 echo "Starting server..."
 rezervo api "$@"
\ No newline at end of file
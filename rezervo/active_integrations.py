@@ -1,22 +1,39 @@
 from rezervo.providers.active import get_provider
 from rezervo.providers.brpsystems.schema import BrpSubdomain
 from rezervo.providers.ibooking.schema import IBookingDomain
+from rezervo.providers.provider import async_provider_from_provider
 from rezervo.schemas.config.user import IntegrationIdentifier, ProviderIdentifier
 
+BRP_BUSINESS_UNITS = {
+    BrpSubdomain.FSC: 8,
+    BrpSubdomain.TTT: 1,
+}
+
 ACTIVE_INTEGRATIONS = {
     IntegrationIdentifier.SIT: get_provider(ProviderIdentifier.IBOOKING)(
         IBookingDomain.SIT
     ),
     IntegrationIdentifier.FSC: get_provider(ProviderIdentifier.BRP)(
-        BrpSubdomain.FSC, 8
+        BrpSubdomain.FSC, BRP_BUSINESS_UNITS[BrpSubdomain.FSC]
     ),
     IntegrationIdentifier.TTT: get_provider(ProviderIdentifier.BRP)(
-        BrpSubdomain.TTT, 1
+        BrpSubdomain.TTT, BRP_BUSINESS_UNITS[BrpSubdomain.TTT]
     ),
 }
 
+ACTIVE_ASYNC_INTEGRATIONS = {
+    integration: async_provider_from_provider(provider)
+    for integration, provider in ACTIVE_INTEGRATIONS.items()
+}
+
 
 def get_integration(integration: IntegrationIdentifier):
     if integration not in ACTIVE_INTEGRATIONS:
         raise ValueError(f"Integration {integration} is not active.")
     return ACTIVE_INTEGRATIONS[integration]
+
+
+def get_async_integration(integration: IntegrationIdentifier):
+    if integration not in ACTIVE_ASYNC_INTEGRATIONS:
+        raise ValueError(f"Integration {integration} is not active.")
+    return ACTIVE_ASYNC_INTEGRATIONS[integration]
@@ -10,6 +10,7 @@ from rezervo.api import (
     preferences,
     sessions,
     slack,
+    stats,
 )
 from rezervo.api.notifications import push
 
@@ -22,3 +23,4 @@ api.include_router(sessions.router, tags=["sessions"])
 api.include_router(cal.router, tags=["calendar"])
 api.include_router(slack.router, tags=["slack"])
 api.include_router(features.router, tags=["features"])
+api.include_router(stats.router, tags=["stats"])
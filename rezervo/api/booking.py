@@ -1,4 +1,8 @@
+from typing import Optional, Union
+from uuid import UUID
+
 from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from starlette import status
 from starlette.responses import Response
@@ -6,43 +10,69 @@ from starlette.responses import Response
 from rezervo.api.common import get_db, token_auth_scheme
 from rezervo.database import crud
 from rezervo.errors import AuthenticationError, BookingError
+from rezervo.models import SessionState
 from rezervo.providers.common import (
-    book_class,
-    cancel_booking,
-    find_authed_class_by_id,
+    book_class_async,
+    cancel_booking_async,
+    find_authed_class_by_id_async,
 )
 from rezervo.schemas.booking import BookingCancellationPayload, BookingPayload
-from rezervo.schemas.config.user import IntegrationIdentifier
-from rezervo.sessions import pull_sessions
+from rezervo.schemas.config.config import ConfigValue
+from rezervo.schemas.config.user import IntegrationIdentifier, IntegrationUser
+from rezervo.schemas.schedule import RezervoClass
+from rezervo.sessions import pull_integration_sessions_async
 from rezervo.settings import Settings, get_settings
 from rezervo.utils.logging_utils import err
 
 router = APIRouter()
 
 
+def get_booking_user(
+    db: Session, settings: Settings, token, integration: IntegrationIdentifier
+) -> Optional[tuple[UUID, IntegrationUser, ConfigValue]]:
+    print("Authenticating rezervo user...")
+    db_user = crud.user_from_token(db, settings, token)
+    if db_user is None:
+        return None
+    integration_user = crud.get_integration_user(db, integration, db_user.id)
+    if integration_user is None:
+        err.log(f"No {integration} user for given user id, aborted booking.")
+        return None
+    return db_user.id, integration_user, crud.get_user_config(db, db_user).config
+
+
+def get_booked_session_class(
+    db: Session, integration: IntegrationIdentifier, user_id: UUID, class_id: str
+) -> Optional[RezervoClass]:
+    user_session = crud.get_user_session(db, integration, user_id, class_id)
+    if user_session is None or user_session.status not in [
+        SessionState.BOOKED,
+        SessionState.WAITLIST,
+    ]:
+        return None
+    return user_session.class_data
+
+
 @router.post("/{integration}/book")
-def book_class_api(
+async def book_class_api(
     integration: IntegrationIdentifier,
     payload: BookingPayload,
     token=Depends(token_auth_scheme),
     db: Session = Depends(get_db),
     settings: Settings = Depends(get_settings),
 ):
-    print("Authenticating rezervo user...")
-    db_user = crud.user_from_token(db, settings, token)
-    if db_user is None:
-        return Response(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-        )
-    integration_user = crud.get_integration_user(db, integration, db_user.id)
-    if integration_user is None:
-        err.log(f"No {integration} user for given user id, aborted booking.")
+    booking_user = await run_in_threadpool(
+        get_booking_user, db, settings, token, integration
+    )
+    if booking_user is None:
         return Response(
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
-    config = crud.get_user_config(db, db_user).config
+    user_id, integration_user, config = booking_user
     print("Searching for class...")
-    _class = find_authed_class_by_id(integration_user, config, payload.class_id)
+    _class = await find_authed_class_by_id_async(
+        integration_user, config, payload.class_id
+    )
     match _class:
         case AuthenticationError():
             return Response(
@@ -51,50 +81,59 @@ def book_class_api(
         case BookingError():
             return Response(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     print("Booking class...")
-    booking_result = book_class(integration_user, _class, config)
+    booking_result = await book_class_async(integration_user, _class, config)
     match booking_result:
         case AuthenticationError():
             return Response(
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
+        case BookingError.CLASS_FULL:
+            return Response(status_code=status.HTTP_409_CONFLICT)
         case BookingError():
             return Response(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     # Pulling in foreground to have sessions up-to-date once the response is sent
-    pull_sessions(integration, db_user.id)
+    await pull_integration_sessions_async(integration, user_id)
 
 
 @router.post("/{integration}/cancel-booking")
-def cancel_booking_api(
+async def cancel_booking_api(
     integration: IntegrationIdentifier,
     payload: BookingCancellationPayload,
     token=Depends(token_auth_scheme),
     db: Session = Depends(get_db),
     settings: Settings = Depends(get_settings),
 ):
-    print("Authenticating rezervo user...")
-    db_user = crud.user_from_token(db, settings, token)
-    if db_user is None:
+    booking_user = await run_in_threadpool(
+        get_booking_user, db, settings, token, integration
+    )
+    if booking_user is None:
         return Response(
             status_code=status.HTTP_401_UNAUTHORIZED,
         )
-    integration_user = crud.get_integration_user(db, integration, db_user.id)
-    if integration_user is None:
-        err.log(f"No {integration} user for given user id, aborted booking.")
-        return Response(
-            status_code=status.HTTP_401_UNAUTHORIZED,
+    user_id, integration_user, config = booking_user
+    # the class of a booked session is already stored, so searching for it can be skipped
+    stored_class = await run_in_threadpool(
+        get_booked_session_class, db, integration, user_id, payload.class_id
+    )
+    _class: RezervoClass
+    if stored_class is not None:
+        _class = stored_class
+    else:
+        print("Searching for class...")
+        class_search_result: Union[
+            RezervoClass, BookingError, AuthenticationError
+        ] = await find_authed_class_by_id_async(
+            integration_user, config, payload.class_id
         )
-    config = crud.get_user_config(db, db_user).config
-    print("Searching for class...")
-    _class = find_authed_class_by_id(integration_user, config, payload.class_id)
-    match _class:
-        case AuthenticationError():
+        if isinstance(class_search_result, AuthenticationError):
             return Response(
                 status_code=status.HTTP_401_UNAUTHORIZED,
             )
-        case BookingError():
+        if isinstance(class_search_result, BookingError):
             return Response(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        _class = class_search_result
     print("Cancelling booking...")
-    cancellation_res = cancel_booking(integration_user, _class, config)
+    cancellation_res = await cancel_booking_async(integration_user, _class, config)
     match cancellation_res:
         case AuthenticationError():
             return Response(
@@ -103,4 +142,4 @@ def cancel_booking_api(
         case BookingError():
             return Response(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     # Pulling in foreground to have sessions up-to-date once the response is sent
-    pull_sessions(integration, db_user.id)
+    await pull_integration_sessions_async(integration, user_id)
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from starlette import status
+
+from rezervo.api.common import get_db, token_auth_scheme
+from rezervo.database import crud
+from rezervo.schemas.booking import BookingLatencyStats
+from rezervo.schemas.config.admin import AdminConfig
+from rezervo.settings import Settings, get_settings
+
+router = APIRouter()
+
+
+@router.get("/stats/booking", response_model=list[BookingLatencyStats])
+def get_booking_stats(
+    days: int = 30,
+    token=Depends(token_auth_scheme),
+    db: Session = Depends(get_db),
+    settings: Settings = Depends(get_settings),
+):
+    db_user = crud.user_from_token(db, settings, token)
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if not AdminConfig(**db_user.admin_config).is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    return crud.get_booking_latency_stats(
+        db, datetime.now().astimezone() - timedelta(days=days)
+    )
@@ -0,0 +1,405 @@
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Union
+from uuid import UUID
+
+from rezervo.consts import (
+    BOOKING_AUTH_MIN_VALIDITY_SECONDS,
+    BOOKING_PREPARE_SECONDS_BEFORE_OPENING,
+)
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.notify.notify import notify_auth_failure, notify_booking_failure
+from rezervo.providers.common import (
+    authenticate_booking,
+    find_class,
+    prepare_booking,
+)
+from rezervo.providers.helpers import keep_warm_until, send_prepared_booking
+from rezervo.providers.provider import BookingAuth, PreparedBooking
+from rezervo.schemas.booking import BOOKED_OUTCOME, BookingTimeline
+from rezervo.schemas.config.config import ConfigValue
+from rezervo.schemas.config.user import (
+    Class,
+    IntegrationIdentifier,
+    IntegrationUser,
+)
+from rezervo.schemas.schedule import RezervoClass
+from rezervo.sessions import pull_sessions
+from rezervo.utils.logging_utils import err, stat
+from rezervo.utils.time_utils import (
+    monotonic_ns_at,
+    readable_seconds,
+    sleep_until_monotonic_ns,
+)
+
+
+def authenticate_for_booking(
+    integration_user: IntegrationUser,
+    config: ConfigValue,
+    check_run: bool,
+    timeline: Optional[BookingTimeline] = None,
+) -> Union[BookingAuth, AuthenticationError]:
+    with stat("Authenticating..."):
+        booking_auth = authenticate_booking(integration_user, config)
+    if isinstance(booking_auth, AuthenticationError):
+        if config.notifications is not None:
+            notified = notify_auth_failure(
+                config.notifications, booking_auth, check_run
+            )
+            if timeline is not None:
+                record_notification(timeline, notified)
+    return booking_auth
+
+
+def record_notification(timeline: BookingTimeline, notified: bool):
+    if notified:
+        timeline.notified_at = datetime.now().astimezone()
+
+
+def save_booking_timeline(
+    timeline: BookingTimeline,
+    result: Union[None, BookingError, AuthenticationError],
+):
+    timeline.outcome = BOOKED_OUTCOME if result is None else result.name
+    try:
+        with SessionLocal() as db:
+            crud.add_booking_timeline(db, timeline)
+    except Exception as e:
+        err.log("Failed to save booking timeline", e)
+
+
+@dataclass
+class PendingBooking:
+    integration_user: IntegrationUser
+    config: ConfigValue
+    class_config: Class
+    _class: RezervoClass
+    timeline: BookingTimeline
+    booking_auth: Optional[BookingAuth] = None
+
+
+def load_pending_booking(
+    integration: IntegrationIdentifier,
+    user_id: UUID,
+    class_id: int,
+    check_run: bool = False,
+) -> Optional[PendingBooking]:
+    """
+    Load the config of the user and find the class with config index matching the given
+    class id, notifying the user of any failure
+    """
+    timeline = BookingTimeline(
+        user_id=user_id,
+        integration=integration,
+        started_at=datetime.now().astimezone(),
+    )
+
+    def fail(error: Union[BookingError, AuthenticationError]):
+        if not check_run:
+            save_booking_timeline(timeline, error)
+
+    with stat("Loading config..."):
+        with SessionLocal() as db:
+            user_config = crud.get_user_config_by_id(db, user_id)
+            integration_user = crud.get_integration_user(db, integration, user_id)
+        if user_config is None:
+            err.log("Failed to load config, aborted.")
+            fail(BookingError.INVALID_CONFIG)
+            return None
+        config = user_config.config
+        timeline.config_loaded_at = datetime.now().astimezone()
+        if integration_user is None:
+            err.log(f"No {integration} user for given user id, aborted booking.")
+            if config.notifications is not None:
+                record_notification(
+                    timeline,
+                    notify_auth_failure(
+                        config.notifications,
+                        error=AuthenticationError.ERROR,
+                        check_run=check_run,
+                    ),
+                )
+            fail(AuthenticationError.ERROR)
+            return None
+    if integration_user.classes is None or not 0 <= class_id < len(
+        integration_user.classes
+    ):
+        err.log("Class index out of bounds")
+        fail(BookingError.INVALID_CONFIG)
+        return None
+    _class_config = integration_user.classes[class_id]
+    if config.booking.max_attempts < 1:
+        err.log("Max booking attempts should be a positive number")
+        if config.notifications is not None:
+            record_notification(
+                timeline,
+                notify_booking_failure(
+                    config.notifications,
+                    _class_config,
+                    BookingError.INVALID_CONFIG,
+                    check_run,
+                ),
+            )
+        fail(BookingError.INVALID_CONFIG)
+        return None
+    with stat("Searching for class..."):
+        class_search_result = find_class(integration, _class_config)
+        if isinstance(class_search_result, AuthenticationError):
+            err.log("Abort!")
+            if config.notifications is not None:
+                record_notification(
+                    timeline,
+                    notify_auth_failure(
+                        config.notifications, class_search_result, check_run
+                    ),
+                )
+            fail(class_search_result)
+            return None
+        if isinstance(class_search_result, BookingError):
+            err.log("Abort!")
+            if config.notifications is not None:
+                record_notification(
+                    timeline,
+                    notify_booking_failure(
+                        config.notifications,
+                        _class_config,
+                        class_search_result,
+                        check_run,
+                    ),
+                )
+            fail(class_search_result)
+            return None
+    timeline.class_found_at = datetime.now().astimezone()
+    timeline.class_id = str(class_search_result.id)
+    timeline.opening_time = datetime.fromisoformat(class_search_result.bookingOpensAt)
+    return PendingBooking(
+        integration_user, config, _class_config, class_search_result, timeline
+    )
+
+
+def is_within_max_waiting_time(pending_booking: PendingBooking) -> bool:
+    config = pending_booking.config
+    opening_time = datetime.fromisoformat(pending_booking._class.bookingOpensAt)
+    delta_to_opening = opening_time - datetime.now().astimezone()
+    wait_time = delta_to_opening.total_seconds()
+    wait_time_string = readable_seconds(wait_time)
+    if wait_time > config.booking.max_waiting_minutes * 60:
+        err.log(
+            f"Booking waiting time was {wait_time_string}, "
+            f"but max is {config.booking.max_waiting_minutes} minutes. Aborting."
+        )
+        if config.notifications is not None:
+            record_notification(
+                pending_booking.timeline,
+                notify_booking_failure(
+                    config.notifications,
+                    pending_booking.class_config,
+                    BookingError.TOO_LONG_WAITING_TIME,
+                ),
+            )
+        return False
+    print(
+        f"Scheduling booking at {datetime.now().astimezone() + delta_to_opening} "
+        f"(about {wait_time_string} from now)"
+    )
+    return True
+
+
+def opening_deadline_ns(pending_booking: PendingBooking, opening_time: datetime) -> int:
+    return monotonic_ns_at(
+        opening_time
+        + timedelta(milliseconds=pending_booking.config.booking.opening_offset_ms)
+    )
+
+
+def book_pending(pending_bookings: list[PendingBooking]) -> list[bool]:
+    """
+    Book the same class for one or more users. Users are authenticated right away, and all
+    bookings are sent concurrently at opening over warmed up connections.
+
+    Returns whether the class was booked, for each user
+    """
+    _class = pending_bookings[0]._class
+    opening_time = datetime.fromisoformat(_class.bookingOpensAt)
+    if _class.bookable:
+        print("Booking is already open, booking now!")
+    authenticated = []
+    for p in pending_bookings:
+        if not _class.bookable and not is_within_max_waiting_time(p):
+            save_booking_timeline(p.timeline, BookingError.TOO_LONG_WAITING_TIME)
+            continue
+        booking_auth = authenticate_for_booking(
+            p.integration_user, p.config, False, p.timeline
+        )
+        if isinstance(booking_auth, AuthenticationError):
+            save_booking_timeline(p.timeline, booking_auth)
+            continue
+        p.timeline.authenticated_at = datetime.now().astimezone()
+        p.booking_auth = booking_auth
+        authenticated.append(p)
+    if len(authenticated) == 0:
+        return [False for _ in pending_bookings]
+    if not _class.bookable:
+        sleep_until_monotonic_ns(
+            min(opening_deadline_ns(p, opening_time) for p in authenticated)
+            - BOOKING_PREPARE_SECONDS_BEFORE_OPENING * 1_000_000_000
+        )
+    prepared: list[tuple[PendingBooking, PreparedBooking]] = []
+    for p in authenticated:
+        p.timeline.woke_up_at = datetime.now().astimezone()
+        if p.booking_auth is None or not p.booking_auth.is_valid_at(
+            opening_time + timedelta(seconds=BOOKING_AUTH_MIN_VALIDITY_SECONDS)
+        ):
+            print("Authentication expires before booking opens, re-authenticating...")
+            booking_auth = authenticate_for_booking(
+                p.integration_user, p.config, False, p.timeline
+            )
+            if isinstance(booking_auth, AuthenticationError):
+                save_booking_timeline(p.timeline, booking_auth)
+                continue
+            p.booking_auth = booking_auth
+        with stat("Preparing booking..."):
+            prepare_result = prepare_booking(
+                p.integration_user, p._class, p.config, p.booking_auth
+            )
+        if isinstance(prepare_result, BookingError):
+            if p.config.notifications is not None:
+                record_notification(
+                    p.timeline,
+                    notify_booking_failure(
+                        p.config.notifications, p.class_config, prepare_result
+                    ),
+                )
+            save_booking_timeline(p.timeline, prepare_result)
+            continue
+        prepared.append((p, prepare_result))
+    if len(prepared) == 0:
+        return [False for _ in pending_bookings]
+    deadlines_ns = [time.monotonic_ns() for _ in prepared]
+    if not _class.bookable:
+        first_prepared_booking = prepared[0][1]
+        booking_url = first_prepared_booking.request.url or ""
+        first_prepared_booking.client.sample_clock_skew(booking_url)
+        clock_skew = first_prepared_booking.client.clock_skew
+        print(clock_skew.describe())
+        clock_skew_seconds = clock_skew.offset_seconds()
+        for p, _ in prepared:
+            p.timeline.clock_skew_ms = (
+                round(clock_skew_seconds * 1000)
+                if clock_skew_seconds is not None
+                else None
+            )
+        deadlines_ns = [
+            opening_deadline_ns(p, clock_skew.local_time(opening_time))
+            for p, _ in prepared
+        ]
+        first_prepared_booking.client.warm_up_connections(booking_url, len(prepared))
+        keep_warm_until(first_prepared_booking, min(deadlines_ns), len(prepared))
+    if len(prepared) > 1:
+        print(f"Sending {len(prepared)} bookings concurrently")
+
+    def send(
+        pending_booking: PendingBooking,
+        prepared_booking: PreparedBooking,
+        deadline_ns: int,
+    ) -> tuple[Union[None, BookingError, AuthenticationError], int, int]:
+        sleep_until_monotonic_ns(deadline_ns)
+        sent_ns = time.monotonic_ns()
+        pending_booking.timeline.request_sent_at = datetime.now().astimezone()
+        result = send_prepared_booking(
+            prepared_booking, pending_booking.config.booking, pending_booking.timeline
+        )
+        return result, sent_ns - deadline_ns, time.monotonic_ns() - sent_ns
+
+    with ThreadPoolExecutor(
+        max_workers=len(prepared), thread_name_prefix="booking"
+    ) as executor:
+        sent = list(
+            executor.map(
+                send,
+                [p for p, _ in prepared],
+                [pb for _, pb in prepared],
+                deadlines_ns,
+            )
+        )
+    booked: set[int] = set()
+    for (p, _), (result, delay_ns, duration_ns) in zip(prepared, sent):
+        print(
+            f"Booking for {p.integration_user.user_id} "
+            + ("succeeded" if result is None else "failed")
+            + f" in {duration_ns / 1e6:.0f} ms"
+            + (
+                f", sent {delay_ns / 1e6:.3f} ms after target "
+                f"({p.config.booking.opening_offset_ms} ms from opening)"
+                if not _class.bookable
+                else ""
+            )
+        )
+        if isinstance(result, AuthenticationError):
+            if p.config.notifications is not None:
+                record_notification(
+                    p.timeline, notify_auth_failure(p.config.notifications, result)
+                )
+            save_booking_timeline(p.timeline, result)
+            continue
+        if isinstance(result, BookingError):
+            if p.config.notifications is not None:
+                record_notification(
+                    p.timeline,
+                    notify_booking_failure(
+                        p.config.notifications, p.class_config, result
+                    ),
+                )
+            save_booking_timeline(p.timeline, result)
+            continue
+        save_booking_timeline(p.timeline, None)
+        booked.add(id(p))
+        with stat("Pulling sessions..."):
+            pull_sessions(p.integration_user.integration, p.integration_user.user_id)
+    return [id(p) in booked for p in pending_bookings]
+
+
+def book_configured_class(
+    integration: IntegrationIdentifier,
+    user_id: UUID,
+    class_id: int,
+    check_run: bool = False,
+) -> bool:
+    """
+    Book the class with config index matching the given class id, waiting for booking to
+    open if necessary.
+
+    Returns whether the class was booked (or, for check runs, whether booking is possible)
+    """
+    pending_booking = load_pending_booking(integration, user_id, class_id, check_run)
+    if pending_booking is None:
+        return False
+    if check_run:
+        print("Check complete, all seems fine.")
+        return True
+    return book_pending([pending_booking])[0]
+
+
+def book_configured_classes(
+    integration: IntegrationIdentifier, bookings: list[tuple[UUID, int]]
+):
+    """
+    Book classes for multiple users (given as user ids and class config indices), booking
+    users of the same class together
+    """
+    groups: dict[tuple[str, str], list[PendingBooking]] = defaultdict(list)
+    for user_id, class_id in bookings:
+        pending_booking = load_pending_booking(integration, user_id, class_id)
+        if pending_booking is not None:
+            groups[
+                (str(pending_booking._class.id), pending_booking._class.bookingOpensAt)
+            ].append(pending_booking)
+    with ThreadPoolExecutor(
+        max_workers=max(1, len(groups)), thread_name_prefix="booking-group"
+    ) as executor:
+        list(executor.map(book_pending, groups.values()))
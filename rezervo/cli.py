@@ -1,5 +1,6 @@
-import time
-from datetime import datetime
+import signal
+from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Optional
 from uuid import UUID
 
@@ -7,19 +8,29 @@ import typer
 import uvicorn
 from crontab import CronItem, CronTab
 from rich import print as rprint
+from rich.table import Table
 
 from rezervo import models
 from rezervo.api import api
+from rezervo.booking import book_configured_class
 from rezervo.consts import (
     CRON_PULL_SESSIONS_JOB_COMMENT,
     CRON_PULL_SESSIONS_SCHEDULE,
+    CRON_SYNC_SCHEDULE_JOB_COMMENT,
+    CRON_SYNC_SCHEDULE_SCHEDULE,
 )
 from rezervo.cron import refresh_cron
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
-from rezervo.errors import AuthenticationError, BookingError
-from rezervo.notify.notify import notify_auth_failure, notify_booking_failure
-from rezervo.providers.common import book_class, find_class
+from rezervo.fake_upstream.fixtures import (
+    load_fixtures,
+    record_fixtures,
+    write_fixtures,
+)
+from rezervo.fake_upstream.server import FakeUpstreamConfig, create_fake_upstream_app
+from rezervo.providers.schedule_cache import log_schedule_cache_stats
+from rezervo.schedule import sync_schedules
+from rezervo.scheduler import BookingScheduler
 from rezervo.schemas.config.config import (
     read_app_config,
 )
@@ -32,9 +43,9 @@ from rezervo.settings import get_settings
 from rezervo.utils.cron_utils import (
     delete_booking_crontab,
     generate_pull_sessions_command,
+    generate_sync_schedule_command,
 )
 from rezervo.utils.logging_utils import err, stat
-from rezervo.utils.time_utils import readable_seconds
 
 cli = typer.Typer()
 users_cli = typer.Typer()
@@ -43,6 +54,12 @@ cron_cli = typer.Typer()
 cli.add_typer(cron_cli, name="cron")
 sessions_cli = typer.Typer()
 cli.add_typer(sessions_cli, name="sessions")
+schedule_cli = typer.Typer()
+cli.add_typer(schedule_cli, name="schedule")
+fake_upstream_cli = typer.Typer()
+cli.add_typer(fake_upstream_cli, name="fake-upstream")
+stats_cli = typer.Typer()
+cli.add_typer(stats_cli, name="stats")
 
 
 @cli.command()
@@ -57,98 +74,24 @@ def book(
     """
     Book the class with config index matching the given class id
     """
-    with stat("Loading config..."):
-        with SessionLocal() as db:
-            user_config = crud.get_user_config_by_id(db, user_id)
-            integration_user = crud.get_integration_user(db, integration, user_id)
-        if user_config is None:
-            err.log("Failed to load config, aborted.")
-            return
-        config = user_config.config
-        if integration_user is None:
-            err.log(f"No {integration} user for given user id, aborted booking.")
-            if config.notifications is not None:
-                notify_auth_failure(
-                    config.notifications,
-                    error=AuthenticationError.ERROR,
-                    check_run=check_run,
-                )
-            return
-    if integration_user.classes is None or not 0 <= class_id < len(
-        integration_user.classes
-    ):
-        err.log("Class index out of bounds")
-        return
-    _class_config = integration_user.classes[class_id]
-    if config.booking.max_attempts < 1:
-        err.log("Max booking attempts should be a positive number")
-        if config.notifications is not None:
-            notify_booking_failure(
-                config.notifications,
-                _class_config,
-                BookingError.INVALID_CONFIG,
-                check_run,
-            )
-        return
-    with stat("Searching for class..."):
-        class_search_result = find_class(integration, _class_config)
-        if isinstance(class_search_result, AuthenticationError):
-            err.log("Abort!")
-            if config.notifications is not None:
-                notify_auth_failure(
-                    config.notifications, class_search_result, check_run
-                )
-            return
-        if isinstance(class_search_result, BookingError):
-            err.log("Abort!")
-            if config.notifications is not None:
-                notify_booking_failure(
-                    config.notifications, _class_config, class_search_result, check_run
-                )
-            return
-    if check_run:
-        print("Check complete, all seems fine.")
-        raise typer.Exit()
-    _class = class_search_result
-    if _class.bookable:
-        print("Booking is already open, booking now!")
-    else:
-        opening_time = datetime.fromisoformat(_class.bookingOpensAt)
-        delta_to_opening = opening_time - datetime.now().astimezone()
-        wait_time = delta_to_opening.total_seconds()
-        wait_time_string = readable_seconds(wait_time)
-        if wait_time > config.booking.max_waiting_minutes * 60:
-            err.log(
-                f"Booking waiting time was {wait_time_string}, "
-                f"but max is {config.booking.max_waiting_minutes} minutes. Aborting."
-            )
-            if config.notifications is not None:
-                notify_booking_failure(
-                    config.notifications,
-                    _class_config,
-                    BookingError.TOO_LONG_WAITING_TIME,
-                )
-            raise typer.Exit(1)
-        print(
-            f"Scheduling booking at {datetime.now().astimezone() + delta_to_opening} "
-            f"(about {wait_time_string} from now)"
-        )
-        time.sleep(wait_time)
-        print(f"Awoke at {datetime.now().astimezone()}")
-    with stat("Booking class..."):
-        booking_result = book_class(integration_user, _class, config)
-    if isinstance(booking_result, AuthenticationError):
-        if config.notifications is not None:
-            notify_auth_failure(config.notifications, booking_result, check_run)
+    if not book_configured_class(integration, user_id, class_id, check_run):
         raise typer.Exit(1)
-    if isinstance(booking_result, BookingError):
-        if config.notifications is not None:
-            notify_booking_failure(
-                config.notifications, _class_config, booking_result, check_run
-            )
-        raise typer.Exit(1)
-    with stat("Pulling sessions..."):
-        pull_sessions(integration, user_id)
+
+
+@cli.command()
+def scheduler():
+    """
+    Run a long-lived scheduler booking all configured classes, instead of per-class cron jobs
+
+    Config changes are picked up within a minute. Send SIGHUP to resolve classes against the
+    schedule immediately, e.g. after schedule changes.
+    """
+    booking_scheduler = BookingScheduler()
+    signal.signal(signal.SIGHUP, lambda *_: booking_scheduler.reload())
+    try:
+        booking_scheduler.run()
+    except KeyboardInterrupt:
+        booking_scheduler.stop()
 
 
 @cli.command(
@@ -185,6 +128,23 @@ def create_cron_sessions_job():
     rprint("✔ Cronjob created for sessions pulling")
 
 
+@cron_cli.command(name="schedulejob")
+def create_cron_schedule_job():
+    comment = (
+        f"{get_settings().CRON_JOB_COMMENT_PREFIX} [{CRON_SYNC_SCHEDULE_JOB_COMMENT}]"
+    )
+    j = CronItem(
+        command=generate_sync_schedule_command(read_app_config().cron),
+        comment=comment,
+        pre_comment=True,
+    )
+    j.setall(CRON_SYNC_SCHEDULE_SCHEDULE)
+    with CronTab(user=True) as crontab:
+        crontab.remove_all(comment=comment)
+        crontab.append(j)
+    rprint("✔ Cronjob created for schedule syncing")
+
+
 @cron_cli.command(name="refresh")
 def refresh_cron_cli():
     refresh_cron()
@@ -195,9 +155,10 @@ def create_user(
     name: str,
     jwt_sub: str,
     slack_id: Optional[str] = typer.Option(None),
+    admin: bool = typer.Option(False, help="Grant access to instance-wide statistics"),
 ):
     with SessionLocal() as db:
-        db_user = crud.create_user(db, name, jwt_sub, slack_id)
+        db_user = crud.create_user(db, name, jwt_sub, slack_id, admin)
         rprint(f"User '{db_user.name}' created")
 
 
@@ -234,6 +195,98 @@ def delete_user(user_id: UUID):
 def pull_sessions_cli():
     with stat("Pulling user sessions..."):
         pull_sessions()
+    log_schedule_cache_stats()
+
+
+@schedule_cli.command(name="sync")
+def sync_schedule_cli(
+    integration: Optional[IntegrationIdentifier] = typer.Argument(None),
+):
+    with stat("Syncing class schedules..."):
+        sync_schedules(integration)
+    log_schedule_cache_stats()
+
+
+@stats_cli.command(name="booking")
+def booking_stats_cli(
+    days: int = typer.Option(30, help="Include bookings of the last days")
+):
+    """
+    Show percentiles of booking request send delay (from opening) and response time
+    """
+    with SessionLocal() as db:
+        stats = crud.get_booking_latency_stats(
+            db, datetime.now().astimezone() - timedelta(days=days)
+        )
+    table = Table(title=f"Booking latencies (ms) last {days} days")
+    for column in ["Integration", "Runs", "Booked"] + [
+        f"{m} {p}" for m in ["Send", "Response"] for p in ["p50", "p95", "p99"]
+    ]:
+        table.add_column(column, justify="right")
+    for s in stats:
+        table.add_row(
+            s.integration.value,
+            str(s.runs),
+            str(s.booked),
+            *[
+                f"{v:.1f}" if v is not None else "-"
+                for p in [s.send_delay_ms, s.response_time_ms]
+                for v in [p.p50, p.p95, p.p99]
+            ],
+        )
+    rprint(table)
+
+
+@fake_upstream_cli.command(name="serve")
+def serve_fake_upstream(
+    fixtures_dir: Optional[Path] = typer.Option(
+        None,
+        "--fixtures",
+        help="Directory of recorded fixtures, synthetic classes are generated if omitted",
+    ),
+    host: str = "127.0.0.1",
+    port: int = 8100,
+    latency_ms: int = typer.Option(0, help="Added latency of every request"),
+    latency_jitter_ms: int = typer.Option(0, help="Random additional latency"),
+    error_rate: float = typer.Option(
+        0, help="Fraction of requests to fail with --error-status-code"
+    ),
+    error_status_code: int = 503,
+    error_path_pattern: Optional[str] = typer.Option(
+        None, help="Only inject errors into requests with paths matching this regex"
+    ),
+):
+    """
+    Start a local stand-in for the iBooking and BRP upstreams
+
+    Point providers at it with IBOOKING_WEBSITE_BASE_URL=http://<host>:<port>/sit,
+    IBOOKING_API_BASE_URL=http://<host>:<port>/ibooking and
+    BRP_BASE_URL_TEMPLATE=http://<host>:<port>/brp/{subdomain}
+    """
+    app = create_fake_upstream_app(
+        load_fixtures(fixtures_dir),
+        FakeUpstreamConfig(
+            latency_ms=latency_ms,
+            latency_jitter_ms=latency_jitter_ms,
+            error_rate=error_rate,
+            error_status_code=error_status_code,
+            error_path_pattern=error_path_pattern,
+        ),
+    )
+    uvicorn.run(app, host=host, port=port)
+
+
+@fake_upstream_cli.command(name="record")
+def record_fake_upstream_fixtures(fixtures_dir: Path):
+    """
+    Record the current schedules of the real upstreams as fixtures for the fake upstream
+    """
+    with stat("Recording schedules..."):
+        fixtures = record_fixtures()
+    if fixtures is None:
+        err.log("Failed to record schedules")
+        raise typer.Exit(1)
+    write_fixtures(fixtures_dir, fixtures)
 
 
 @cli.callback()
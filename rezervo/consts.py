@@ -1,5 +1,8 @@
 WEEKDAYS = ["Mandag", "Tirsdag", "Onsdag", "Torsdag", "Fredag", "Lørdag", "Søndag"]
 
+# Timezone of class times without explicit offsets, e.g. as presented to users
+LOCAL_TIMEZONE = "Europe/Oslo"
+
 # The number of whole weeks to fetch in addition to the rest of the current week when looking at planned sessions
 PLANNED_SESSIONS_NEXT_WHOLE_WEEKS = 4
 
@@ -8,3 +11,72 @@ SLACK_ACTION_CANCEL_BOOKING = "cancel_booking"
 
 CRON_PULL_SESSIONS_JOB_COMMENT = "pull sessions"
 CRON_PULL_SESSIONS_SCHEDULE = "2,17,32,47 4-23 * * *"
+
+CRON_SYNC_SCHEDULE_JOB_COMMENT = "sync schedule"
+CRON_SYNC_SCHEDULE_SCHEDULE = "0,15,30,45 * * * *"
+
+# How often the booking scheduler reads configs from the database, to pick up config changes
+SCHEDULER_CONFIG_POLL_INTERVAL_SECONDS = 60
+# How often the booking scheduler resolves unchanged configs against the schedule again, to pick up schedule changes
+SCHEDULER_RESOLVE_INTERVAL_SECONDS = 60 * 60
+
+# How long fetched schedule days are reused before being fetched again from the provider
+SCHEDULE_CACHE_TTL_SECONDS = 5 * 60
+
+# Stored schedules older than this are considered stale, and are fetched directly from the provider instead
+SCHEDULE_STALE_AFTER_MINUTES = 20
+
+# The number of past days to include when syncing the stored schedule (to resolve recently attended classes)
+SCHEDULE_SYNC_PAST_DAYS = 7
+
+# How long before booking opens to prepare the booking request, renew expiring authentication and warm up the connection to the provider
+BOOKING_PREPARE_SECONDS_BEFORE_OPENING = 10
+
+# Timers sleep until this close to their target, and then busy-wait for the remaining time
+PRECISE_TIMER_SPIN_NS = 20_000_000
+
+# Authentication is renewed before booking if it expires earlier than this long after booking opens
+BOOKING_AUTH_MIN_VALIDITY_SECONDS = 5 * 60
+
+# Stored BRP tokens are renewed when they expire earlier than this long from now
+BRP_AUTH_TOKEN_MIN_VALIDITY_SECONDS = 60
+
+# Upper bound of the exponential backoff between retries of transient booking failures
+BOOKING_MAX_BACKOFF_SECONDS = 30
+
+# How often to use a warmed up connection while waiting for booking to open, to keep it from being closed as idle
+HTTP_KEEP_WARM_INTERVAL_SECONDS = 4
+# The last use of a warmed up connection before booking opens is at least this long before opening, to not delay the booking
+HTTP_KEEP_WARM_LEAD_SECONDS = 1
+
+# Samples of upstream Date headers taken before booking opens, at this interval, to estimate the clock skew of the provider
+CLOCK_SKEW_SAMPLES = 9
+CLOCK_SKEW_SAMPLE_INTERVAL_SECONDS = 0.125
+CLOCK_SKEW_MAX_SAMPLES = 50
+CLOCK_SKEW_SAMPLE_MAX_AGE_SECONDS = 10 * 60
+# Larger estimated clock skews are considered bogus (e.g. from cached responses), and are not corrected for
+CLOCK_SKEW_MAX_CORRECTION_SECONDS = 60
+
+# Default timeouts (connect, read) for requests to providers
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_READ_TIMEOUT_SECONDS = 30
+
+# Maximum number of pooled keep-alive connections per provider host
+HTTP_POOL_MAX_SIZE = 10
+
+# Limits for requests to each provider host, to avoid being blocked by the provider.
+# Booking requests are exempt from both limits, since a grouped class opening (e.g. a burst of 5 attempts for each
+# of 4 users) exceeds them by design, and is already bounded by its users and burst attempts.
+# Bookings still spend tokens, but only up to a debt of HTTP_HOST_BURST, so other requests wait at most
+# (1 + 10) / 5 = 2.2 seconds for tokens after bookings
+HTTP_HOST_RATE_PER_SECOND = 5
+HTTP_HOST_BURST = 10
+HTTP_HOST_MAX_IN_FLIGHT = HTTP_POOL_MAX_SIZE
+
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:100.0) Gecko/20100101 Firefox/100.0"
+)
+
+# Maximum number of blocking provider calls run concurrently on behalf of async callers (e.g. API routes).
+# At least the size of the threadpool (40 threads) that the routes ran on when they were synchronous
+PROVIDER_ASYNC_MAX_WORKERS = 64
@@ -4,7 +4,9 @@ from rezervo import models
 from rezervo.active_integrations import ACTIVE_INTEGRATIONS
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
-from rezervo.utils.cron_utils import upsert_booking_crontab
+from rezervo.providers.schedule_cache import log_schedule_cache_stats
+from rezervo.settings import get_settings
+from rezervo.utils.cron_utils import delete_booking_crontab, upsert_booking_crontab
 
 
 def refresh_cron():
@@ -12,7 +14,12 @@ def refresh_cron():
         for u in db.query(models.User).all():
             config = crud.get_user_config_by_id(db, u.id)
             for i in ACTIVE_INTEGRATIONS.keys():
+                if get_settings().BOOKING_SCHEDULER_ENABLED:
+                    # bookings are handled by the scheduler, which reloads configs by itself
+                    delete_booking_crontab(u.id, i)
+                    continue
                 ic = crud.get_integration_config(db, i, u.id)
                 if ic is not None:
                     upsert_booking_crontab(config, ic, u)
+    log_schedule_cache_stats()
     rprint("✔ Crontab updated")
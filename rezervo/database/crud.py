@@ -1,12 +1,20 @@
+from datetime import date, datetime, timedelta
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import delete
+from sqlalchemy import delete, func
 from sqlalchemy.orm import Session
 
 from rezervo import models
 from rezervo.auth import auth0
+from rezervo.consts import SCHEDULE_STALE_AFTER_MINUTES
 from rezervo.models import SessionState
+from rezervo.schemas.booking import (
+    BOOKED_OUTCOME,
+    BookingLatencyStats,
+    BookingTimeline,
+    LatencyPercentiles,
+)
 from rezervo.schemas.config import admin
 from rezervo.schemas.config.admin import AdminConfig
 from rezervo.schemas.config.config import (
@@ -24,7 +32,15 @@ from rezervo.schemas.config.user import (
     UserPreferences,
     get_integration_config_from_integration_user,
 )
-from rezervo.schemas.schedule import UserSession, session_model_from_user_session
+from rezervo.schemas.schedule import (
+    RezervoClass,
+    ScheduleRecord,
+    UserSession,
+    class_schedule_model_from_schedule_record,
+    rezervo_class_from_class_schedule_model,
+    schedule_record_from_class_data,
+    session_model_from_user_session,
+)
 from rezervo.utils.ical_utils import generate_calendar_token
 
 
@@ -41,7 +57,13 @@ def user_from_token(db: Session, settings, token) -> Optional[models.User]:
     return db.query(models.User).filter_by(jwt_sub=jwt_sub).one_or_none()
 
 
-def create_user(db: Session, name: str, jwt_sub: str, slack_id: Optional[str] = None):
+def create_user(
+    db: Session,
+    name: str,
+    jwt_sub: str,
+    slack_id: Optional[str] = None,
+    is_admin: bool = False,
+):
     db_user = models.User(
         name=name,
         jwt_sub=jwt_sub,
@@ -50,6 +72,7 @@ def create_user(db: Session, name: str, jwt_sub: str, slack_id: Optional[str] =
             notifications=admin.Notifications(slack=admin.Slack(user_id=slack_id))
             if slack_id is not None
             else None,
+            is_admin=is_admin,
         ).dict(),
         preferences=UserPreferences().dict(),
     )
@@ -93,7 +116,10 @@ def upsert_integration_user(
 
 
 def upsert_integration_user_token(
-    db: Session, user_id: UUID, integration: IntegrationIdentifier, token: str
+    db: Session,
+    user_id: UUID,
+    integration: IntegrationIdentifier,
+    token: Optional[str],
 ):
     db.query(models.IntegrationUser).filter_by(
         user_id=user_id, integration=integration
@@ -174,6 +200,156 @@ def upsert_user_integration_sessions(
     db.commit()
 
 
+def get_user_session(
+    db: Session, integration: IntegrationIdentifier, user_id: UUID, class_id: str
+) -> Optional[UserSession]:
+    db_session = db.get(models.Session, (integration, class_id, user_id))
+    if db_session is None:
+        return None
+    return UserSession.from_orm(db_session)
+
+
+def get_session_class_start_date(
+    db: Session, integration: IntegrationIdentifier, class_id: str
+) -> Optional[date]:
+    db_session = (
+        db.query(models.Session)
+        .filter_by(integration=integration, class_id=class_id)
+        .filter(models.Session.class_data.isnot(None))
+        .first()
+    )
+    if db_session is None:
+        return None
+    return date.fromisoformat(db_session.class_data["from_field"][:10])
+
+
+def replace_class_schedule(
+    db: Session,
+    integration: IntegrationIdentifier,
+    from_date: date,
+    to_date: date,
+    classes: list[ScheduleRecord],
+):
+    db.execute(
+        delete(models.ClassSchedule).where(
+            models.ClassSchedule.integration == integration
+        )
+    )
+    unique_classes = {c.id: c for c in classes}
+    db.add_all(
+        [class_schedule_model_from_schedule_record(c) for c in unique_classes.values()]
+    )
+    db.merge(
+        models.ClassScheduleSync(
+            integration=integration,
+            from_date=from_date,
+            to_date=to_date,
+            synced_at=datetime.now().astimezone(),
+        )
+    )
+    db.commit()
+
+
+def is_class_schedule_fresh(
+    db: Session,
+    integration: IntegrationIdentifier,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+) -> bool:
+    sync = db.get(models.ClassScheduleSync, integration)
+    if sync is None:
+        return False
+    if sync.synced_at < datetime.now().astimezone() - timedelta(
+        minutes=SCHEDULE_STALE_AFTER_MINUTES
+    ):
+        return False
+    if from_date is not None and from_date < sync.from_date:
+        return False
+    if to_date is not None and to_date > sync.to_date:
+        return False
+    return True
+
+
+def get_class_schedule(
+    db: Session, integration: IntegrationIdentifier, from_date: date, to_date: date
+) -> Optional[list[ScheduleRecord]]:
+    """
+    Retrieve the stored schedule for the given period, or None if it has not been
+    synced recently or does not cover the whole period
+    """
+    if not is_class_schedule_fresh(db, integration, from_date, to_date):
+        return None
+    return [
+        schedule_record_from_class_data(c.class_data)
+        for c in db.query(models.ClassSchedule)
+        .filter(
+            models.ClassSchedule.integration == integration,
+            models.ClassSchedule.start_date >= from_date,
+            models.ClassSchedule.start_date < to_date,
+        )
+        .order_by(models.ClassSchedule.start_date)
+    ]
+
+
+def get_class_schedule_class(
+    db: Session, integration: IntegrationIdentifier, class_id: str
+) -> Optional[RezervoClass]:
+    if not is_class_schedule_fresh(db, integration):
+        return None
+    db_class = db.get(models.ClassSchedule, (integration, class_id))
+    if db_class is None:
+        return None
+    return rezervo_class_from_class_schedule_model(db_class)
+
+
+def add_booking_timeline(db: Session, timeline: BookingTimeline):
+    db.add(models.BookingTimeline(**timeline.dict()))
+    db.commit()
+
+
+def get_booking_latency_stats(
+    db: Session, since: Optional[datetime] = None
+) -> list[BookingLatencyStats]:
+    send_delay_ms = (
+        func.extract(
+            "epoch",
+            models.BookingTimeline.request_sent_at
+            - models.BookingTimeline.opening_time,
+        )
+        * 1000
+    )
+    response_time_ms = (
+        func.extract(
+            "epoch",
+            models.BookingTimeline.response_received_at
+            - models.BookingTimeline.request_sent_at,
+        )
+        * 1000
+    )
+    percentiles = [0.5, 0.95, 0.99]
+    query = db.query(
+        models.BookingTimeline.integration,
+        func.count(),
+        func.count().filter(models.BookingTimeline.outcome == BOOKED_OUTCOME),
+        *[func.percentile_cont(p).within_group(send_delay_ms) for p in percentiles],
+        *[func.percentile_cont(p).within_group(response_time_ms) for p in percentiles],
+    )
+    if since is not None:
+        query = query.filter(models.BookingTimeline.started_at >= since)
+    return [
+        BookingLatencyStats(
+            integration=row[0],
+            runs=row[1],
+            booked=row[2],
+            send_delay_ms=LatencyPercentiles(p50=row[3], p95=row[4], p99=row[5]),
+            response_time_ms=LatencyPercentiles(p50=row[6], p95=row[7], p99=row[8]),
+        )
+        for row in query.group_by(models.BookingTimeline.integration).order_by(
+            models.BookingTimeline.integration
+        )
+    ]
+
+
 def get_user(db, user_id) -> Optional[models.User]:
     return db.query(models.User).filter_by(id=user_id).one_or_none()
 
@@ -12,6 +12,7 @@ class BookingError(Enum):
     TOO_LONG_WAITING_TIME = auto()
     INVALID_CONFIG = auto()
     CANCELLING_WITHOUT_BOOKING = auto()
+    CLASS_FULL = auto()
 
 
 class AuthenticationError(Enum):
@@ -0,0 +1,264 @@
+import json
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+import pytz
+from pydantic import BaseModel
+
+from rezervo.active_integrations import BRP_BUSINESS_UNITS
+from rezervo.errors import AuthenticationError
+from rezervo.providers.brpsystems.schedule import fetch_brp_schedule_days
+from rezervo.providers.brpsystems.schema import BrpSubdomain
+from rezervo.providers.ibooking.auth import fetch_public_token
+from rezervo.providers.ibooking.schedule import fetch_ibooking_schedule
+from rezervo.utils.time_utils import local_timezone
+
+FIXTURES_META_FILE = "meta.json"
+IBOOKING_CLASSES_FILE = "ibooking_classes.json"
+
+FAKE_STUDIOS = {306: "Gløshaugen", 307: "Dragvoll", 308: "Portalen", 540: "Moholt"}
+FAKE_ACTIVITIES = 20
+FAKE_CLASSES_PER_DAY = 16
+FAKE_SCHEDULE_PAST_DAYS = 7
+FAKE_SCHEDULE_WEEKS = 6
+FAKE_BOOKING_OPENS_HOURS_BEFORE = 48
+
+
+class FakeUpstreamFixtures(BaseModel):
+    ibooking_classes: list[dict[str, Any]]
+    brp_classes: dict[BrpSubdomain, list[dict[str, Any]]]
+
+
+def brp_fixtures_file(subdomain: BrpSubdomain) -> str:
+    return f"brp_{subdomain.value}_groupactivities.json"
+
+
+def brp_date_str(dt: datetime) -> str:
+    return dt.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M:%S") + ".000Z"
+
+
+def ibooking_date_str(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def fake_class_start_times(from_date: date, days: int) -> list[datetime]:
+    tz = local_timezone()
+    return [
+        tz.localize(
+            datetime(d.year, d.month, d.day, 6)
+            + timedelta(hours=i, minutes=15 * (i % 2))
+        )
+        for d in (from_date + timedelta(days=n) for n in range(days))
+        for i in range(FAKE_CLASSES_PER_DAY)
+    ]
+
+
+def generate_ibooking_classes(from_date: date, days: int) -> list[dict[str, Any]]:
+    classes = []
+    for i, start in enumerate(fake_class_start_times(from_date, days)):
+        studio_id = list(FAKE_STUDIOS.keys())[i % len(FAKE_STUDIOS)]
+        activity_id = i % FAKE_ACTIVITIES
+        classes.append(
+            {
+                "id": 100_000 + i,
+                "name": f"Aktivitet {activity_id}",
+                "activityId": activity_id,
+                "from": ibooking_date_str(start),
+                "to": ibooking_date_str(start + timedelta(minutes=50)),
+                "instructors": [{"name": f"Instruktør {i % 7}"}],
+                "studio": {"id": studio_id, "name": FAKE_STUDIOS[studio_id]},
+                "userStatus": None,
+                "bookable": False,
+                "bookingOpensAt": ibooking_date_str(
+                    start - timedelta(hours=FAKE_BOOKING_OPENS_HOURS_BEFORE)
+                ),
+            }
+        )
+    return classes
+
+
+def generate_brp_classes(
+    subdomain: BrpSubdomain, from_date: date, days: int
+) -> list[dict[str, Any]]:
+    classes = []
+    for i, start in enumerate(fake_class_start_times(from_date, days)):
+        activity_id = i % FAKE_ACTIVITIES
+        classes.append(
+            {
+                "id": 200_000 + i,
+                "name": f"Activity {activity_id}",
+                "duration": {
+                    "start": brp_date_str(start),
+                    "end": brp_date_str(start + timedelta(minutes=50)),
+                },
+                "groupActivityProduct": {
+                    "id": activity_id,
+                    "name": f"Activity {activity_id}",
+                },
+                "businessUnit": {
+                    "id": 1,
+                    "name": subdomain.name,
+                    "location": "Trondheim",
+                    "companyNameForInvoice": subdomain.name,
+                },
+                "locations": [{"id": 1, "name": "Sal 1"}],
+                "instructors": [
+                    {"id": i % 7, "name": f"Instructor {i % 7}", "isSubstitute": False}
+                ],
+                "bookableEarliest": brp_date_str(
+                    start - timedelta(hours=FAKE_BOOKING_OPENS_HOURS_BEFORE)
+                ),
+                "bookableLatest": brp_date_str(start - timedelta(minutes=5)),
+                "externalMessage": None,
+                "internalMessage": None,
+                "cancelled": False,
+                "slots": {
+                    "total": 30,
+                    "totalBookable": 28,
+                    "reservedForDropin": 2,
+                    "leftToBook": 10,
+                    "leftToBookIncDropin": 12,
+                    "hasWaitingList": True,
+                    "inWaitingList": 0,
+                },
+            }
+        )
+    return classes
+
+
+def shift_brp_date_str(date_str: str, delta: timedelta) -> str:
+    # shift local time, to keep class times across daylight saving time changes
+    tz = local_timezone()
+    local_time = (
+        datetime.fromisoformat(date_str.replace("Z", ""))
+        .replace(tzinfo=pytz.UTC)
+        .astimezone(tz)
+    )
+    return brp_date_str(tz.localize(local_time.replace(tzinfo=None) + delta))
+
+
+def shift_ibooking_date_str(date_str: str, delta: timedelta) -> str:
+    return ibooking_date_str(datetime.fromisoformat(date_str) + delta)
+
+
+def shift_fixtures(
+    fixtures: FakeUpstreamFixtures, delta: timedelta
+) -> FakeUpstreamFixtures:
+    ibooking_classes = [
+        {
+            **c,
+            "from": shift_ibooking_date_str(c["from"], delta),
+            "to": shift_ibooking_date_str(c["to"], delta),
+            "bookingOpensAt": shift_ibooking_date_str(c["bookingOpensAt"], delta),
+        }
+        for c in fixtures.ibooking_classes
+    ]
+    brp_classes = {
+        subdomain: [
+            {
+                **c,
+                "duration": {
+                    "start": shift_brp_date_str(c["duration"]["start"], delta),
+                    "end": shift_brp_date_str(c["duration"]["end"], delta),
+                },
+                "bookableEarliest": shift_brp_date_str(c["bookableEarliest"], delta),
+                "bookableLatest": shift_brp_date_str(c["bookableLatest"], delta),
+            }
+            for c in classes
+        ]
+        for subdomain, classes in fixtures.brp_classes.items()
+    }
+    return FakeUpstreamFixtures(
+        ibooking_classes=ibooking_classes, brp_classes=brp_classes
+    )
+
+
+def generate_fixtures() -> FakeUpstreamFixtures:
+    from_date = datetime.now().date() - timedelta(days=FAKE_SCHEDULE_PAST_DAYS)
+    days = FAKE_SCHEDULE_PAST_DAYS + FAKE_SCHEDULE_WEEKS * 7
+    return FakeUpstreamFixtures(
+        ibooking_classes=generate_ibooking_classes(from_date, days),
+        brp_classes={s: generate_brp_classes(s, from_date, days) for s in BrpSubdomain},
+    )
+
+
+def load_fixtures(fixtures_dir: Optional[Path]) -> FakeUpstreamFixtures:
+    """
+    Load recorded fixtures, shifted by whole weeks to the current week, generating
+    synthetic classes for any integration without recorded fixtures
+    """
+    generated = generate_fixtures()
+    if fixtures_dir is None:
+        return generated
+    meta = json.loads((fixtures_dir / FIXTURES_META_FILE).read_text())
+    recorded_at = date.fromisoformat(meta["recorded_at"])
+    today = datetime.now().date()
+    delta = timedelta(
+        weeks=(
+            (today - timedelta(days=today.weekday()))
+            - (recorded_at - timedelta(days=recorded_at.weekday()))
+        ).days
+        // 7
+    )
+    ibooking_file = fixtures_dir / IBOOKING_CLASSES_FILE
+    recorded = FakeUpstreamFixtures(
+        ibooking_classes=json.loads(ibooking_file.read_text())
+        if ibooking_file.exists()
+        else [],
+        brp_classes={
+            s: json.loads((fixtures_dir / brp_fixtures_file(s)).read_text())
+            for s in BrpSubdomain
+            if (fixtures_dir / brp_fixtures_file(s)).exists()
+        },
+    )
+    shifted = shift_fixtures(recorded, delta)
+    return FakeUpstreamFixtures(
+        ibooking_classes=shifted.ibooking_classes
+        if ibooking_file.exists()
+        else generated.ibooking_classes,
+        brp_classes={**generated.brp_classes, **shifted.brp_classes},
+    )
+
+
+def record_fixtures() -> Optional[FakeUpstreamFixtures]:
+    """
+    Record the current schedules of the real upstreams (as configured in settings)
+    """
+    from_date = datetime.now().date() - timedelta(days=FAKE_SCHEDULE_PAST_DAYS)
+    days = FAKE_SCHEDULE_PAST_DAYS + FAKE_SCHEDULE_WEEKS * 7
+    token = fetch_public_token()
+    if isinstance(token, AuthenticationError):
+        return None
+    ibooking_schedule = fetch_ibooking_schedule(token, days, from_date=from_date)
+    if ibooking_schedule is None:
+        return None
+    return FakeUpstreamFixtures(
+        ibooking_classes=[
+            c.dict(by_alias=True) for day in ibooking_schedule.days for c in day.classes
+        ],
+        brp_classes={
+            subdomain: [
+                c
+                for day in fetch_brp_schedule_days(
+                    subdomain, business_unit, days, from_date
+                ).values()
+                for c in day
+            ]
+            for subdomain, business_unit in BRP_BUSINESS_UNITS.items()
+        },
+    )
+
+
+def write_fixtures(fixtures_dir: Path, fixtures: FakeUpstreamFixtures):
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    (fixtures_dir / FIXTURES_META_FILE).write_text(
+        json.dumps({"recorded_at": datetime.now().date().isoformat()})
+    )
+    (fixtures_dir / IBOOKING_CLASSES_FILE).write_text(
+        json.dumps(fixtures.ibooking_classes, ensure_ascii=False)
+    )
+    for subdomain, classes in fixtures.brp_classes.items():
+        (fixtures_dir / brp_fixtures_file(subdomain)).write_text(
+            json.dumps(classes, ensure_ascii=False)
+        )
@@ -0,0 +1,337 @@
+import asyncio
+import random
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import pytz
+from fastapi import Cookie, FastAPI, Form, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+from starlette import status
+from starlette.responses import Response
+
+from rezervo.consts import WEEKDAYS
+from rezervo.fake_upstream.fixtures import FakeUpstreamFixtures
+from rezervo.providers.brpsystems.schema import BookingType, BrpSubdomain
+from rezervo.utils.time_utils import local_timezone
+
+FAKE_PUBLIC_TOKEN = "public"
+FAKE_USER_TOKEN_PREFIX = "user-"
+FAKE_REFRESH_TOKEN_PREFIX = "refresh-"
+FAKE_SESSION_COOKIE = "SSESSfake"
+# credentials with these passwords are rejected, to exercise authentication failures
+FAKE_INVALID_PASSWORD = "invalid"
+FAKE_BLOCKED_PASSWORD = "blocked"
+IBOOKING_SCHEDULE_DAYS = 7
+BRP_TOKEN_EXPIRES_IN_SECONDS = 3600
+
+
+@dataclass
+class FakeUpstreamConfig:
+    latency_ms: int = 0
+    latency_jitter_ms: int = 0
+    error_rate: float = 0
+    error_status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE
+    # only inject errors into requests with paths matching this pattern
+    error_path_pattern: Optional[str] = None
+
+
+@dataclass
+class FakeUpstreamState:
+    fixtures: FakeUpstreamFixtures
+    ibooking_bookings: dict[str, set[int]] = field(default_factory=dict)
+    brp_bookings: dict[tuple[BrpSubdomain, str], dict[int, dict[str, Any]]] = field(
+        default_factory=dict
+    )
+    next_brp_booking_id: int = 1
+
+
+def ibooking_user_from_token(token: str) -> Optional[str]:
+    if not token.startswith(FAKE_USER_TOKEN_PREFIX):
+        return None
+    return token[len(FAKE_USER_TOKEN_PREFIX) :]
+
+
+def ibooking_class_for_user(
+    ibooking_class: dict[str, Any], booked_class_ids: set[int]
+) -> dict[str, Any]:
+    tz = local_timezone()
+    now = datetime.now().astimezone()
+    opens_at = tz.localize(datetime.fromisoformat(ibooking_class["bookingOpensAt"]))
+    start = tz.localize(datetime.fromisoformat(ibooking_class["from"]))
+    return {
+        **ibooking_class,
+        "bookable": opens_at <= now < start,
+        "userStatus": "booked"
+        if ibooking_class["id"] in booked_class_ids
+        else "available",
+    }
+
+
+def brp_auth_result(username: str) -> dict[str, Any]:
+    return {
+        "username": username,
+        "roles": ["customer"],
+        "token_type": "bearer",
+        "access_token": f"{FAKE_USER_TOKEN_PREFIX}{username}",
+        "expires_in": BRP_TOKEN_EXPIRES_IN_SECONDS,
+        "refresh_token": f"{FAKE_REFRESH_TOKEN_PREFIX}{username}",
+    }
+
+
+def brp_booking_data(
+    state: FakeUpstreamState, brp_class: dict[str, Any], username: str
+) -> dict[str, Any]:
+    booking_id = state.next_brp_booking_id
+    state.next_brp_booking_id += 1
+    return {
+        "type": BookingType.GROUP_ACTIVITY.value,
+        "groupActivity": {
+            "id": brp_class["id"],
+            "name": brp_class["groupActivityProduct"]["name"],
+        },
+        "businessUnit": brp_class["businessUnit"],
+        "customer": {"id": 1, "firstName": username, "lastName": "Fake"},
+        "duration": brp_class["duration"],
+        "groupActivityBooking": {
+            "id": booking_id,
+            "order": {
+                "id": booking_id,
+                "number": str(booking_id),
+                "externalId": None,
+                "lastModified": datetime.now(pytz.UTC).isoformat(),
+            },
+        },
+        "checkedIn": None,
+    }
+
+
+def create_fake_upstream_app(
+    fixtures: FakeUpstreamFixtures, config: FakeUpstreamConfig
+) -> FastAPI:
+    """
+    Local stand-in for the iBooking and BRP endpoints used by the providers.
+
+    iBooking website and api endpoints are served under `/sit` and `/ibooking`, and BRP
+    endpoints under `/brp/{subdomain}`.
+    """
+    app = FastAPI(title="rezervo fake upstream")
+    state = FakeUpstreamState(fixtures=fixtures)
+    ibooking_classes = {c["id"]: c for c in fixtures.ibooking_classes}
+    brp_classes = {
+        subdomain: {c["id"]: c for c in classes}
+        for subdomain, classes in fixtures.brp_classes.items()
+    }
+
+    @app.middleware("http")
+    async def simulate_upstream_conditions(request: Request, call_next):
+        # some provider urls contain duplicate slashes
+        request.scope["path"] = re.sub("/{2,}", "/", request.scope["path"])
+        latency_ms = config.latency_ms + random.uniform(0, config.latency_jitter_ms)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        if random.random() < config.error_rate and (
+            config.error_path_pattern is None
+            or re.search(config.error_path_pattern, request.scope["path"])
+        ):
+            return Response(status_code=config.error_status_code)
+        return await call_next(request)
+
+    # iBooking website
+
+    @app.post("/sit/")
+    def ibooking_login(name: str = Form(...), password: str = Form(..., alias="pass")):
+        if password == FAKE_BLOCKED_PASSWORD:
+            return HTMLResponse(
+                "<div>Feilmelding: innlogging er midlertidig blokkert</div>"
+            )
+        if password == FAKE_INVALID_PASSWORD:
+            return HTMLResponse(
+                "<div>Feilmelding: ukjent brukernavn eller passord</div>"
+            )
+        response = HTMLResponse("<div>Innlogget</div>")
+        response.set_cookie(FAKE_SESSION_COOKIE, name)
+        return response
+
+    @app.get("/sit/trening/gruppe")
+    def ibooking_booking_page(
+        session: Optional[str] = Cookie(None, alias=FAKE_SESSION_COOKIE)
+    ):
+        token = (
+            f"{FAKE_USER_TOKEN_PREFIX}{session}"
+            if session is not None
+            else FAKE_PUBLIC_TOKEN
+        )
+        return HTMLResponse(
+            f'<script>//<![CDATA[\niBookingPreload({{token: "{token}"}});\n//]]></script>'
+        )
+
+    @app.get("/sit/ibooking-api/callback/get-my-sessions")
+    def ibooking_my_sessions(
+        session: Optional[str] = Cookie(None, alias=FAKE_SESSION_COOKIE)
+    ):
+        if session is None:
+            return Response(status_code=status.HTTP_403_FORBIDDEN)
+        booked_class_ids = state.ibooking_bookings.get(session, set())
+        return [
+            {
+                "type": "groupclass",
+                "class": ibooking_class_for_user(
+                    ibooking_classes[class_id], booked_class_ids
+                ),
+                "status": "booked",
+            }
+            for class_id in booked_class_ids
+        ]
+
+    # iBooking api
+
+    @app.post("/ibooking/webapp/api/User/validateToken")
+    def ibooking_validate_token(token: str = Form(...)):
+        if token == FAKE_PUBLIC_TOKEN:
+            return {"info": "client-readonly"}
+        username = ibooking_user_from_token(token)
+        if username is None:
+            return Response(status_code=status.HTTP_403_FORBIDDEN)
+        return {"user": {"firstname": username, "lastname": "Fake", "email": username}}
+
+    @app.get("/ibooking/webapp/api/Schedule/getSchedule")
+    def ibooking_schedule(
+        token: str,
+        studios: Optional[int] = None,
+        from_date: Optional[str] = Query(None, alias="from"),
+    ):
+        start_date = (
+            datetime.fromisoformat(from_date).date()
+            if from_date is not None
+            else datetime.now().date()
+        )
+        username = ibooking_user_from_token(token)
+        booked_class_ids = (
+            state.ibooking_bookings.get(username, set())
+            if username is not None
+            else set()
+        )
+        days = []
+        for i in range(IBOOKING_SCHEDULE_DAYS):
+            day = start_date + timedelta(days=i)
+            days.append(
+                {
+                    "dayName": WEEKDAYS[day.weekday()],
+                    "date": day.isoformat(),
+                    "classes": [
+                        ibooking_class_for_user(c, booked_class_ids)
+                        for c in fixtures.ibooking_classes
+                        if c["from"][:10] == day.isoformat()
+                        and (studios is None or c["studio"]["id"] == studios)
+                    ],
+                }
+            )
+        return {"days": days}
+
+    @app.get("/ibooking/webapp/api/Schedule/getClass")
+    def ibooking_class(token: str, id: int):
+        if id not in ibooking_classes:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+        username = ibooking_user_from_token(token)
+        booked_class_ids = (
+            state.ibooking_bookings.get(username, set())
+            if username is not None
+            else set()
+        )
+        return {
+            "class": ibooking_class_for_user(ibooking_classes[id], booked_class_ids)
+        }
+
+    @app.post("/ibooking/webapp/api/Schedule/addBooking")
+    def ibooking_add_booking(classId: int = Form(...), token: str = Form(...)):
+        username = ibooking_user_from_token(token)
+        if username is None:
+            return Response(status_code=status.HTTP_403_FORBIDDEN)
+        if classId not in ibooking_classes:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+        booked_class_ids = state.ibooking_bookings.setdefault(username, set())
+        if classId in booked_class_ids:
+            return {"success": False, "errorMessage": "Du er allerede påmeldt timen"}
+        booked_class_ids.add(classId)
+        return {"success": True}
+
+    @app.post("/ibooking/webapp/api/Schedule/cancelBooking")
+    def ibooking_cancel_booking(classId: int = Form(...), token: str = Form(...)):
+        username = ibooking_user_from_token(token)
+        if username is None:
+            return Response(status_code=status.HTTP_403_FORBIDDEN)
+        booked_class_ids = state.ibooking_bookings.get(username, set())
+        if classId not in booked_class_ids:
+            return {"success": False, "errorMessage": "Not booked"}
+        booked_class_ids.remove(classId)
+        return {
+            "success": True,
+            "class": ibooking_class_for_user(
+                ibooking_classes[classId], booked_class_ids
+            ),
+        }
+
+    # BRP
+
+    brp_prefix = "/brp/{subdomain}/brponline/api/ver3"
+
+    @app.post(f"{brp_prefix}/auth/login")
+    async def brp_login(subdomain: BrpSubdomain, request: Request):
+        credentials = await request.json()
+        if credentials["password"] == FAKE_INVALID_PASSWORD:
+            return JSONResponse(
+                {"errorCode": "Feil brukernavn eller passord."},
+                status_code=status.HTTP_401_UNAUTHORIZED,
+            )
+        return brp_auth_result(credentials["username"])
+
+    @app.post(f"{brp_prefix}/auth/refresh")
+    async def brp_refresh(subdomain: BrpSubdomain, request: Request):
+        refresh_token = (await request.json())["refresh_token"]
+        if not refresh_token.startswith(FAKE_REFRESH_TOKEN_PREFIX):
+            return Response(status_code=status.HTTP_401_UNAUTHORIZED)
+        return brp_auth_result(refresh_token[len(FAKE_REFRESH_TOKEN_PREFIX) :])
+
+    @app.get(f"{brp_prefix}/businessunits/{{business_unit}}/groupactivities")
+    def brp_schedule(subdomain: BrpSubdomain, business_unit: int, request: Request):
+        period_start = request.query_params["period.start"]
+        period_end = request.query_params["period.end"]
+        return [
+            {**c, "businessUnit": {**c["businessUnit"], "id": business_unit}}
+            for c in fixtures.brp_classes.get(subdomain, [])
+            if period_start <= c["duration"]["start"] < period_end
+        ]
+
+    @app.get(f"{brp_prefix}/customers/{{username}}/bookings/groupactivities")
+    def brp_bookings(subdomain: BrpSubdomain, username: str):
+        return list(state.brp_bookings.get((subdomain, username), {}).values())
+
+    @app.post(f"{brp_prefix}/customers/{{username}}/bookings/groupactivities")
+    async def brp_book(subdomain: BrpSubdomain, username: str, request: Request):
+        class_id = (await request.json())["groupActivity"]
+        brp_class = brp_classes.get(subdomain, {}).get(class_id)
+        if brp_class is None:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+        bookings = state.brp_bookings.setdefault((subdomain, username), {})
+        if any(b["groupActivity"]["id"] == class_id for b in bookings.values()):
+            return JSONResponse(
+                {"errorCode": "ALREADY_BOOKED"},
+                status_code=status.HTTP_400_BAD_REQUEST,
+            )
+        booking = brp_booking_data(state, brp_class, username)
+        bookings[booking["groupActivityBooking"]["id"]] = booking
+        return JSONResponse(booking, status_code=status.HTTP_201_CREATED)
+
+    @app.delete(
+        f"{brp_prefix}/customers/{{username}}/bookings/groupactivities/{{booking_id}}"
+    )
+    def brp_cancel_booking(subdomain: BrpSubdomain, username: str, booking_id: int):
+        bookings = state.brp_bookings.get((subdomain, username), {})
+        if booking_id not in bookings:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+        del bookings[booking_id]
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    return app
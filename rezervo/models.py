@@ -1,7 +1,16 @@
 import enum
 import uuid
 
-from sqlalchemy import Boolean, Column, Enum, ForeignKey, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    String,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 
 from rezervo.database.base_class import Base
@@ -76,9 +85,12 @@ class Session(Base):
     )
     status = Column(Enum(SessionState))
     class_data = Column(JSONB)
+    # provider specific reference to the booking, e.g. for cancelling it directly
+    booking_reference = Column(String, nullable=True)
+    booking_type = Column(String, nullable=True)
 
     def __repr__(self):
-        return f"<Session (integration='{self.integration}' class_id='{self.class_id}' user_id='{self.user_id}' status='{self.status}' class_data={self.class_data})>"
+        return f"<Session (integration='{self.integration}' class_id='{self.class_id}' user_id='{self.user_id}' status='{self.status}' class_data={self.class_data} booking_reference='{self.booking_reference}' booking_type='{self.booking_type}')>"
 
 
 class SlackClassNotificationReceipt(Base):
@@ -96,3 +108,58 @@ class SlackClassNotificationReceipt(Base):
 
     def __repr__(self):
         return f"<SlackClassNotificationReceipt (id='{self.id}' user_id='{self.slack_user_id}' integration='{self.integration}' class_id='{self.class_id}' channel_id='{self.channel_id}' message_id='{self.message_id}'' scheduled_reminder_id='{self.scheduled_reminder_id}' )>"
+
+
+class ClassSchedule(Base):
+    __tablename__ = "class_schedule"
+
+    integration = Column(
+        Enum(IntegrationIdentifier, name="integration"), primary_key=True
+    )
+    class_id = Column(String, primary_key=True)
+    start_date = Column(Date, nullable=False, index=True)
+    class_data = Column(JSONB, nullable=False)
+
+    def __repr__(self):
+        return f"<ClassSchedule (integration='{self.integration}' class_id='{self.class_id}' start_date='{self.start_date}' class_data={self.class_data})>"
+
+
+class ClassScheduleSync(Base):
+    __tablename__ = "class_schedule_syncs"
+
+    integration = Column(
+        Enum(IntegrationIdentifier, name="integration"), primary_key=True
+    )
+    from_date = Column(Date, nullable=False)
+    to_date = Column(Date, nullable=False)
+    synced_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ClassScheduleSync (integration='{self.integration}' from_date='{self.from_date}' to_date='{self.to_date}' synced_at='{self.synced_at}')>"
+
+
+class BookingTimeline(Base):
+    __tablename__ = "booking_timelines"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="cascade"), nullable=False
+    )
+    integration = Column(
+        Enum(IntegrationIdentifier, name="integration"), nullable=False
+    )
+    class_id = Column(String, nullable=True)
+    opening_time = Column(DateTime(timezone=True), nullable=True)
+    outcome = Column(String, nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    config_loaded_at = Column(DateTime(timezone=True), nullable=True)
+    class_found_at = Column(DateTime(timezone=True), nullable=True)
+    authenticated_at = Column(DateTime(timezone=True), nullable=True)
+    woke_up_at = Column(DateTime(timezone=True), nullable=True)
+    request_sent_at = Column(DateTime(timezone=True), nullable=True)
+    response_received_at = Column(DateTime(timezone=True), nullable=True)
+    notified_at = Column(DateTime(timezone=True), nullable=True)
+    clock_skew_ms = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<BookingTimeline (id='{self.id}' user_id='{self.user_id}' integration='{self.integration}' class_id='{self.class_id}' opening_time='{self.opening_time}' outcome='{self.outcome}')>"
@@ -22,7 +22,7 @@ def notify_auth_failure(
     notifications_config: config.Notifications,
     error: Optional[AuthenticationError] = None,
     check_run: bool = False,
-) -> None:
+) -> bool:
     notified = False
     push_subscriptions = notifications_config.push_notification_subscriptions
     if push_subscriptions is not None:
@@ -41,6 +41,7 @@ def notify_auth_failure(
         notified = True
     if not notified:
         warn.log("No notification targets, auth failure notification will not be sent!")
+    return notified
 
 
 def notify_booking_failure(
@@ -48,7 +49,7 @@ def notify_booking_failure(
     _class_config: Optional[Class] = None,
     error: Optional[BookingError] = None,
     check_run: bool = False,
-) -> None:
+) -> bool:
     notified = False
     push_subscriptions = notifications_config.push_notification_subscriptions
     if push_subscriptions is not None:
@@ -72,13 +73,14 @@ def notify_booking_failure(
         warn.log(
             "No notification targets, booking failure notification will not be sent!"
         )
+    return notified
 
 
 def notify_booking(
     notifications_config: config.Notifications,
     booked_class: RezervoClass,
     ical_url: Optional[str] = None,
-) -> None:
+) -> bool:
     notified = False
     push_subscriptions = notifications_config.push_notification_subscriptions
     if push_subscriptions is not None:
@@ -109,6 +111,7 @@ def notify_booking(
         notified = True
     if not notified:
         warn.log("No notification targets, booking notification will not be sent!")
+    return notified
 
 
 def schedule_class_reminder(
@@ -25,6 +25,7 @@ BOOKING_FAILURE_REASONS = {
     BookingError.MISSING_SCHEDULE_DAY: "Fant ikke riktig dag 📅🔍",
     BookingError.TOO_LONG_WAITING_TIME: "Ventetid før booking var for lang 💤",
     BookingError.INVALID_CONFIG: "Ugyldig bookingkonfigurasjon 💔",
+    BookingError.CLASS_FULL: "Timen er full 🈵",
 }
 
 
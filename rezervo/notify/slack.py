@@ -169,6 +169,7 @@ BOOKING_FAILURE_REASONS = {
     BookingError.MISSING_SCHEDULE_DAY: "Fant ikke riktig dag :calendar::mag:",
     BookingError.TOO_LONG_WAITING_TIME: "Ventetid før booking var for lang :sleeping:",
     BookingError.INVALID_CONFIG: "Ugyldig bookingkonfigurasjon :broken_heart:",
+    BookingError.CLASS_FULL: "Timen er full :no_entry_sign:",
 }
 
 
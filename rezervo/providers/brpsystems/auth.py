@@ -1,23 +1,48 @@
+import json
 import re
-from typing import Union
+from datetime import datetime, timedelta
+from typing import Optional, Union
 
 import requests
-from requests import Session
 
+from rezervo.consts import BRP_AUTH_TOKEN_MIN_VALIDITY_SECONDS
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError
-from rezervo.providers.brpsystems.schema import BrpAuthResult, BrpSubdomain
-from rezervo.utils.logging_utils import err
+from rezervo.providers.brpsystems.consts import api_url
+from rezervo.providers.brpsystems.schema import (
+    SUBDOMAIN_TO_INTEGRATION_IDENTIFIER,
+    BrpAuthResult,
+    BrpSubdomain,
+)
+from rezervo.providers.http_client import get_http_client
+from rezervo.providers.provider import BookingAuth
+from rezervo.schemas.config.user import IntegrationUser
+from rezervo.utils.logging_utils import err, warn
 
 
 def auth_url(subdomain: BrpSubdomain) -> str:
-    return f"https://{subdomain.value}.brpsystems.com/brponline/api/ver3/auth/login"
+    return f"{api_url(subdomain)}/auth/login"
+
+
+def refresh_url(subdomain: BrpSubdomain) -> str:
+    return f"{api_url(subdomain)}/auth/refresh"
+
+
+def parse_auth_result(
+    response: requests.Response,
+) -> Union[BrpAuthResult, AuthenticationError]:
+    try:
+        return BrpAuthResult(**response.json())
+    except (ValueError, TypeError) as e:
+        err.log("Unexpected authentication response", e)
+        return AuthenticationError.ERROR
 
 
 def authenticate(
     subdomain: BrpSubdomain, email: str, password: str
 ) -> Union[BrpAuthResult, AuthenticationError]:
-    session = Session()
-    auth_res = session.post(
+    auth_res = get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]).post(
         auth_url(subdomain),
         json={"username": email, "password": password},
     )
@@ -30,4 +55,103 @@ def authenticate(
     if invalid_credentials_matches is not None:
         err.log("Authentication failed, invalid credentials")
         return AuthenticationError.INVALID_CREDENTIALS
-    return auth_res.json()
+    return parse_auth_result(auth_res)
+
+
+def refresh_authentication(
+    subdomain: BrpSubdomain, refresh_token: str
+) -> Union[BrpAuthResult, AuthenticationError]:
+    try:
+        refresh_res = get_http_client(
+            SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]
+        ).post(refresh_url(subdomain), json={"refresh_token": refresh_token})
+    except requests.exceptions.RequestException as e:
+        err.log("Token refresh failed", e)
+        return AuthenticationError.ERROR
+    if refresh_res.status_code != requests.codes.OK:
+        return AuthenticationError.TOKEN_INVALID
+    return parse_auth_result(refresh_res)
+
+
+def auth_from_stored_token(token: str) -> Optional[BookingAuth]:
+    try:
+        stored = json.loads(token)
+        return BookingAuth(
+            credentials=BrpAuthResult(**stored["auth_result"]),
+            expires_at=datetime.fromisoformat(stored["expires_at"]),
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def store_auth(integration_user: IntegrationUser, auth: Optional[BookingAuth]):
+    token = (
+        json.dumps(
+            {
+                "auth_result": auth.credentials.dict(),
+                "expires_at": auth.expires_at.isoformat()
+                if auth.expires_at is not None
+                else None,
+            }
+        )
+        if auth is not None
+        else None
+    )
+    integration_user.auth_token = token
+    with SessionLocal() as db:
+        crud.upsert_integration_user_token(
+            db, integration_user.user_id, integration_user.integration, token
+        )
+
+
+def forget_stored_auth(integration_user: IntegrationUser):
+    """
+    Forget the stored token of the user, e.g. after it was rejected before its expiry
+    """
+    if integration_user.auth_token is not None:
+        store_auth(integration_user, None)
+
+
+def authenticate_integration_user(
+    subdomain: BrpSubdomain,
+    integration_user: IntegrationUser,
+    min_validity_seconds: int = BRP_AUTH_TOKEN_MIN_VALIDITY_SECONDS,
+) -> Union[BookingAuth, AuthenticationError]:
+    """
+    Authenticate with the stored token of the user if it is valid for at least the given
+    duration, renewing it with its refresh token if not. Username and password are only used
+    if there is no stored token, or it could not be renewed.
+    """
+    requested_at = datetime.now().astimezone()
+    stored_auth = (
+        auth_from_stored_token(integration_user.auth_token)
+        if integration_user.auth_token is not None
+        else None
+    )
+    if stored_auth is not None:
+        if stored_auth.is_valid_at(
+            requested_at + timedelta(seconds=min_validity_seconds)
+        ):
+            return stored_auth
+        refresh_result = refresh_authentication(
+            subdomain, stored_auth.credentials.refresh_token
+        )
+        if not isinstance(refresh_result, AuthenticationError):
+            auth = BookingAuth(
+                credentials=refresh_result,
+                expires_at=requested_at + timedelta(seconds=refresh_result.expires_in),
+            )
+            store_auth(integration_user, auth)
+            return auth
+        warn.log("Failed to refresh authentication token, logging in...")
+    auth_result = authenticate(
+        subdomain, integration_user.username, integration_user.password
+    )
+    if isinstance(auth_result, AuthenticationError):
+        return auth_result
+    auth = BookingAuth(
+        credentials=auth_result,
+        expires_at=requested_at + timedelta(seconds=auth_result.expires_in),
+    )
+    store_auth(integration_user, auth)
+    return auth
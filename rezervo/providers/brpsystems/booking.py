@@ -1,38 +1,102 @@
 import time
-from datetime import datetime, timedelta
-from typing import List, Union
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Union
 
 import pytz
 import requests
 
-from rezervo.consts import WEEKDAYS
+from rezervo.consts import (
+    BOOKING_AUTH_MIN_VALIDITY_SECONDS,
+    BOOKING_PREPARE_SECONDS_BEFORE_OPENING,
+    WEEKDAYS,
+)
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError, BookingError
 from rezervo.notify.notify import notify_booking
-from rezervo.providers.brpsystems.auth import authenticate
-from rezervo.providers.brpsystems.schedule import fetch_brp_schedule
+from rezervo.providers.brpsystems.auth import (
+    authenticate_integration_user,
+    forget_stored_auth,
+)
+from rezervo.providers.brpsystems.consts import api_url
+from rezervo.providers.brpsystems.schedule import (
+    brp_class_start_dates,
+    fetch_brp_schedule,
+)
 from rezervo.providers.brpsystems.schema import (
+    SUBDOMAIN_TO_INTEGRATION_IDENTIFIER,
     BookingData,
     BookingType,
     BrpAuthResult,
-    BrpClass,
     BrpSubdomain,
-    rezervo_class_from_brp_class,
-    tz_aware_iso_from_brp_date_str,
 )
-from rezervo.providers.helpers import try_authenticate
+from rezervo.providers.helpers import (
+    classify_booking_error_message,
+    classify_booking_response_status,
+    find_stored_class_by_id,
+    find_stored_classes,
+    send_prepared_booking,
+    try_authenticate,
+)
+from rezervo.providers.http_client import get_http_client
+from rezervo.providers.provider import (
+    BookingAttemptOutcome,
+    BookingAuth,
+    PreparedBooking,
+)
+from rezervo.providers.schedule_index import ScheduleIndex, schedule_record_index
 from rezervo.schemas.config.config import ConfigValue
 from rezervo.schemas.config.user import Class, IntegrationUser
-from rezervo.schemas.schedule import RezervoClass
-from rezervo.utils.logging_utils import err
+from rezervo.schemas.schedule import (
+    RezervoClass,
+    ScheduleRecord,
+    rezervo_class_from_schedule_record,
+)
+from rezervo.utils.logging_utils import err, warn
 from rezervo.utils.str_utils import format_name_list_to_natural
 
 MAX_SEARCH_ATTEMPTS = 6
 
+# bookings of full classes are put on the waiting list of the class, if it has one
+BOOKING_ALLOW_WAITING_LIST = True
+
+# outcomes of known error codes of booking responses
+BOOKING_ERROR_CODE_OUTCOMES = {
+    "ALREADY_BOOKED": BookingAttemptOutcome.ALREADY_BOOKED,
+    "CUSTOMER_ALREADY_BOOKED": BookingAttemptOutcome.ALREADY_BOOKED,
+    "GROUP_ACTIVITY_FULL": BookingAttemptOutcome.FULL,
+    "FULLY_BOOKED": BookingAttemptOutcome.FULL,
+    "NO_AVAILABLE_SLOTS": BookingAttemptOutcome.FULL,
+    "BOOKING_NOT_OPEN": BookingAttemptOutcome.NOT_OPEN_YET,
+    "NOT_BOOKABLE_YET": BookingAttemptOutcome.NOT_OPEN_YET,
+    "TOO_EARLY_TO_BOOK": BookingAttemptOutcome.NOT_OPEN_YET,
+    "INVALID_TOKEN": BookingAttemptOutcome.AUTH_EXPIRED,
+    "TOKEN_EXPIRED": BookingAttemptOutcome.AUTH_EXPIRED,
+}
+
+# keywords of other error codes and messages, in order of precedence. A class being full is
+# only recognized by its error codes, as "full" is part of too many unrelated messages.
+BOOKING_ERROR_MESSAGE_KEYWORDS = {
+    BookingAttemptOutcome.ALREADY_BOOKED: ["already", "allerede"],
+    BookingAttemptOutcome.NOT_OPEN_YET: [
+        "not_open",
+        "not open",
+        "not_bookable",
+        "too_early",
+        "ikke åpne",
+    ],
+    BookingAttemptOutcome.AUTH_EXPIRED: ["token", "unauthorized"],
+}
+
+
+def bookings_url(subdomain: BrpSubdomain, auth_result: BrpAuthResult) -> str:
+    return f"{api_url(subdomain)}/customers/{auth_result.username}/bookings/groupactivities"
+
 
 def booking_url(
     subdomain: BrpSubdomain, auth_result: BrpAuthResult, start_time_point: datetime
 ) -> str:
-    return f"https://{subdomain.value}.brpsystems.com/brponline/api/ver3/customers/{auth_result['username']}/bookings/groupactivities?startTimePoint={start_time_point.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%S')}.000Z"
+    return f"{bookings_url(subdomain, auth_result)}?startTimePoint={start_time_point.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%S')}.000Z"
 
 
 def find_brp_class_by_id(
@@ -41,30 +105,58 @@ def find_brp_class_by_id(
     class_id: str,
 ) -> Union[RezervoClass, None, BookingError, AuthenticationError]:
     print(f"Searching for class by id: {class_id}")
-    attempts = 0
-    brp_class = None
-    now = datetime.now()
-    from_date = datetime(now.year, now.month, now.day)
-    batch_size = 7
-    while attempts < MAX_SEARCH_ATTEMPTS:
-        print(f"Searching for class starting at {from_date}")
+    stored_class = find_stored_class_by_id(
+        SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain], class_id
+    )
+    if stored_class is not None:
+        return stored_class
+    start_date = find_brp_class_start_date(subdomain, business_unit, class_id)
+    if start_date is not None:
+        print(f"Searching for class starting at {start_date}")
+        # remembered start dates are local, while schedule windows are in UTC
+        from_date = datetime(start_date.year, start_date.month, start_date.day)
         brp_schedule = fetch_brp_schedule(
-            subdomain, business_unit, days=batch_size, from_date=from_date
-        )
-        if brp_schedule is None:
-            err.log("Class get request failed")
-            return BookingError.ERROR
-        brp_class = next(
-            (c for c in brp_schedule if c.id == int(class_id)),
-            None,
+            subdomain,
+            business_unit,
+            days=2,
+            from_date=from_date - timedelta(days=1),
+            class_ids={int(class_id)},
         )
-        if brp_class is not None:
-            break
-        from_date += timedelta(days=batch_size)
-        attempts += 1
+        if brp_schedule is not None:
+            brp_class = schedule_record_index(brp_schedule).get(int(class_id))
+            if brp_class is not None:
+                return rezervo_class_from_schedule_record(brp_class)
+    now = datetime.now()
+    from_date = datetime(now.year, now.month, now.day)
+    print(f"Searching for class in the {MAX_SEARCH_ATTEMPTS} weeks from {from_date}")
+    brp_schedule = fetch_brp_schedule(
+        subdomain,
+        business_unit,
+        days=MAX_SEARCH_ATTEMPTS * 7,
+        from_date=from_date,
+        class_ids={int(class_id)},
+    )
+    if brp_schedule is None:
+        err.log("Class get request failed")
+        return BookingError.ERROR
+    brp_class = schedule_record_index(brp_schedule).get(int(class_id))
     if brp_class is None:
         return BookingError.CLASS_MISSING
-    return rezervo_class_from_brp_class(subdomain, brp_class)
+    return rezervo_class_from_schedule_record(brp_class)
+
+
+def find_brp_class_start_date(
+    subdomain: BrpSubdomain, business_unit: int, class_id: str
+) -> Optional[date]:
+    remembered_start_date = brp_class_start_dates.get(
+        (subdomain, business_unit, int(class_id))
+    )
+    if remembered_start_date is not None:
+        return remembered_start_date
+    with SessionLocal() as db:
+        return crud.get_session_class_start_date(
+            db, SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain], class_id
+        )
 
 
 def try_find_brp_class(
@@ -72,147 +164,188 @@ def try_find_brp_class(
     business_unit: int,
     _class_config: Class,
 ) -> Union[RezervoClass, BookingError, AuthenticationError]:
-    print(f"Searching for class matching config: {_class_config}")
-    attempts = 0
-    brp_class = None
-    now_date = datetime.now()
-    from_date = datetime(now_date.year, now_date.month, now_date.day)
-    batch_size = 7
-    while attempts < MAX_SEARCH_ATTEMPTS:
-        schedule = fetch_brp_schedule(
-            subdomain, business_unit, days=batch_size, from_date=from_date
-        )
-        if schedule is None:
-            err.log("Schedule get request denied")
-            return BookingError.ERROR
-        search_result = find_brp_class(subdomain, _class_config, schedule)
-        if (
-            search_result is not None
-            and not isinstance(search_result, BookingError)
-            and not isinstance(search_result, AuthenticationError)
-        ):
-            if brp_class is None:
-                brp_class = search_result
-            else:
-                # Check if class has closer booking date than any already found class
-                now = datetime.now().astimezone()
-                new_booking_delta = abs(
-                    now - datetime.fromisoformat(search_result.bookingOpensAt)
-                )
-                existing_booking_delta = abs(
-                    now - datetime.fromisoformat(brp_class.bookingOpensAt)
-                )
-                if new_booking_delta < existing_booking_delta:
-                    brp_class = search_result
-                else:
-                    break
-        from_date += timedelta(days=batch_size)
-        attempts += 1
-    if brp_class is None:
-        err.log("Could not find class matching criteria")
-    return brp_class
+    return try_find_brp_classes(subdomain, business_unit, [_class_config])[0]
 
 
-def find_brp_class(
+def try_find_brp_classes(
     subdomain: BrpSubdomain,
+    business_unit: int,
+    class_configs: list[Class],
+) -> list[Union[RezervoClass, BookingError, AuthenticationError]]:
+    for c in class_configs:
+        print(f"Searching for class matching config: {c}")
+    stored_classes = find_stored_classes(
+        SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain], class_configs
+    )
+    if all(c is not None for c in stored_classes):
+        return [c for c in stored_classes if c is not None]
+    now = datetime.now()
+    schedule = fetch_brp_schedule(
+        subdomain,
+        business_unit,
+        days=MAX_SEARCH_ATTEMPTS * 7,
+        from_date=datetime(now.year, now.month, now.day),
+        activity_ids={c.activity for c in class_configs},
+    )
+    if schedule is None:
+        err.log("Schedule get request denied")
+        return [c if c is not None else BookingError.ERROR for c in stored_classes]
+    schedule_index = schedule_record_index(schedule)
+    return [
+        c if c is not None else find_brp_class(_class_config, schedule_index)
+        for _class_config, c in zip(class_configs, stored_classes)
+    ]
+
+
+def find_brp_class(
     _class_config: Class,
-    schedule: List[BrpClass],
-) -> Union[RezervoClass, BookingError, AuthenticationError]:
+    schedule_index: ScheduleIndex[ScheduleRecord],
+) -> Union[RezervoClass, BookingError]:
+    """
+    Find the class matching the given config with booking opening closest to now
+    """
     if not 0 <= _class_config.weekday < len(WEEKDAYS):
         err.log(f"Invalid weekday number ({_class_config.weekday=})")
         return BookingError.MALFORMED_SEARCH
-    result = None
-    for c in schedule:
-        if c.groupActivityProduct.id != _class_config.activity:
-            continue
-        localized_start_time = datetime.fromisoformat(
-            tz_aware_iso_from_brp_date_str(c.duration.start)
-        ).astimezone(pytz.timezone("Europe/Oslo"))
-        time_matches = (
-            localized_start_time.hour == _class_config.time.hour
-            and localized_start_time.minute == _class_config.time.minute
+    matches = schedule_index.find_by_config(_class_config)
+    if len(matches) == 0:
+        err.log("Could not find class matching criteria")
+        activity_classes = schedule_index.find_by_activity(_class_config.activity)
+        if len(activity_classes) == 0:
+            return BookingError.CLASS_MISSING
+        if any(
+            c.start.hour == _class_config.time.hour
+            and c.start.minute == _class_config.time.minute
+            for c in activity_classes
+        ):
+            print("Found class, but weekday did not match")
+            return BookingError.MISSING_SCHEDULE_DAY
+        print("Found class, but start time did not match")
+        return BookingError.INCORRECT_START_TIME
+    now = datetime.now().astimezone()
+    c = min(matches, key=lambda m: abs(now - m.booking_opens_at))
+    search_feedback = f'Found class: "{c.name}"'
+    if len(c.instructors) > 0:
+        search_feedback += f" with {format_name_list_to_natural(list(c.instructors))}"
+    else:
+        search_feedback += " (missing instructor)"
+    search_feedback += f" at {c.start}"
+    print(search_feedback)
+    return rezervo_class_from_schedule_record(c)
+
+
+def classify_brp_booking_response(
+    response: requests.Response, allow_waiting_list: bool
+) -> BookingAttemptOutcome:
+    status_outcome = classify_booking_response_status(response)
+    if status_outcome is not None:
+        return status_outcome
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if response.status_code == requests.codes.CREATED:
+        if (
+            isinstance(body, dict)
+            and body.get("type") == BookingType.WAITING_LIST.value
+        ):
+            return BookingAttemptOutcome.WAITLISTED
+        return BookingAttemptOutcome.BOOKED
+    error_code = body.get("errorCode") if isinstance(body, dict) else None
+    if isinstance(error_code, str) and error_code in BOOKING_ERROR_CODE_OUTCOMES:
+        outcome = BOOKING_ERROR_CODE_OUTCOMES[error_code]
+    else:
+        outcome = classify_booking_error_message(
+            error_code if isinstance(error_code, str) else response.text,
+            BOOKING_ERROR_MESSAGE_KEYWORDS,
         )
-        if not time_matches:
-            print(f"Found class, but start time did not match: {c}")
-            result = BookingError.INCORRECT_START_TIME
-            continue
-        if localized_start_time.weekday() != _class_config.weekday:
-            print(f"Found class, but weekday did not match: {c}")
-            result = BookingError.MISSING_SCHEDULE_DAY
-            continue
-        search_feedback = f'Found class: "{c.name}"'
-        if len(c.instructors) > 0:
-            search_feedback += (
-                f" with {format_name_list_to_natural([i.name for i in c.instructors])}"
-            )
-        else:
-            search_feedback += " (missing instructor)"
-        search_feedback += f" at {c.duration.start}"
-        print(search_feedback)
-        return rezervo_class_from_brp_class(subdomain, c)
-    return result
-
-
-def book_brp_class(
-    subdomain: BrpSubdomain, auth_result: BrpAuthResult, class_id: int
-) -> bool:
-    response = requests.post(
+    if outcome is BookingAttemptOutcome.FULL and allow_waiting_list:
+        # the waiting list may not accept bookings yet, so retrying can still join it
+        return BookingAttemptOutcome.TRANSIENT
+    return outcome
+
+
+def prepare_brp_booking_request(
+    subdomain: BrpSubdomain,
+    auth_result: BrpAuthResult,
+    class_id: int,
+    allow_waiting_list: bool,
+) -> requests.PreparedRequest:
+    return get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]).prepare(
+        "POST",
         booking_url(subdomain, auth_result, datetime.now()),
-        json={"groupActivity": class_id, "allowWaitingList": True},
+        json={"groupActivity": class_id, "allowWaitingList": allow_waiting_list},
         headers={
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {auth_result['access_token']}",
+            "Authorization": f"Bearer {auth_result.access_token}",
         },
     )
-    if response.status_code != 201:
-        err.log("Booking attempt failed: " + response.text)
-        return False
-    return True
 
 
-def try_book_brp_class(
+def try_authenticate_brp_booking(
+    subdomain: BrpSubdomain, integration_user: IntegrationUser, config: ConfigValue
+) -> Union[BookingAuth, AuthenticationError]:
+    print("Authenticating...")
+    booking_auth = try_authenticate(
+        # a stored token is reused as long as it would not have to be renewed before
+        # booking, when booking is prepared
+        lambda iu: authenticate_integration_user(
+            subdomain,
+            iu,
+            BOOKING_PREPARE_SECONDS_BEFORE_OPENING + BOOKING_AUTH_MIN_VALIDITY_SECONDS,
+        ),
+        integration_user,
+        config.auth.max_attempts,
+    )
+    if isinstance(booking_auth, AuthenticationError):
+        err.log("Authentication failed")
+    return booking_auth
+
+
+def prepare_brp_booking(
     subdomain: BrpSubdomain,
     integration_user: IntegrationUser,
     _class: RezervoClass,
     config: ConfigValue,
-) -> Union[None, BookingError, AuthenticationError]:
-    max_attempts = config.booking.max_attempts
-    if max_attempts < 1:
+    booking_auth: BookingAuth,
+) -> Union[PreparedBooking, BookingError]:
+    if config.booking.max_attempts < 1:
         err.log("Max booking attempts should be a positive number")
         return BookingError.INVALID_CONFIG
-    print("Authenticating...")
-    auth_result = try_authenticate(
-        lambda iu: authenticate(subdomain, iu.username, iu.password),
-        integration_user,
-        config.auth.max_attempts,
+
+    def classify_response(response: requests.Response) -> BookingAttemptOutcome:
+        outcome = classify_brp_booking_response(response, BOOKING_ALLOW_WAITING_LIST)
+        if outcome is BookingAttemptOutcome.AUTH_EXPIRED:
+            forget_stored_auth(integration_user)
+        return outcome
+
+    return PreparedBooking(
+        client=get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]),
+        request=prepare_brp_booking_request(
+            subdomain, booking_auth.credentials, _class.id, BOOKING_ALLOW_WAITING_LIST
+        ),
+        classify_response=classify_response,
+        on_booked=lambda: notify_booking(config.notifications, _class)
+        if config.notifications
+        else False,
     )
-    if isinstance(auth_result, AuthenticationError):
-        err.log("Authentication failed")
-        return auth_result
-    booked = False
-    attempts = 0
-    while not booked:
-        booked = book_brp_class(subdomain, auth_result, _class.id)
-        attempts += 1
-        if booked:
-            break
-        if attempts >= max_attempts:
-            break
-        sleep_seconds = 2**attempts
-        print(f"Exponential backoff, retrying in {sleep_seconds} seconds...")
-        time.sleep(sleep_seconds)
-    if not booked:
-        err.log(
-            f"Booking failed after {attempts} attempt" + ("s" if attempts != 1 else "")
-        )
-        return BookingError.ERROR
-    print(
-        "Successfully booked class"
-        + (f" after {attempts} attempts!" if attempts != 1 else "!")
+
+
+def try_book_brp_class(
+    subdomain: BrpSubdomain,
+    integration_user: IntegrationUser,
+    _class: RezervoClass,
+    config: ConfigValue,
+) -> Union[None, BookingError, AuthenticationError]:
+    booking_auth = try_authenticate_brp_booking(subdomain, integration_user, config)
+    if isinstance(booking_auth, AuthenticationError):
+        return booking_auth
+    prepared_booking = prepare_brp_booking(
+        subdomain, integration_user, _class, config, booking_auth
     )
-    if config.notifications:
-        notify_booking(config.notifications, _class)
-    return None
+    if isinstance(prepared_booking, BookingError):
+        return prepared_booking
+    return send_prepared_booking(prepared_booking, config.booking)
 
 
 def cancel_brp_booking(
@@ -222,13 +355,17 @@ def cancel_brp_booking(
     booking_type: BookingType,
 ) -> bool:
     print(f"Cancelling booking of class {booking_reference}")
-    res = requests.delete(
-        f"{booking_url(subdomain, auth_result)}/{booking_reference}?bookingType={booking_type}",
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {auth_result['access_token']}",
-        },
-    )
+    try:
+        res = get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]).delete(
+            f"{bookings_url(subdomain, auth_result)}/{booking_reference}?bookingType={booking_type.value}",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {auth_result.access_token}",
+            },
+        )
+    except requests.exceptions.RequestException as e:
+        err.log("Booking cancellation attempt failed", e)
+        return False
     if res.status_code != requests.codes.NO_CONTENT:
         err.log("Booking cancellation attempt failed: " + res.text)
         return False
@@ -245,20 +382,42 @@ def try_cancel_brp_booking(
         err.log("Max booking cancellation attempts should be a positive number")
         return BookingError.INVALID_CONFIG
     print("Authenticating...")
-    auth_result = try_authenticate(
-        lambda iu: authenticate(subdomain, iu.username, iu.password),
+    auth = try_authenticate(
+        lambda iu: authenticate_integration_user(subdomain, iu),
         integration_user,
         config.auth.max_attempts,
     )
-    if isinstance(auth_result, AuthenticationError):
+    if isinstance(auth, AuthenticationError):
         err.log("Authentication failed")
-        return auth_result
+        return auth
+    auth_result = auth.credentials
+    with SessionLocal() as db:
+        stored_session = crud.get_user_session(
+            db,
+            SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain],
+            integration_user.user_id,
+            str(_class.id),
+        )
+    if (
+        stored_session is not None
+        and stored_session.booking_reference is not None
+        and stored_session.booking_type is not None
+    ):
+        if cancel_brp_booking(
+            subdomain,
+            auth_result,
+            int(stored_session.booking_reference),
+            BookingType(stored_session.booking_type),
+        ):
+            print("Successfully cancelled booking!")
+            return None
+        warn.log("Cancellation by stored booking reference failed, looking it up")
     try:
-        res = requests.get(
+        res = get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]).get(
             booking_url(subdomain, auth_result, datetime.now()),
             headers={
                 "Content-Type": "application/json",
-                "Authorization": f"Bearer {auth_result['access_token']}",
+                "Authorization": f"Bearer {auth_result.access_token}",
             },
         )
     except requests.exceptions.RequestException as e:
@@ -272,8 +431,8 @@ def try_cancel_brp_booking(
     booking_type = None
     for booking in bookings_response:
         if booking["groupActivity"]["id"] == _class.id:
-            booking_type = booking["type"]
-            booking_id = booking[booking_type]["id"]
+            booking_type = BookingType(booking["type"])
+            booking_id = booking[booking_type.value]["id"]
             break
     if booking_id is None or booking_type is None:
         err.log(
@@ -0,0 +1,6 @@
+from rezervo.providers.brpsystems.schema import BrpSubdomain
+from rezervo.settings import get_settings
+
+
+def api_url(subdomain: BrpSubdomain) -> str:
+    return f"{get_settings().BRP_BASE_URL_TEMPLATE.format(subdomain=subdomain.value)}/brponline/api/ver3"
@@ -1,9 +1,13 @@
 from rezervo.providers.brpsystems.booking import (
     find_brp_class_by_id,
+    prepare_brp_booking,
+    try_authenticate_brp_booking,
     try_book_brp_class,
     try_cancel_brp_booking,
     try_find_brp_class,
+    try_find_brp_classes,
 )
+from rezervo.providers.brpsystems.schedule import fetch_brp_rezervo_schedule
 from rezervo.providers.brpsystems.schema import (
     BrpSubdomain,
     rezervo_class_from_brp_class,
@@ -20,6 +24,15 @@ def get_brp_provider(subdomain: BrpSubdomain, business_unit: int):
         find_class=lambda class_config: try_find_brp_class(
             subdomain, business_unit, class_config
         ),
+        find_classes=lambda class_configs: try_find_brp_classes(
+            subdomain, business_unit, class_configs
+        ),
+        authenticate_booking=lambda integration_user, config: try_authenticate_brp_booking(
+            subdomain, integration_user, config
+        ),
+        prepare_booking=lambda integration_user, _class, config, booking_auth: prepare_brp_booking(
+            subdomain, integration_user, _class, config, booking_auth
+        ),
         book_class=lambda integration_user, _class, config: try_book_brp_class(
             subdomain, integration_user, _class, config
         ),
@@ -29,6 +42,9 @@ def get_brp_provider(subdomain: BrpSubdomain, business_unit: int):
         fetch_sessions=lambda user_id: fetch_brp_sessions(
             subdomain, business_unit, user_id
         ),
+        fetch_schedule=lambda from_date, days: fetch_brp_rezervo_schedule(
+            subdomain, business_unit, from_date, days
+        ),
         rezervo_class_from_class_data=lambda brp_class: rezervo_class_from_brp_class(
             subdomain, brp_class
         ),
@@ -1,50 +1,167 @@
-from datetime import datetime, timedelta
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Collection, List, Optional, Union
 from urllib.parse import urlencode
 
+import orjson
 import requests
 
+from rezervo.consts import SCHEDULE_CACHE_TTL_SECONDS
+from rezervo.providers.brpsystems.consts import api_url
 from rezervo.providers.brpsystems.schema import (
-    BrpClass,
+    SUBDOMAIN_TO_INTEGRATION_IDENTIFIER,
     BrpSubdomain,
+    brp_schedule_record_from_raw,
+    local_time_from_brp_date_str,
 )
+from rezervo.providers.http_client import get_http_client
+from rezervo.providers.schedule_cache import ScheduleCache
+from rezervo.schemas.schedule import ScheduleRecord
+from rezervo.utils.logging_utils import err
 
 BRP_MAX_SCHEDULE_DAYS_PER_FETCH = 14
+BRP_MAX_CONCURRENT_SCHEDULE_FETCHES = 4
+BRP_MAX_REMEMBERED_CLASS_START_DATES = 10_000
+
+# schedule items as returned by the BRP API, only parsed into models after filtering
+BrpRawClass = dict[str, Any]
+
+brp_schedule_cache: ScheduleCache[list[BrpRawClass]] = ScheduleCache(
+    "brpsystems", SCHEDULE_CACHE_TTL_SECONDS
+)
+
+# start dates of fetched classes by (subdomain, business unit, class id), to look up classes by id
+brp_class_start_dates: dict[tuple[BrpSubdomain, int, int], date] = {}
 
 
 def classes_schedule_url(subdomain: BrpSubdomain, business_unit: int) -> str:
-    return f"https://{subdomain.value}.brpsystems.com/brponline/api/ver3/businessunits/{business_unit}/groupactivities"
+    return f"{api_url(subdomain)}/businessunits/{business_unit}/groupactivities"
 
 
 def fetch_brp_schedule(
-    subdomain: BrpSubdomain, business_unit: int, days: int, from_date: datetime = None
-) -> Union[List[BrpClass], None]:
-    classes: list[BrpClass] = []
+    subdomain: BrpSubdomain,
+    business_unit: int,
+    days: int,
+    from_date: datetime = None,
+    activity_ids: Optional[Collection[int]] = None,
+    class_ids: Optional[Collection[int]] = None,
+) -> Union[List[ScheduleRecord], None]:
+    """
+    Fetch the schedule, only parsing classes matching the given activity and class ids (if any)
+    """
     if from_date is None:
         now = datetime.utcnow()
         from_date = datetime(now.year, now.month, now.day)
+    # whole days are cached, so include the first day in full if starting mid-day
+    whole_days = days + (1 if from_date.time() != datetime.min.time() else 0)
+    schedule_days = brp_schedule_cache.get(
+        (subdomain, business_unit),
+        from_date.date(),
+        whole_days,
+        lambda batch_from_date, batch_days: fetch_brp_schedule_days(
+            subdomain, business_unit, batch_days, batch_from_date
+        ),
+    )
+    now = datetime.now().astimezone()
+    return [
+        brp_schedule_record_from_raw(subdomain, item, now)
+        for day in schedule_days
+        for item in day
+        if is_matching_raw_brp_class(item, activity_ids, class_ids)
+    ]
+
+
+def is_matching_raw_brp_class(
+    item: BrpRawClass,
+    activity_ids: Optional[Collection[int]],
+    class_ids: Optional[Collection[int]],
+) -> bool:
+    return (
+        activity_ids is None or item["groupActivityProduct"]["id"] in activity_ids
+    ) and (class_ids is None or item["id"] in class_ids)
+
+
+def fetch_brp_schedule_batch(
+    subdomain: BrpSubdomain, business_unit: int, from_date: datetime, to_date: datetime
+) -> list[BrpRawClass]:
+    query_params = {
+        "period.start": from_date.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z",
+        "period.end": to_date.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z",
+    }
+    res = get_http_client(SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]).get(
+        f"{classes_schedule_url(subdomain, business_unit)}?{urlencode(query_params)}"
+    )
+    if res.status_code != requests.codes.OK:
+        raise Exception("Failed to fetch brp schedule")
+    return [
+        item
+        for item in orjson.loads(res.content)
+        if item.get("bookableEarliest") is not None
+        and item.get("bookableLatest") is not None
+    ]
+
+
+def fetch_brp_schedule_days(
+    subdomain: BrpSubdomain, business_unit: int, days: int, from_date: date
+) -> dict[date, list[BrpRawClass]]:
+    batch_periods = []
+    batch_from_date = datetime(from_date.year, from_date.month, from_date.day)
     days_left = days
     while days_left > 0:
         batch_size = min(BRP_MAX_SCHEDULE_DAYS_PER_FETCH, days_left)
         days_left -= batch_size
-        to_date = from_date + timedelta(days=batch_size)
-        query_params = {
-            "period.start": from_date.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z",
-            "period.end": to_date.strftime("%Y-%m-%dT%H:%M:%S") + ".000Z",
-        }
-        res = requests.get(
-            f"{classes_schedule_url(subdomain, business_unit)}?{urlencode(query_params)}"
+        batch_to_date = batch_from_date + timedelta(days=batch_size)
+        batch_periods.append((batch_from_date, batch_to_date))
+        batch_from_date = batch_to_date
+    with ThreadPoolExecutor(
+        max_workers=min(BRP_MAX_CONCURRENT_SCHEDULE_FETCHES, len(batch_periods))
+    ) as executor:
+        batches = executor.map(
+            lambda period: fetch_brp_schedule_batch(
+                subdomain, business_unit, period[0], period[1]
+            ),
+            batch_periods,
         )
-        if res.status_code != requests.codes.OK:
-            raise Exception("Failed to fetch brp schedule")
-        classes.extend(
-            [
-                BrpClass(**item)
-                for item in res.json()
-                if item.get("bookableEarliest") is not None
-                and item.get("bookableLatest") is not None
-            ]
+        schedule_days: dict[date, list[BrpRawClass]] = {
+            from_date + timedelta(days=i): [] for i in range(days)
+        }
+        class_ids = set()
+        for batch in batches:
+            for item in batch:
+                # classes might be included in multiple batches
+                if item["id"] in class_ids:
+                    continue
+                class_ids.add(item["id"])
+                start_date = date.fromisoformat(item["duration"]["start"][:10])
+                if start_date in schedule_days:
+                    schedule_days[start_date].append(item)
+    remember_brp_class_start_dates(
+        subdomain, business_unit, [c for day in schedule_days.values() for c in day]
+    )
+    return schedule_days
+
+
+def remember_brp_class_start_dates(
+    subdomain: BrpSubdomain, business_unit: int, items: List[BrpRawClass]
+):
+    if len(brp_class_start_dates) > BRP_MAX_REMEMBERED_CLASS_START_DATES:
+        brp_class_start_dates.clear()
+    for item in items:
+        brp_class_start_dates[
+            (subdomain, business_unit, item["id"])
+        ] = local_time_from_brp_date_str(item["duration"]["start"]).date()
+
+
+def fetch_brp_rezervo_schedule(
+    subdomain: BrpSubdomain, business_unit: int, from_date: date, days: int
+) -> Optional[list[ScheduleRecord]]:
+    try:
+        return fetch_brp_schedule(
+            subdomain,
+            business_unit,
+            days,
+            datetime(from_date.year, from_date.month, from_date.day),
         )
-        from_date = to_date
-    # TODO: handle unlikely duplicates (if somehow classes are included in multiple batches)
-    return classes
+    except Exception as e:
+        err.log("Failed to fetch brp schedule", e)
+        return None
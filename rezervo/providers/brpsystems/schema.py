@@ -1,14 +1,21 @@
 import enum
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional, Union
+from typing import Any, List, Optional, Union
 
 import pytz
 from pydantic import BaseModel
 
 from rezervo.models import SessionState
 from rezervo.schemas.config.user import IntegrationIdentifier
-from rezervo.schemas.schedule import RezervoClass, RezervoInstructor, RezervoStudio
+from rezervo.schemas.schedule import (
+    RezervoClass,
+    RezervoInstructor,
+    RezervoStudio,
+    ScheduleRecord,
+    local_iso_from_datetime,
+)
+from rezervo.utils.time_utils import local_timezone
 
 
 class BrpSubdomain(enum.Enum):
@@ -210,19 +217,21 @@ def session_state_from_brp(
     return SessionState.UNKNOWN
 
 
+def utc_time_from_brp_date_str(date: str) -> datetime:
+    return datetime.fromisoformat(date.replace("Z", "")).replace(tzinfo=pytz.UTC)
+
+
 def tz_aware_iso_from_brp_date_str(date: str) -> str:
-    return pytz.UTC.localize(datetime.fromisoformat(date.replace("Z", ""))).isoformat()
+    return utc_time_from_brp_date_str(date).isoformat()
+
+
+def local_time_from_brp_date_str(date: str) -> datetime:
+    return utc_time_from_brp_date_str(date).astimezone(local_timezone())
 
 
 # TODO: this should be replaced when timezones are handled properly
 def human_iso_from_brp_date_str(date: str) -> str:
-    return (
-        pytz.UTC.localize(datetime.fromisoformat(date.replace("Z", "")))
-        .astimezone(pytz.timezone("Europe/Oslo"))
-        .replace(tzinfo=None)
-        .isoformat()
-        .replace("T", " ")
-    )
+    return local_iso_from_datetime(local_time_from_brp_date_str(date))
 
 
 def rezervo_class_from_brp_class(
@@ -241,12 +250,35 @@ def rezervo_class_from_brp_class(
             name=brp_class.businessUnit.name,
         ),
         userStatus=None,
-        bookable=datetime.fromisoformat(
-            tz_aware_iso_from_brp_date_str(brp_class.bookableEarliest)
-        )
+        bookable=utc_time_from_brp_date_str(brp_class.bookableEarliest)
         < datetime.now().astimezone()
-        < datetime.fromisoformat(
-            tz_aware_iso_from_brp_date_str(brp_class.bookableLatest)
-        ),
+        < utc_time_from_brp_date_str(brp_class.bookableLatest),
         bookingOpensAt=tz_aware_iso_from_brp_date_str(brp_class.bookableEarliest),
     )
+
+
+def brp_schedule_record_from_raw(
+    subdomain: BrpSubdomain, item: dict[str, Any], now: Optional[datetime] = None
+) -> ScheduleRecord:
+    """
+    Build a schedule record directly from a raw schedule item, without parsing it into a
+    `BrpClass` first
+    """
+    if now is None:
+        now = datetime.now().astimezone()
+    bookable_earliest = utc_time_from_brp_date_str(item["bookableEarliest"])
+    bookable_latest = utc_time_from_brp_date_str(item["bookableLatest"])
+    return ScheduleRecord(
+        integration=SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain],
+        id=item["id"],
+        name=item["groupActivityProduct"]["name"],
+        activity_id=item["groupActivityProduct"]["id"],
+        start=local_time_from_brp_date_str(item["duration"]["start"]),
+        end=local_time_from_brp_date_str(item["duration"]["end"]),
+        studio_id=item["businessUnit"]["id"],
+        studio_name=item["businessUnit"]["name"],
+        instructors=tuple(i["name"] for i in item["instructors"]),
+        user_status=None,
+        bookable=bookable_earliest < now < bookable_latest,
+        booking_opens_at=bookable_earliest,
+    )
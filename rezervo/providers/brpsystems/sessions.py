@@ -3,7 +3,6 @@ from typing import List, Optional
 from uuid import UUID
 
 import pydantic
-import pytz
 import requests
 
 from rezervo import models
@@ -11,24 +10,26 @@ from rezervo.consts import PLANNED_SESSIONS_NEXT_WHOLE_WEEKS
 from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError
 from rezervo.models import SessionState
-from rezervo.providers.brpsystems.auth import authenticate
+from rezervo.providers.brpsystems.auth import (
+    authenticate_integration_user,
+    forget_stored_auth,
+)
 from rezervo.providers.brpsystems.booking import booking_url
-from rezervo.providers.brpsystems.schedule import fetch_brp_schedule
+from rezervo.providers.brpsystems.schedule import fetch_brp_rezervo_schedule
 from rezervo.providers.brpsystems.schema import (
     SUBDOMAIN_TO_INTEGRATION_IDENTIFIER,
     BookingData,
-    BrpClass,
     BrpSubdomain,
-    rezervo_class_from_brp_class,
     session_state_from_brp,
-    tz_aware_iso_from_brp_date_str,
 )
+from rezervo.providers.helpers import get_schedule, get_user_planned_classes
+from rezervo.providers.http_client import get_http_client
+from rezervo.providers.schedule_index import schedule_record_index
 from rezervo.schemas.config.user import (
-    IntegrationConfig,
     IntegrationUser,
     get_integration_config_from_integration_user,
 )
-from rezervo.schemas.schedule import UserSession
+from rezervo.schemas.schedule import UserSession, rezervo_class_from_schedule_record
 from rezervo.utils.logging_utils import err
 from rezervo.utils.time_utils import total_days_for_next_whole_weeks
 
@@ -36,12 +37,15 @@ from rezervo.utils.time_utils import total_days_for_next_whole_weeks
 def fetch_brp_sessions(
     subdomain: BrpSubdomain, business_unit: int, user_id: Optional[UUID] = None
 ) -> dict[UUID, list[UserSession]]:
-    brp_schedule = fetch_brp_schedule(
-        subdomain,
-        business_unit,
-        days=total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS),
-        from_date=datetime.now() - timedelta(weeks=1),
+    brp_schedule = get_schedule(
+        SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain],
+        (datetime.now() - timedelta(weeks=1)).date(),
+        total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS),
+        lambda from_date, days: fetch_brp_rezervo_schedule(
+            subdomain, business_unit, from_date, days
+        ),
     )
+    schedule_index = schedule_record_index(brp_schedule or [])
     with SessionLocal() as db:
         db_brp_users_query = db.query(models.IntegrationUser).filter(
             models.IntegrationUser.integration
@@ -55,21 +59,24 @@ def fetch_brp_sessions(
         sessions: dict[UUID, list[UserSession]] = {}
         for db_brp_user in db_brp_users:
             brp_user: IntegrationUser = IntegrationUser.from_orm(db_brp_user)
-            auth_result = authenticate(subdomain, brp_user.username, brp_user.password)
-            if isinstance(auth_result, AuthenticationError):
+            auth = authenticate_integration_user(subdomain, brp_user)
+            if isinstance(auth, AuthenticationError):
                 err.log(
                     f"Authentication failed for '{brp_user.username}', abort user sessions pull!"
                 )
                 continue
+            auth_result = auth.credentials
             try:
-                res = requests.get(
+                res = get_http_client(
+                    SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain]
+                ).get(
                     booking_url(
                         subdomain,
                         auth_result,
                         start_time_point=datetime.now() - timedelta(weeks=1),
                     ),
                     headers={
-                        "Authorization": f"Bearer {auth_result['access_token']}",
+                        "Authorization": f"Bearer {auth_result.access_token}",
                     },
                 )
             except requests.exceptions.RequestException as e:
@@ -78,31 +85,42 @@ def fetch_brp_sessions(
                     e,
                 )
                 continue
+            if res.status_code == requests.codes.UNAUTHORIZED:
+                err.log(
+                    f"Token of '{brp_user.username}' was rejected, abort user sessions pull!"
+                )
+                forget_stored_auth(brp_user)
+                continue
             bookings_response: List[BookingData] = res.json()
             brp_sessions = []
             for s in bookings_response:
                 brp_sessions.append(pydantic.parse_obj_as(BookingData, s))
             past_and_imminent_sessions = []
             for s in brp_sessions:
-                brp_class = next(
-                    filter(lambda c: c.id == s.groupActivity.id, brp_schedule),
-                    None,
-                )
+                brp_class = schedule_index.get(s.groupActivity.id)
                 if brp_class is None:
                     continue
+                booking = getattr(s, s.type.value)
                 past_and_imminent_sessions.append(
                     UserSession(
                         integration=SUBDOMAIN_TO_INTEGRATION_IDENTIFIER[subdomain],
                         class_id=s.groupActivity.id,
                         user_id=brp_user.user_id,
                         status=session_state_from_brp(s.type, s.checkedIn),
-                        class_data=rezervo_class_from_brp_class(subdomain, brp_class),
+                        class_data=rezervo_class_from_schedule_record(brp_class),
+                        booking_reference=str(booking.id)
+                        if booking is not None
+                        else None,
+                        booking_type=s.type.value,
                     )
                 )
+            past_and_imminent_class_ids = {
+                s.class_id for s in past_and_imminent_sessions
+            }
             planned_sessions = (
-                get_user_planned_sessions_from_schedule(
+                get_user_planned_classes(
                     get_integration_config_from_integration_user(brp_user),
-                    brp_schedule,
+                    schedule_index,
                 )
                 if brp_schedule is not None
                 else []
@@ -113,38 +131,10 @@ def fetch_brp_sessions(
                     class_id=p.id,
                     user_id=brp_user.user_id,
                     status=SessionState.PLANNED,
-                    class_data=rezervo_class_from_brp_class(subdomain, p),
+                    class_data=rezervo_class_from_schedule_record(p),
                 )
                 for p in planned_sessions
-                if p.id not in [s.class_id for s in past_and_imminent_sessions]
+                if str(p.id) not in past_and_imminent_class_ids
             ]
             sessions[brp_user.user_id] = user_sessions
     return sessions
-
-
-def get_user_planned_sessions_from_schedule(
-    integration_config: IntegrationConfig, schedule: List[BrpClass]
-) -> list[BrpClass]:
-    if not integration_config.active:
-        return []
-    classes: list[BrpClass] = []
-    for c in schedule:
-        for uc in integration_config.classes:
-            if c.groupActivityProduct.id != uc.activity:
-                continue
-            start_time = datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(c.duration.start)
-            ).astimezone(pytz.timezone("Europe/Oslo"))
-            time_matches = (
-                start_time.hour == uc.time.hour and start_time.minute == uc.time.minute
-            )
-            if not time_matches:
-                continue
-            opening_time = datetime.fromisoformat(
-                tz_aware_iso_from_brp_date_str(c.bookableEarliest)
-            )
-            # check if opening_time is in the past (if so, it is either already booked or will not be booked)
-            if opening_time < datetime.now().astimezone():
-                continue
-            classes.append(c)
-    return classes
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+from rezervo.consts import (
+    CLOCK_SKEW_MAX_CORRECTION_SECONDS,
+    CLOCK_SKEW_MAX_SAMPLES,
+    CLOCK_SKEW_SAMPLE_MAX_AGE_SECONDS,
+)
+from rezervo.utils.logging_utils import warn
+
+# (local wall-clock time when sent, local wall-clock time when received, upstream Date)
+ClockSample = tuple[float, float, float]
+
+
+class ClockSkewEstimate:
+    """
+    Estimate of the offset between the clock of an upstream and our clock, from the `Date`
+    headers of its responses.
+
+    A `Date` header has a resolution of one second, and was generated at some point between
+    sending the request and receiving the response. Each sample thus bounds the offset to
+    an interval, and the estimate is the midpoint of the intersection of recent samples.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._samples: deque[ClockSample] = deque(maxlen=CLOCK_SKEW_MAX_SAMPLES)
+
+    def add_response(self, sent_at: float, response: requests.Response):
+        received_at = time.time()
+        date_header = response.headers.get("Date")
+        if date_header is None:
+            return
+        try:
+            upstream_time = parsedate_to_datetime(date_header).timestamp()
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            self._samples.append((sent_at, received_at, upstream_time))
+
+    def bounds(self) -> Optional[tuple[float, float]]:
+        """
+        Lower and upper bound of the offset (upstream clock minus ours) in seconds
+        """
+        with self._lock:
+            samples = list(self._samples)
+        oldest_sent_at = time.time() - CLOCK_SKEW_SAMPLE_MAX_AGE_SECONDS
+        lower, upper = None, None
+        # newest first, so a contradicting older sample (e.g. after the upstream clock was
+        # adjusted) ends the intersection instead of emptying it
+        for sent_at, received_at, upstream_time in reversed(samples):
+            if sent_at < oldest_sent_at:
+                break
+            sample_lower = upstream_time - received_at
+            sample_upper = upstream_time + 1 - sent_at
+            if lower is not None and upper is not None:
+                if sample_lower > upper or sample_upper < lower:
+                    break
+                sample_lower = max(lower, sample_lower)
+                sample_upper = min(upper, sample_upper)
+            lower, upper = sample_lower, sample_upper
+        if lower is None or upper is None:
+            return None
+        return lower, upper
+
+    def offset_seconds(self) -> Optional[float]:
+        bounds = self.bounds()
+        if bounds is None:
+            return None
+        return (bounds[0] + bounds[1]) / 2
+
+    def local_time(self, upstream_time: datetime) -> datetime:
+        """
+        Our time at which the upstream clock shows the given time
+        """
+        offset = self.offset_seconds()
+        if offset is None:
+            return upstream_time
+        if abs(offset) > CLOCK_SKEW_MAX_CORRECTION_SECONDS:
+            warn.log(f"Ignoring implausible estimate. {self.describe()}")
+            return upstream_time
+        return upstream_time - timedelta(seconds=offset)
+
+    def describe(self) -> str:
+        bounds = self.bounds()
+        if bounds is None:
+            return f"Clock skew of '{self.name}': no recent samples"
+        lower, upper = bounds
+        return (
+            f"Clock skew of '{self.name}': {(lower + upper) / 2 * 1000:+.0f} ms "
+            f"(± {(upper - lower) / 2 * 1000:.0f} ms)"
+        )
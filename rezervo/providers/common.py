@@ -1,10 +1,12 @@
+import asyncio
 from typing import Any, Optional, Union
 
 from rezervo import models
-from rezervo.active_integrations import get_integration
+from rezervo.active_integrations import get_async_integration, get_integration
 from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError, BookingError
 from rezervo.notify.slack import delete_scheduled_dm_slack, notify_cancellation_slack
+from rezervo.providers.provider import BookingAuth, PreparedBooking
 from rezervo.schemas.config.config import ConfigValue, Slack
 from rezervo.schemas.config.user import Class, IntegrationIdentifier, IntegrationUser
 from rezervo.schemas.schedule import RezervoClass
@@ -25,6 +27,12 @@ def find_class(
     return get_integration(integration).find_class(_class_config)
 
 
+def find_classes(
+    integration: IntegrationIdentifier, class_configs: list[Class]
+) -> list[Union[RezervoClass, BookingError, AuthenticationError]]:
+    return get_integration(integration).find_classes(class_configs)
+
+
 def book_class(
     integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
 ) -> Union[None, BookingError, AuthenticationError]:
@@ -33,6 +41,25 @@ def book_class(
     )
 
 
+def authenticate_booking(
+    integration_user: IntegrationUser, config: ConfigValue
+) -> Union[BookingAuth, AuthenticationError]:
+    return get_integration(integration_user.integration).authenticate_booking(
+        integration_user, config
+    )
+
+
+def prepare_booking(
+    integration_user: IntegrationUser,
+    _class: RezervoClass,
+    config: ConfigValue,
+    booking_auth: BookingAuth,
+) -> Union[PreparedBooking, BookingError]:
+    return get_integration(integration_user.integration).prepare_booking(
+        integration_user, _class, config, booking_auth
+    )
+
+
 def cancel_booking(
     integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
 ) -> Union[None, BookingError, AuthenticationError]:
@@ -51,6 +78,43 @@ def cancel_booking(
     return res
 
 
+async def find_authed_class_by_id_async(
+    integration_user: IntegrationUser, config: ConfigValue, class_id: str
+) -> Union[RezervoClass, BookingError, AuthenticationError]:
+    return await get_async_integration(
+        integration_user.integration
+    ).find_authed_class_by_id(integration_user, config, class_id)
+
+
+async def book_class_async(
+    integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
+) -> Union[None, BookingError, AuthenticationError]:
+    return await get_async_integration(integration_user.integration).book_class(
+        integration_user, _class, config
+    )
+
+
+async def cancel_booking_async(
+    integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
+) -> Union[None, BookingError, AuthenticationError]:
+    res = await get_async_integration(integration_user.integration).cancel_booking(
+        integration_user, _class, config
+    )
+    if res is None:
+        if config.notifications is not None and config.notifications.slack is not None:
+            await asyncio.to_thread(
+                update_slack_notifications_with_cancellation,
+                integration_user.integration,
+                _class,
+                config.notifications.slack,
+            )
+        else:
+            warn.log(
+                "Slack notifications config not specified, no Slack notifications will updated after cancellation!"
+            )
+    return res
+
+
 def update_slack_notifications_with_cancellation(
     integration: IntegrationIdentifier, _class: RezervoClass, slack_config: Slack
 ):
@@ -1,9 +1,44 @@
+import random
+import threading
 import time
-from typing import Callable, TypeVar, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional, TypeVar, Union
 
-from rezervo.errors import AuthenticationError
-from rezervo.schemas.config.user import IntegrationUser
+import requests
+
+from rezervo.consts import (
+    BOOKING_MAX_BACKOFF_SECONDS,
+    HTTP_KEEP_WARM_INTERVAL_SECONDS,
+    HTTP_KEEP_WARM_LEAD_SECONDS,
+    PRECISE_TIMER_SPIN_NS,
+)
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.providers.provider import (
+    RETRYABLE_BOOKING_ATTEMPT_OUTCOMES,
+    SUCCESSFUL_BOOKING_ATTEMPT_OUTCOMES,
+    BookingAttemptOutcome,
+    PreparedBooking,
+)
+from rezervo.providers.rate_limit import RequestPriority
+from rezervo.providers.schedule_index import ScheduleIndex, schedule_record_index
+from rezervo.schemas.booking import BookingTimeline
+from rezervo.schemas.config.app import Booking, BookingStrategy
+from rezervo.schemas.config.user import (
+    Class,
+    IntegrationConfig,
+    IntegrationIdentifier,
+    IntegrationUser,
+)
+from rezervo.schemas.schedule import (
+    RezervoClass,
+    ScheduleRecord,
+    rezervo_class_from_schedule_record,
+)
 from rezervo.utils.logging_utils import err
+from rezervo.utils.time_utils import sleep_until_monotonic_ns
 
 T = TypeVar("T")
 
@@ -44,3 +79,279 @@ def try_authenticate(
     if result is None:
         return AuthenticationError.ERROR
     return result
+
+
+def keep_warm_until(
+    prepared_booking: PreparedBooking, deadline_ns: int, connections: int = 1
+):
+    """
+    Wait until the given `time.monotonic_ns` deadline, while keeping the (already warmed up)
+    connections to the booking host alive
+    """
+    booking_url = prepared_booking.request.url or ""
+    lead_ns = HTTP_KEEP_WARM_LEAD_SECONDS * 1_000_000_000
+    while (remaining_ns := deadline_ns - time.monotonic_ns()) > lead_ns:
+        time.sleep(min(HTTP_KEEP_WARM_INTERVAL_SECONDS, (remaining_ns - lead_ns) / 1e9))
+        prepared_booking.client.warm_up_connections(booking_url, connections)
+    sleep_until_monotonic_ns(deadline_ns)
+
+
+def classify_booking_response_status(
+    response: requests.Response,
+) -> Optional[BookingAttemptOutcome]:
+    """
+    Classify booking responses which can be classified by status code alone
+    """
+    if response.status_code in [requests.codes.UNAUTHORIZED, requests.codes.FORBIDDEN]:
+        return BookingAttemptOutcome.AUTH_EXPIRED
+    if (
+        response.status_code == requests.codes.TOO_MANY_REQUESTS
+        or response.status_code >= 500
+    ):
+        return BookingAttemptOutcome.TRANSIENT
+    return None
+
+
+def classify_booking_error_message(
+    message: str, keywords: dict[BookingAttemptOutcome, list[str]]
+) -> BookingAttemptOutcome:
+    """
+    Classify an upstream booking error message by the first outcome with a matching
+    (case-insensitive) keyword
+    """
+    lower_message = message.lower()
+    for outcome, outcome_keywords in keywords.items():
+        if any(k in lower_message for k in outcome_keywords):
+            return outcome
+    return BookingAttemptOutcome.REJECTED
+
+
+def send_booking_attempt(
+    prepared_booking: PreparedBooking, timeline: Optional[BookingTimeline] = None
+) -> BookingAttemptOutcome:
+    try:
+        response = prepared_booking.client.send_prepared(
+            prepared_booking.request, RequestPriority.BOOKING
+        )
+    except requests.exceptions.RequestException as e:
+        err.log("Booking attempt failed", e)
+        return BookingAttemptOutcome.TRANSIENT
+    if timeline is not None and timeline.response_received_at is None:
+        timeline.response_received_at = datetime.now().astimezone()
+    outcome = prepared_booking.classify_response(response)
+    if outcome not in SUCCESSFUL_BOOKING_ATTEMPT_OUTCOMES:
+        err.log(f"Booking attempt failed ({outcome.name}): " + response.text)
+    return outcome
+
+
+def send_booking_burst(
+    prepared_booking: PreparedBooking,
+    attempts: int,
+    booking_config: Booking,
+    timeline: Optional[BookingTimeline] = None,
+) -> tuple[BookingAttemptOutcome, int]:
+    """
+    Send attempts at (jittered) intervals starting now, without waiting for the response of
+    previous attempts. Attempts that are due after one has succeeded, or failed with a
+    non-retryable outcome, are skipped.
+
+    Returns the deciding outcome (that of the last attempt if all were retryable), and the
+    number of attempts sent.
+    """
+    if attempts < 1:
+        return BookingAttemptOutcome.TRANSIENT, 0
+    start_ns = time.monotonic_ns()
+    done = threading.Event()
+    outcome = BookingAttemptOutcome.TRANSIENT
+    sent_attempts = 0
+    lock = threading.Lock()
+
+    def attempt(delay_ns: int):
+        nonlocal sent_attempts, outcome
+        # wake up early if booking is decided in the meantime
+        if done.wait(
+            max(0, start_ns + delay_ns - time.monotonic_ns() - PRECISE_TIMER_SPIN_NS)
+            / 1e9
+        ):
+            return
+        sleep_until_monotonic_ns(start_ns + delay_ns)
+        if done.is_set():
+            return
+        with lock:
+            sent_attempts += 1
+        attempt_outcome = send_booking_attempt(prepared_booking, timeline)
+        with lock:
+            # a success is never overridden by other attempts, e.g. "already booked"
+            if outcome not in SUCCESSFUL_BOOKING_ATTEMPT_OUTCOMES:
+                outcome = attempt_outcome
+        if attempt_outcome not in RETRYABLE_BOOKING_ATTEMPT_OUTCOMES:
+            done.set()
+
+    delays_ns = [0] + [
+        max(
+            0,
+            round(
+                (
+                    i * booking_config.burst_interval_ms
+                    + random.uniform(
+                        -booking_config.burst_jitter_ms, booking_config.burst_jitter_ms
+                    )
+                )
+                * 1_000_000
+            ),
+        )
+        for i in range(1, attempts)
+    ]
+    with ThreadPoolExecutor(
+        max_workers=attempts, thread_name_prefix="booking-burst"
+    ) as executor:
+        list(executor.map(attempt, delays_ns))
+    return outcome, sent_attempts
+
+
+def send_prepared_booking(
+    prepared_booking: PreparedBooking,
+    booking_config: Booking,
+    timeline: Optional[BookingTimeline] = None,
+) -> Union[None, BookingError, AuthenticationError]:
+    """
+    Send the prepared booking request, retrying retryable outcomes according to the booking
+    config. The time of the response which completed the booking is recorded in the given
+    timeline.
+    """
+    max_attempts = booking_config.max_attempts
+    outcome = BookingAttemptOutcome.TRANSIENT
+    attempts = 0
+    if booking_config.strategy is BookingStrategy.BURST:
+        outcome, attempts = send_booking_burst(
+            prepared_booking,
+            min(booking_config.burst_attempts, max_attempts),
+            booking_config,
+            timeline,
+        )
+    backoff_attempts = 0
+    while outcome in RETRYABLE_BOOKING_ATTEMPT_OUTCOMES and attempts < max_attempts:
+        if attempts > 0:
+            if outcome is BookingAttemptOutcome.NOT_OPEN_YET:
+                # booking is about to open, so there is no point in backing off
+                sleep_seconds = booking_config.burst_interval_ms / 1000
+            else:
+                backoff_attempts += 1
+                sleep_seconds = min(2**backoff_attempts, BOOKING_MAX_BACKOFF_SECONDS)
+                print(f"Exponential backoff, retrying in {sleep_seconds} seconds...")
+            time.sleep(sleep_seconds)
+        outcome = send_booking_attempt(prepared_booking, timeline)
+        attempts += 1
+    attempts_string = f"{attempts} attempt" + ("s" if attempts != 1 else "")
+    if outcome not in SUCCESSFUL_BOOKING_ATTEMPT_OUTCOMES:
+        err.log(f"Booking failed ({outcome.name}) after {attempts_string}")
+        match outcome:
+            case BookingAttemptOutcome.FULL:
+                return BookingError.CLASS_FULL
+            case BookingAttemptOutcome.AUTH_EXPIRED:
+                return AuthenticationError.TOKEN_INVALID
+        return BookingError.ERROR
+    match outcome:
+        case BookingAttemptOutcome.WAITLISTED:
+            print(f"Class is full, joined waiting list after {attempts_string}")
+        case BookingAttemptOutcome.ALREADY_BOOKED:
+            print(f"Class was already booked (after {attempts_string})")
+        case _:
+            print(
+                "Successfully booked class"
+                + (f" after {attempts_string}!" if attempts != 1 else "!")
+            )
+    if prepared_booking.on_booked() and timeline is not None:
+        timeline.notified_at = datetime.now().astimezone()
+    return None
+
+
+def get_schedule(
+    integration: IntegrationIdentifier,
+    from_date: date,
+    days: int,
+    fetch_schedule: Callable[[date, int], Optional[list[ScheduleRecord]]],
+) -> Optional[list[ScheduleRecord]]:
+    """
+    Retrieve the schedule from the stored snapshot, and only fetch it from the provider if the
+    snapshot is stale or does not cover the requested period
+    """
+    with SessionLocal() as db:
+        stored_schedule = crud.get_class_schedule(
+            db, integration, from_date, from_date + timedelta(days=days)
+        )
+    if stored_schedule is not None:
+        return stored_schedule
+    return fetch_schedule(from_date, days)
+
+
+def find_stored_classes(
+    integration: IntegrationIdentifier,
+    class_configs: list[Class],
+    match_studio: bool = False,
+) -> list[Optional[RezervoClass]]:
+    today = datetime.now().date()
+    with SessionLocal() as db:
+        stored_schedule = crud.get_class_schedule(
+            db, integration, today, today + timedelta(days=7)
+        )
+    if stored_schedule is None:
+        return [None for _ in class_configs]
+    schedule_index = schedule_record_index(stored_schedule)
+    classes: list[Optional[RezervoClass]] = []
+    for _class_config in class_configs:
+        record = find_class_in_schedule(schedule_index, _class_config, match_studio)
+        if record is None:
+            classes.append(None)
+            continue
+        _class = rezervo_class_from_schedule_record(record)
+        print(f'Found class in stored schedule: "{_class.name}" at {_class.from_field}')
+        classes.append(_class)
+    return classes
+
+
+def find_stored_class_by_id(
+    integration: IntegrationIdentifier, class_id: str
+) -> Optional[RezervoClass]:
+    with SessionLocal() as db:
+        return crud.get_class_schedule_class(db, integration, class_id)
+
+
+def find_class_in_schedule(
+    schedule_index: ScheduleIndex[ScheduleRecord],
+    _class_config: Class,
+    match_studio: bool = False,
+) -> Optional[ScheduleRecord]:
+    """
+    Find the upcoming class matching the given config with booking opening closest to now.
+    The studio of the config is only matched if `match_studio` is set, for providers whose
+    schedules are searched per studio.
+    """
+    now = datetime.now().astimezone()
+    result = None
+    result_booking_delta = None
+    for c in schedule_index.find_by_config(_class_config):
+        if c.start < now or (match_studio and c.studio_id != _class_config.studio):
+            continue
+        booking_delta = abs(now - c.booking_opens_at)
+        if result_booking_delta is None or booking_delta < result_booking_delta:
+            result = c
+            result_booking_delta = booking_delta
+    return result
+
+
+def get_user_planned_classes(
+    integration_config: IntegrationConfig,
+    schedule_index: ScheduleIndex[ScheduleRecord],
+) -> list[ScheduleRecord]:
+    if not integration_config.active:
+        return []
+    now = datetime.now().astimezone()
+    classes: list[ScheduleRecord] = []
+    for uc in integration_config.classes:
+        for c in schedule_index.find_by_config(uc):
+            # check if opening_time is in the past (if so, it is either already booked or will not be booked)
+            if c.booking_opens_at < now:
+                continue
+            classes.append(c)
+    return classes
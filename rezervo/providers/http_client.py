@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rezervo.consts import (
+    CLOCK_SKEW_SAMPLE_INTERVAL_SECONDS,
+    CLOCK_SKEW_SAMPLES,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_POOL_MAX_SIZE,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_USER_AGENT,
+)
+from rezervo.providers.clock_skew import ClockSkewEstimate
+from rezervo.providers.rate_limit import RequestPriority, get_host_limiter
+from rezervo.schemas.config.user import IntegrationIdentifier
+
+
+class HttpClient(requests.Session):
+    """
+    Session with keep-alive connection pooling, default timeouts and a shared User-Agent.
+
+    All requests are subject to the limits of the upstream host (see `HostLimiter`), and
+    booking requests should pass `priority=RequestPriority.BOOKING`. The `Date` headers of
+    all responses are sampled to estimate the clock skew of the upstream.
+    """
+
+    def __init__(
+        self,
+        adapter: HTTPAdapter,
+        clock_skew: ClockSkewEstimate,
+        persist_cookies: bool = True,
+    ):
+        super().__init__()
+        self.adapter = adapter
+        self.clock_skew = clock_skew
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["User-Agent"] = HTTP_USER_AGENT
+        if not persist_cookies:
+            self.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def request(
+        self,
+        method,
+        url,
+        *args,
+        priority: RequestPriority = RequestPriority.NORMAL,
+        **kwargs,
+    ):
+        kwargs.setdefault(
+            "timeout", (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+        )
+        with get_host_limiter(urlparse(url).netloc).acquire(priority):
+            sent_at = time.time()
+            response = super().request(method, url, *args, **kwargs)
+        self.clock_skew.add_response(sent_at, response)
+        return response
+
+    def prepare(self, method: str, url: str, **kwargs) -> requests.PreparedRequest:
+        """
+        Build a request with the headers and cookies of this client, to be sent later with
+        `send_prepared`
+        """
+        return self.prepare_request(requests.Request(method, url, **kwargs))
+
+    def send_prepared(
+        self,
+        prepared: requests.PreparedRequest,
+        priority: RequestPriority = RequestPriority.NORMAL,
+    ) -> requests.Response:
+        with get_host_limiter(urlparse(prepared.url or "").netloc).acquire(priority):
+            # same settings as `request`, so the pooled connections of the host are reused
+            settings = self.merge_environment_settings(
+                prepared.url, {}, None, None, None
+            )
+            sent_at = time.time()
+            response = self.send(
+                prepared.copy(),
+                timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS),
+                **settings,
+            )
+        self.clock_skew.add_response(sent_at, response)
+        return response
+
+    def warm_up(self, url: str) -> bool:
+        """
+        Open (or keep alive) a pooled connection to the host of the given url, so that a
+        later request to that host skips DNS resolution and connection setup
+        """
+        parsed_url = urlparse(url)
+        try:
+            self.request(
+                "HEAD",
+                f"{parsed_url.scheme}://{parsed_url.netloc}/",
+                priority=RequestPriority.BOOKING,
+            )
+        except requests.exceptions.RequestException:
+            return False
+        return True
+
+    def warm_up_connections(self, url: str, connections: int):
+        """
+        Open (or keep alive) multiple pooled connections to the host of the given url, e.g. to
+        send concurrent bookings over warm connections
+        """
+        connections = min(connections, HTTP_POOL_MAX_SIZE)
+        if connections <= 1:
+            self.warm_up(url)
+            return
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(self.warm_up, [url] * connections))
+
+    def sample_clock_skew(self, url: str):
+        """
+        Sample the `Date` header of the host of the given url at intervals spanning a whole
+        second, which narrows down the estimated clock skew to about the sample interval
+        """
+        for _ in range(CLOCK_SKEW_SAMPLES):
+            self.warm_up(url)
+            time.sleep(CLOCK_SKEW_SAMPLE_INTERVAL_SECONDS)
+
+    def new_session(self) -> "HttpClient":
+        """
+        Create a session with its own cookies (e.g. for a single login), that still reuses
+        the pooled connections of this client
+        """
+        return HttpClient(self.adapter, self.clock_skew)
+
+
+_http_clients: dict[IntegrationIdentifier, HttpClient] = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_http_client(integration: IntegrationIdentifier) -> HttpClient:
+    """
+    Retrieve the shared client of the given integration. Cookies are never stored by shared
+    clients, so use `new_session` for requests that depend on cookies.
+    """
+    with _http_clients_lock:
+        if integration not in _http_clients:
+            _http_clients[integration] = HttpClient(
+                HTTPAdapter(
+                    pool_connections=HTTP_POOL_MAX_SIZE,
+                    pool_maxsize=HTTP_POOL_MAX_SIZE,
+                ),
+                ClockSkewEstimate(integration.value),
+                persist_cookies=False,
+            )
+        return _http_clients[integration]
@@ -7,33 +7,31 @@ from requests import Session
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError
+from rezervo.providers.http_client import get_http_client
 from rezervo.providers.ibooking.consts import (
     AUTH_URL,
     BOOKING_URL,
     TOKEN_VALIDATION_URL,
 )
-from rezervo.schemas.config.user import IntegrationUser
+from rezervo.schemas.config.user import IntegrationIdentifier, IntegrationUser
 from rezervo.utils.logging_utils import err, warn
 
-USER_AGENT = (
-    "Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:100.0) Gecko/20100101 Firefox/100.0"
-)
-
 
 def fetch_public_token() -> Union[str, AuthenticationError]:
     # use an unauthenticated session
-    return extract_token_from_session(Session())
+    return extract_token_from_session(
+        get_http_client(IntegrationIdentifier.SIT).new_session()
+    )
 
 
 def authenticate_session(
     email: str, password: str
 ) -> Union[Session, AuthenticationError]:
     # TODO: inject existing token if valid
-    session = Session()
+    session = get_http_client(IntegrationIdentifier.SIT).new_session()
     auth_res = session.post(
         AUTH_URL,
         {"name": email, "pass": password, "form_id": "user_login"},
-        headers={"User-Agent": USER_AGENT},
     )
     auth_soup = re.sub(" +", " ", auth_res.text.replace("\n", ""))
     login_blocked_matches = re.search(r"Feilmelding.*?midlertidig blokkert", auth_soup)
@@ -75,7 +73,9 @@ def authenticate_token(
 
 
 def validate_token(token: str) -> Optional[AuthenticationError]:
-    token_validation = requests.post(TOKEN_VALIDATION_URL, {"token": token})
+    token_validation = get_http_client(IntegrationIdentifier.SIT).post(
+        TOKEN_VALIDATION_URL, {"token": token}
+    )
     if token_validation.status_code != requests.codes.OK:
         if token_validation.status_code != requests.codes.FORBIDDEN:
             err.log("Validation of authentication token failed")
@@ -91,7 +91,7 @@ def validate_token(token: str) -> Optional[AuthenticationError]:
 
 
 def extract_token_from_session(session: Session) -> Union[str, AuthenticationError]:
-    booking_res = session.get(BOOKING_URL, headers={"User-Agent": USER_AGENT})
+    booking_res = session.get(BOOKING_URL)
     booking_soup = re.sub(" +", " ", booking_res.text.replace("\n", ""))
     cdata_token_matches = re.search(
         r"<!\[CDATA\[.*?iBookingPreload\(.*?token:.*?\"(.+?)\".*?]]>", booking_soup
@@ -1,6 +1,5 @@
 import time
-from datetime import datetime
-from typing import Union
+from typing import Optional, Union
 
 import requests
 
@@ -9,7 +8,14 @@ from rezervo.consts import (
 )
 from rezervo.errors import AuthenticationError, BookingError
 from rezervo.notify.notify import notify_booking
-from rezervo.providers.helpers import try_authenticate
+from rezervo.providers.helpers import (
+    classify_booking_error_message,
+    classify_booking_response_status,
+    find_stored_classes,
+    send_prepared_booking,
+    try_authenticate,
+)
+from rezervo.providers.http_client import get_http_client
 from rezervo.providers.ibooking.auth import authenticate_token, fetch_public_token
 from rezervo.providers.ibooking.consts import (
     ADD_BOOKING_URL,
@@ -17,32 +23,73 @@ from rezervo.providers.ibooking.consts import (
     CLASS_URL,
     ICAL_URL,
 )
-from rezervo.providers.ibooking.schedule import fetch_ibooking_schedule
+from rezervo.providers.ibooking.schedule import (
+    fetch_ibooking_schedule,
+    ibooking_class_local_start_time,
+    ibooking_schedule_index,
+)
 from rezervo.providers.ibooking.schema import (
     IBookingClass,
+    IBookingSchedule,
     rezervo_class_from_ibooking_class,
 )
+from rezervo.providers.provider import (
+    BookingAttemptOutcome,
+    BookingAuth,
+    PreparedBooking,
+)
+from rezervo.providers.schedule_index import ScheduleIndex
 from rezervo.schemas.config.config import ConfigValue
-from rezervo.schemas.config.user import Class, IntegrationUser
+from rezervo.schemas.config.user import Class, IntegrationIdentifier, IntegrationUser
 from rezervo.schemas.schedule import RezervoClass
 from rezervo.utils.logging_utils import err
 from rezervo.utils.str_utils import format_name_list_to_natural
 
+# keywords of (Norwegian) error messages, in order of precedence
+BOOKING_ERROR_MESSAGE_KEYWORDS = {
+    BookingAttemptOutcome.ALREADY_BOOKED: ["allerede", "already"],
+    BookingAttemptOutcome.FULL: ["fullt", "full"],
+    BookingAttemptOutcome.NOT_OPEN_YET: ["ikke åpne", "åpner", "not open"],
+    BookingAttemptOutcome.AUTH_EXPIRED: ["token", "logg inn", "innlogg"],
+}
 
-def book_ibooking_class(token, class_id) -> bool:
-    print(f"Booking class {class_id}")
-    response = requests.post(ADD_BOOKING_URL, {"classId": class_id, "token": token})
-    if response.status_code != requests.codes.OK:
-        err.log("Booking attempt failed: " + response.text)
-        # TODO: distinguish between "retryable" and "non-retryable" errors
-        #       (e.g. should not retry if already booked)
-        return False
-    return True
+
+def classify_ibooking_booking_response(
+    response: requests.Response,
+) -> BookingAttemptOutcome:
+    status_outcome = classify_booking_response_status(response)
+    if status_outcome is not None:
+        return status_outcome
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if response.status_code == requests.codes.OK and (
+        not isinstance(body, dict) or body.get("success") is not False
+    ):
+        return BookingAttemptOutcome.BOOKED
+    message = body.get("errorMessage") if isinstance(body, dict) else None
+    return classify_booking_error_message(
+        message if isinstance(message, str) else response.text,
+        BOOKING_ERROR_MESSAGE_KEYWORDS,
+    )
+
+
+def prepare_ibooking_booking_request(token, class_id) -> requests.PreparedRequest:
+    return get_http_client(IntegrationIdentifier.SIT).prepare(
+        "POST", ADD_BOOKING_URL, data={"classId": class_id, "token": token}
+    )
 
 
 def cancel_ibooking_booking(token, class_id) -> bool:
     print(f"Cancelling booking of class {class_id}")
-    res = requests.post(CANCEL_BOOKING_URL, {"classId": class_id, "token": token})
+    try:
+        res = get_http_client(IntegrationIdentifier.SIT).post(
+            CANCEL_BOOKING_URL, {"classId": class_id, "token": token}
+        )
+    except requests.exceptions.RequestException as e:
+        err.log("Booking cancellation attempt failed", e)
+        return False
     if res.status_code != requests.codes.OK:
         err.log("Booking cancellation attempt failed: " + res.text)
         return False
@@ -64,56 +111,80 @@ def cancel_ibooking_booking(token, class_id) -> bool:
 def find_public_ibooking_class(
     _class_config: Class,
 ) -> Union[RezervoClass, BookingError, AuthenticationError]:
+    return find_public_ibooking_classes([_class_config])[0]
+
+
+def find_public_ibooking_classes(
+    class_configs: list[Class],
+) -> list[Union[RezervoClass, BookingError, AuthenticationError]]:
+    stored_classes = find_stored_classes(
+        IntegrationIdentifier.SIT, class_configs, match_studio=True
+    )
+    if all(c is not None for c in stored_classes):
+        return [c for c in stored_classes if c is not None]
     token = fetch_public_token()
     if isinstance(token, AuthenticationError):
         err.log("Failed to fetch public token")
-        return token
-    print(f"Searching for class matching config: {_class_config}")
-    schedule = fetch_ibooking_schedule(token, 7, _class_config.studio)
-    if schedule is None:
-        err.log("Schedule get request denied")
-        return BookingError.ERROR
-    days = schedule.days
-    target_day = None
+        return [c if c is not None else token for c in stored_classes]
+    classes: list[Union[RezervoClass, BookingError, AuthenticationError]] = []
+    schedules: dict[
+        int, Optional[tuple[IBookingSchedule, ScheduleIndex[IBookingClass]]]
+    ] = {}
+    for _class_config, stored_class in zip(class_configs, stored_classes):
+        if stored_class is not None:
+            classes.append(stored_class)
+            continue
+        print(f"Searching for class matching config: {_class_config}")
+        studio = _class_config.studio
+        if studio not in schedules:
+            schedule = fetch_ibooking_schedule(token, 7, studio)
+            schedules[studio] = (
+                (schedule, ibooking_schedule_index(schedule))
+                if schedule is not None
+                else None
+            )
+        studio_schedule = schedules[studio]
+        if studio_schedule is None:
+            err.log("Schedule get request denied")
+            classes.append(BookingError.ERROR)
+            continue
+        classes.append(find_ibooking_class(_class_config, *studio_schedule))
+    return classes
+
+
+def find_ibooking_class(
+    _class_config: Class,
+    schedule: IBookingSchedule,
+    schedule_index: ScheduleIndex[IBookingClass],
+) -> Union[RezervoClass, BookingError]:
     if not 0 <= _class_config.weekday < len(WEEKDAYS):
         err.log(f"Invalid weekday number ({_class_config.weekday=})")
         return BookingError.MALFORMED_SEARCH
     weekday_str = WEEKDAYS[_class_config.weekday]
-    for day in days:
-        if day.dayName == weekday_str:
-            target_day = day
-            break
-    if target_day is None:
+    if not any(day.dayName == weekday_str for day in schedule.days):
         err.log(f"Could not find requested day '{weekday_str}'. To early?")
         return BookingError.MISSING_SCHEDULE_DAY
-    classes = target_day.classes
-    result = None
-    for c in classes:
-        if c.activityId != _class_config.activity:
-            continue
-        start_time = datetime.strptime(c.from_field, "%Y-%m-%d %H:%M:%S")
-        time_matches = (
-            start_time.hour == _class_config.time.hour
-            and start_time.minute == _class_config.time.minute
+    matches = schedule_index.find_by_config(_class_config)
+    if len(matches) == 0:
+        err.log("Could not find class matching criteria")
+        if any(
+            ibooking_class_local_start_time(c).weekday() == _class_config.weekday
+            for c in schedule_index.find_by_activity(_class_config.activity)
+        ):
+            print("Found class, but start time did not match")
+            return BookingError.INCORRECT_START_TIME
+        return BookingError.CLASS_MISSING
+    c = matches[0]
+    search_feedback = f'Found class: "{c.name}"'
+    if len(c.instructors) > 0:
+        search_feedback += (
+            f" with {format_name_list_to_natural([i.name for i in c.instructors])}"
         )
-        if not time_matches:
-            print(f"Found class, but start time did not match: {c}")
-            result = BookingError.INCORRECT_START_TIME
-            continue
-        search_feedback = f'Found class: "{c.name}"'
-        if len(c.instructors) > 0:
-            search_feedback += (
-                f" with {format_name_list_to_natural([i.name for i in c.instructors])}"
-            )
-        else:
-            search_feedback += " (missing instructor)"
-        search_feedback += f" at {c.from_field}"
-        print(search_feedback)
-        return rezervo_class_from_ibooking_class(c)
-    err.log("Could not find class matching criteria")
-    if result is None:
-        result = BookingError.CLASS_MISSING
-    return result
+    else:
+        search_feedback += " (missing instructor)"
+    search_feedback += f" at {c.from_field}"
+    print(search_feedback)
+    return rezervo_class_from_ibooking_class(c)
 
 
 def find_authed_ibooking_class_by_id(
@@ -126,7 +197,9 @@ def find_authed_ibooking_class_by_id(
         err.log("Failed to authenticate to iBooking")
         return token
     print(f"Searching for class by id: {class_id}")
-    class_response = requests.get(f"{CLASS_URL}?token={token}&id={class_id}&lang=no")
+    class_response = get_http_client(IntegrationIdentifier.SIT).get(
+        f"{CLASS_URL}?token={token}&id={class_id}&lang=no"
+    )
     if class_response.status_code != requests.codes.OK:
         err.log("Class get request failed")
         return BookingError.ERROR
@@ -177,13 +250,9 @@ def cancel_booking(
     return None
 
 
-def book_class(
-    integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
-) -> Union[None, BookingError, AuthenticationError]:
-    max_attempts = config.booking.max_attempts
-    if max_attempts < 1:
-        err.log("Max booking attempts should be a positive number")
-        return BookingError.INVALID_CONFIG
+def authenticate_booking(
+    integration_user: IntegrationUser, config: ConfigValue
+) -> Union[BookingAuth, AuthenticationError]:
     print("Authenticating...")
     auth_result = try_authenticate(
         authenticate_token, integration_user, config.auth.max_attempts
@@ -191,29 +260,42 @@ def book_class(
     if isinstance(auth_result, AuthenticationError):
         err.log("Authentication failed")
         return auth_result
-    token = auth_result
-    booked = False
-    attempts = 0
-    while not booked:
-        booked = book_ibooking_class(token, _class.id)
-        attempts += 1
-        if booked:
-            break
-        if attempts >= max_attempts:
-            break
-        sleep_seconds = 2**attempts
-        print(f"Exponential backoff, retrying in {sleep_seconds} seconds...")
-        time.sleep(sleep_seconds)
-    if not booked:
-        err.log(
-            f"Booking failed after {attempts} attempt" + ("s" if attempts != 1 else "")
-        )
-        return BookingError.ERROR
-    print(
-        "Successfully booked class"
-        + (f" after {attempts} attempts!" if attempts != 1 else "!")
-    )
-    if config.notifications:
+    # iBooking tokens do not have a known expiry
+    return BookingAuth(credentials=auth_result)
+
+
+def prepare_booking(
+    integration_user: IntegrationUser,
+    _class: RezervoClass,
+    config: ConfigValue,
+    booking_auth: BookingAuth,
+) -> Union[PreparedBooking, BookingError]:
+    if config.booking.max_attempts < 1:
+        err.log("Max booking attempts should be a positive number")
+        return BookingError.INVALID_CONFIG
+    token = booking_auth.credentials
+
+    def on_booked() -> bool:
+        if not config.notifications:
+            return False
         ical_url = f"{ICAL_URL}/?id={_class.id}&token={token}"
-        notify_booking(config.notifications, _class, ical_url)
-    return None
+        return notify_booking(config.notifications, _class, ical_url)
+
+    return PreparedBooking(
+        client=get_http_client(IntegrationIdentifier.SIT),
+        request=prepare_ibooking_booking_request(token, _class.id),
+        classify_response=classify_ibooking_booking_response,
+        on_booked=on_booked,
+    )
+
+
+def book_class(
+    integration_user: IntegrationUser, _class: RezervoClass, config: ConfigValue
+) -> Union[None, BookingError, AuthenticationError]:
+    booking_auth = authenticate_booking(integration_user, config)
+    if isinstance(booking_auth, AuthenticationError):
+        return booking_auth
+    prepared_booking = prepare_booking(integration_user, _class, config, booking_auth)
+    if isinstance(prepared_booking, BookingError):
+        return prepared_booking
+    return send_prepared_booking(prepared_booking, config.booking)
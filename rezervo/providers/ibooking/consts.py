@@ -1,10 +1,17 @@
-AUTH_URL = "https://www.sit.no/"
-BOOKING_URL = "https://www.sit.no/trening/gruppe"
-MY_SESSIONS_URL = "https://www.sit.no/ibooking-api/callback/get-my-sessions"
-ADD_BOOKING_URL = "https://ibooking.sit.no/webapp/api//Schedule/addBooking"
-CANCEL_BOOKING_URL = "https://ibooking.sit.no/webapp/api//Schedule/cancelBooking"
-CLASSES_SCHEDULE_URL = "https://ibooking.sit.no/webapp/api/Schedule/getSchedule"
+from rezervo.settings import get_settings
+
+WEBSITE_BASE_URL = get_settings().IBOOKING_WEBSITE_BASE_URL
+API_BASE_URL = get_settings().IBOOKING_API_BASE_URL
+
+AUTH_URL = f"{WEBSITE_BASE_URL}/"
+BOOKING_URL = f"{WEBSITE_BASE_URL}/trening/gruppe"
+MY_SESSIONS_URL = f"{WEBSITE_BASE_URL}/ibooking-api/callback/get-my-sessions"
+ADD_BOOKING_URL = f"{API_BASE_URL}/webapp/api//Schedule/addBooking"
+CANCEL_BOOKING_URL = f"{API_BASE_URL}/webapp/api//Schedule/cancelBooking"
+CLASSES_SCHEDULE_URL = f"{API_BASE_URL}/webapp/api/Schedule/getSchedule"
 CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH = 4
-CLASS_URL = "https://ibooking.sit.no/webapp/api/Schedule/getClass"
-TOKEN_VALIDATION_URL = "https://ibooking.sit.no/webapp/api/User/validateToken"
-ICAL_URL = "https://ibooking.sit.no/webapp/api/Schedule/calendar"
+CLASSES_SCHEDULE_MAX_CONCURRENT_BATCHES = 4
+CLASSES_SCHEDULE_BATCH_MAX_ATTEMPTS = 3
+CLASS_URL = f"{API_BASE_URL}/webapp/api/Schedule/getClass"
+TOKEN_VALIDATION_URL = f"{API_BASE_URL}/webapp/api/User/validateToken"
+ICAL_URL = f"{API_BASE_URL}/webapp/api/Schedule/calendar"
@@ -1,9 +1,13 @@
 from rezervo.providers.ibooking.booking import (
+    authenticate_booking,
     book_class,
     cancel_booking,
     find_authed_ibooking_class_by_id,
     find_public_ibooking_class,
+    find_public_ibooking_classes,
+    prepare_booking,
 )
+from rezervo.providers.ibooking.schedule import fetch_ibooking_rezervo_schedule
 from rezervo.providers.ibooking.schema import (
     IBookingDomain,
     rezervo_class_from_ibooking_class,
@@ -17,8 +21,12 @@ def get_ibooking_provider(domain: IBookingDomain):
     return Provider(
         find_authed_class_by_id=find_authed_ibooking_class_by_id,
         find_class=find_public_ibooking_class,
+        find_classes=find_public_ibooking_classes,
+        authenticate_booking=authenticate_booking,
+        prepare_booking=prepare_booking,
         book_class=book_class,
         cancel_booking=cancel_booking,
         fetch_sessions=fetch_ibooking_sessions,
+        fetch_schedule=fetch_ibooking_rezervo_schedule,
         rezervo_class_from_class_data=rezervo_class_from_ibooking_class,
     )
@@ -1,20 +1,62 @@
 import datetime
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Union
 
 import requests
 
+from rezervo.consts import SCHEDULE_CACHE_TTL_SECONDS
+from rezervo.errors import AuthenticationError
+from rezervo.providers.http_client import get_http_client
+from rezervo.providers.ibooking.auth import fetch_public_token
 from rezervo.providers.ibooking.consts import (
+    CLASSES_SCHEDULE_BATCH_MAX_ATTEMPTS,
     CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH,
+    CLASSES_SCHEDULE_MAX_CONCURRENT_BATCHES,
     CLASSES_SCHEDULE_URL,
 )
-from rezervo.providers.ibooking.schema import IBookingDay, IBookingSchedule
+from rezervo.providers.ibooking.schema import (
+    IBookingClass,
+    IBookingDay,
+    IBookingSchedule,
+    ibooking_schedule_record_from_ibooking_class,
+)
+from rezervo.providers.schedule_cache import ScheduleCache
+from rezervo.providers.schedule_index import ScheduleIndex
+from rezervo.schemas.config.user import IntegrationIdentifier
+from rezervo.schemas.schedule import ScheduleRecord
+from rezervo.utils.logging_utils import err
+
+# schedules are only fetched with public tokens, so days can be shared between all callers
+ibooking_schedule_cache: ScheduleCache[IBookingDay] = ScheduleCache(
+    "ibooking", SCHEDULE_CACHE_TTL_SECONDS
+)
+
+
+class IBookingScheduleBatchError(Exception):
+    pass
+
+
+def ibooking_class_local_start_time(
+    ibooking_class: IBookingClass,
+) -> datetime.datetime:
+    return datetime.datetime.strptime(ibooking_class.from_field, "%Y-%m-%d %H:%M:%S")
+
+
+def ibooking_schedule_index(schedule: IBookingSchedule) -> ScheduleIndex[IBookingClass]:
+    return ScheduleIndex(
+        (c for day in schedule.days for c in day.classes),
+        lambda c: c.id,
+        lambda c: c.activityId,
+        ibooking_class_local_start_time,
+    )
 
 
 def fetch_single_batch_ibooking_schedule(
     token: str, studio: Optional[int] = None, from_iso: Optional[str] = None
 ) -> Union[IBookingSchedule, None]:
-    res = requests.get(
+    res = get_http_client(IntegrationIdentifier.SIT).get(
         f"{CLASSES_SCHEDULE_URL}"
         f"?token={token}"
         f"{f'&from={from_iso}' if from_iso is not None else ''}"
@@ -26,19 +68,91 @@ def fetch_single_batch_ibooking_schedule(
     return IBookingSchedule(**res.json())
 
 
+def try_fetch_single_batch_ibooking_schedule(
+    token: str, studio: Optional[int], from_iso: str
+) -> Union[IBookingSchedule, None]:
+    attempts = 0
+    while True:
+        try:
+            batch = fetch_single_batch_ibooking_schedule(token, studio, from_iso)
+        except requests.exceptions.RequestException as e:
+            err.log(f"Schedule batch request from {from_iso} failed", e)
+            batch = None
+        attempts += 1
+        if batch is not None or attempts >= CLASSES_SCHEDULE_BATCH_MAX_ATTEMPTS:
+            return batch
+        sleep_seconds = 2**attempts
+        print(
+            f"Schedule batch from {from_iso} failed, retrying in {sleep_seconds} seconds..."
+        )
+        time.sleep(sleep_seconds)
+
+
 def fetch_ibooking_schedule(
-    token, days: int, studio: Optional[int] = None
+    token,
+    days: int,
+    studio: Optional[int] = None,
+    from_date: Optional[datetime.date] = None,
 ) -> Union[IBookingSchedule, None]:
-    schedule_days: list[IBookingDay] = []
-    from_date = datetime.datetime.now().date()
-    for _i in range(math.ceil(days / CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH)):
-        batch = fetch_single_batch_ibooking_schedule(
-            token, studio, from_date.isoformat()
+    if from_date is None:
+        from_date = datetime.datetime.now().date()
+    try:
+        schedule_days = ibooking_schedule_cache.get(
+            studio,
+            from_date,
+            days,
+            lambda batch_from_date, batch_days: fetch_ibooking_schedule_days(
+                token, batch_days, batch_from_date, studio
+            ),
         )
-        if batch is not None:
-            # api actually returns 7 days, but the extra days are empty...
-            schedule_days.extend(batch.days[:CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH])
-        from_date = from_date + datetime.timedelta(
-            days=CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH
+    except IBookingScheduleBatchError as e:
+        err.log("Failed to fetch iBooking schedule", e)
+        return None
+    return IBookingSchedule(days=schedule_days)
+
+
+def fetch_ibooking_schedule_days(
+    token, days: int, from_date: datetime.date, studio: Optional[int] = None
+) -> dict[datetime.date, IBookingDay]:
+    batch_from_dates = [
+        from_date + datetime.timedelta(days=i * CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH)
+        for i in range(math.ceil(days / CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH))
+    ]
+    with ThreadPoolExecutor(
+        max_workers=min(CLASSES_SCHEDULE_MAX_CONCURRENT_BATCHES, len(batch_from_dates))
+    ) as executor:
+        batches = list(
+            executor.map(
+                lambda batch_from_date: try_fetch_single_batch_ibooking_schedule(
+                    token, studio, batch_from_date.isoformat()
+                ),
+                batch_from_dates,
+            )
         )
-    return IBookingSchedule(days=schedule_days[:days])
+    schedule_days: dict[datetime.date, IBookingDay] = {}
+    for batch_from_date, batch in zip(batch_from_dates, batches):
+        if batch is None:
+            raise IBookingScheduleBatchError(
+                f"Schedule batch from {batch_from_date.isoformat()} could not be fetched"
+            )
+        # api actually returns 7 days, but the extra days are empty...
+        for i, day in enumerate(batch.days[:CLASSES_SCHEDULE_DAYS_IN_SINGLE_BATCH]):
+            schedule_days[batch_from_date + datetime.timedelta(days=i)] = day
+    return schedule_days
+
+
+def fetch_ibooking_rezervo_schedule(
+    from_date: datetime.date, days: int
+) -> Optional[list[ScheduleRecord]]:
+    token = fetch_public_token()
+    if isinstance(token, AuthenticationError):
+        err.log("Failed to fetch public token")
+        return None
+    schedule = fetch_ibooking_schedule(token, days, from_date=from_date)
+    if schedule is None:
+        return None
+    return [
+        ibooking_schedule_record_from_ibooking_class(c)
+        for day in schedule.days
+        for c in day.classes
+    ]
@@ -3,11 +3,16 @@ from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
-from pytz import timezone
 
 from rezervo.models import SessionState
 from rezervo.schemas.config.user import IntegrationIdentifier
-from rezervo.schemas.schedule import RezervoClass, RezervoInstructor, RezervoStudio
+from rezervo.schemas.schedule import (
+    RezervoClass,
+    RezervoInstructor,
+    RezervoStudio,
+    ScheduleRecord,
+)
+from rezervo.utils.time_utils import local_timezone
 
 
 class IBookingDomain(enum.Enum):
@@ -69,7 +74,7 @@ def session_state_from_ibooking(status: str) -> SessionState:
 
 
 def tz_aware_iso_from_ibooking_date_str(date: str) -> str:
-    return timezone("Europe/Oslo").localize(datetime.fromisoformat(date)).isoformat()
+    return local_timezone().localize(datetime.fromisoformat(date)).isoformat()
 
 
 def rezervo_class_from_ibooking_class(ibooking_class: IBookingClass) -> RezervoClass:
@@ -93,3 +98,25 @@ def rezervo_class_from_ibooking_class(ibooking_class: IBookingClass) -> RezervoC
             ibooking_class.bookingOpensAt
         ),
     )
+
+
+def ibooking_schedule_record_from_ibooking_class(
+    ibooking_class: IBookingClass,
+) -> ScheduleRecord:
+    tz = local_timezone()
+    return ScheduleRecord(
+        integration=IntegrationIdentifier.SIT,
+        id=ibooking_class.id,
+        name=ibooking_class.name,
+        activity_id=ibooking_class.activityId,
+        start=tz.localize(datetime.fromisoformat(ibooking_class.from_field)),
+        end=tz.localize(datetime.fromisoformat(ibooking_class.to)),
+        studio_id=ibooking_class.studio.id,
+        studio_name=ibooking_class.studio.name,
+        instructors=tuple(i.name for i in ibooking_class.instructors),
+        user_status=ibooking_class.userStatus,
+        bookable=ibooking_class.bookable,
+        booking_opens_at=tz.localize(
+            datetime.fromisoformat(ibooking_class.bookingOpensAt)
+        ),
+    )
@@ -6,36 +6,28 @@ import pydantic
 import requests
 
 from rezervo import models
-from rezervo.consts import (
-    PLANNED_SESSIONS_NEXT_WHOLE_WEEKS,
-    WEEKDAYS,
-)
+from rezervo.consts import PLANNED_SESSIONS_NEXT_WHOLE_WEEKS
 from rezervo.database.database import SessionLocal
 from rezervo.errors import AuthenticationError
 from rezervo.models import SessionState
-from rezervo.providers.ibooking.auth import (
-    USER_AGENT,
-    authenticate_session,
-    fetch_public_token,
-)
+from rezervo.providers.helpers import get_schedule, get_user_planned_classes
+from rezervo.providers.ibooking.auth import authenticate_session
 from rezervo.providers.ibooking.consts import (
     MY_SESSIONS_URL,
 )
-from rezervo.providers.ibooking.schedule import fetch_ibooking_schedule
+from rezervo.providers.ibooking.schedule import fetch_ibooking_rezervo_schedule
 from rezervo.providers.ibooking.schema import (
-    IBookingClass,
-    IBookingSchedule,
     IBookingSession,
     rezervo_class_from_ibooking_class,
     session_state_from_ibooking,
 )
+from rezervo.providers.schedule_index import schedule_record_index
 from rezervo.schemas.config.user import (
-    IntegrationConfig,
     IntegrationIdentifier,
     IntegrationUser,
     get_integration_config_from_integration_user,
 )
-from rezervo.schemas.schedule import UserSession
+from rezervo.schemas.schedule import UserSession, rezervo_class_from_schedule_record
 from rezervo.utils.logging_utils import err
 from rezervo.utils.time_utils import total_days_for_next_whole_weeks
 
@@ -43,10 +35,13 @@ from rezervo.utils.time_utils import total_days_for_next_whole_weeks
 def fetch_ibooking_sessions(
     user_id: Optional[UUID] = None,
 ) -> dict[UUID, list[UserSession]]:
-    planned_ibooking_schedule = fetch_ibooking_schedule(
-        fetch_public_token(),
+    planned_ibooking_schedule = get_schedule(
+        IntegrationIdentifier.SIT,
+        datetime.now().date(),
         total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS),
+        fetch_ibooking_rezervo_schedule,
     )
+    schedule_index = schedule_record_index(planned_ibooking_schedule or [])
     with SessionLocal() as db:
         db_ibooking_users_query = db.query(models.IntegrationUser).filter(
             models.IntegrationUser.integration == IntegrationIdentifier.SIT
@@ -68,9 +63,7 @@ def fetch_ibooking_sessions(
                 )
                 continue
             try:
-                res = auth_session.get(
-                    MY_SESSIONS_URL, headers={"User-Agent": USER_AGENT}
-                )
+                res = auth_session.get(MY_SESSIONS_URL)
             except requests.exceptions.RequestException as e:
                 err.log(
                     f"Failed to retrieve sessions for '{ibooking_user.username}'",
@@ -93,10 +86,13 @@ def fetch_ibooking_sessions(
                 )
                 for s in ibooking_sessions
             ]
+            past_and_imminent_class_ids = {
+                s.class_id for s in past_and_imminent_sessions
+            }
             planned_sessions = (
-                get_user_planned_sessions_from_schedule(
+                get_user_planned_classes(
                     get_integration_config_from_integration_user(ibooking_user),
-                    planned_ibooking_schedule,
+                    schedule_index,
                 )
                 if planned_ibooking_schedule is not None
                 else []
@@ -107,39 +103,10 @@ def fetch_ibooking_sessions(
                     class_id=p.id,
                     user_id=ibooking_user.user_id,
                     status=SessionState.PLANNED,
-                    class_data=rezervo_class_from_ibooking_class(p),
+                    class_data=rezervo_class_from_schedule_record(p),
                 )
                 for p in planned_sessions
-                if p.id not in [s.class_id for s in past_and_imminent_sessions]
+                if str(p.id) not in past_and_imminent_class_ids
             ]
             sessions[ibooking_user.user_id] = user_sessions
     return sessions
-
-
-def get_user_planned_sessions_from_schedule(
-    integration_config: IntegrationConfig, schedule: IBookingSchedule
-) -> list[IBookingClass]:
-    if not integration_config.active:
-        return []
-    classes: list[IBookingClass] = []
-    for d in schedule.days:
-        for c in d.classes:
-            for uc in integration_config.classes:
-                if d.dayName != WEEKDAYS[uc.weekday]:
-                    continue
-                if c.activityId != uc.activity:
-                    continue
-                start_time = datetime.strptime(c.from_field, "%Y-%m-%d %H:%M:%S")
-                time_matches = (
-                    start_time.hour == uc.time.hour
-                    and start_time.minute == uc.time.minute
-                )
-                if not time_matches:
-                    continue
-
-                opening_time = datetime.fromisoformat(c.bookingOpensAt)
-                # check if opening_time is too close to now (if so, it is either already booked or will not be booked)
-                if opening_time < datetime.now():
-                    continue
-                classes.append(c)
-    return classes
@@ -1,12 +1,71 @@
-from typing import Any, Callable, Optional, Union
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from enum import Enum, auto
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional, ParamSpec, TypeVar, Union
 from uuid import UUID
 
+import requests
 from pydantic import BaseModel
 
+from rezervo.consts import PROVIDER_ASYNC_MAX_WORKERS
 from rezervo.errors import AuthenticationError, BookingError
+from rezervo.providers.http_client import HttpClient
 from rezervo.schemas.config.config import ConfigValue
 from rezervo.schemas.config.user import Class, IntegrationUser
-from rezervo.schemas.schedule import RezervoClass, UserSession
+from rezervo.schemas.schedule import RezervoClass, ScheduleRecord, UserSession
+
+
+@dataclass
+class BookingAuth:
+    """
+    Provider specific credentials for booking, e.g. an iBooking token or a BRP auth result
+    """
+
+    credentials: Any
+    expires_at: Optional[datetime] = None
+
+    def is_valid_at(self, time: datetime) -> bool:
+        return self.expires_at is None or self.expires_at > time
+
+
+class BookingAttemptOutcome(Enum):
+    BOOKED = auto()
+    WAITLISTED = auto()
+    ALREADY_BOOKED = auto()
+    FULL = auto()
+    NOT_OPEN_YET = auto()
+    AUTH_EXPIRED = auto()
+    # network errors, rate limiting and upstream server errors
+    TRANSIENT = auto()
+    # any other error, which will most likely not be resolved by retrying
+    REJECTED = auto()
+
+
+SUCCESSFUL_BOOKING_ATTEMPT_OUTCOMES = {
+    BookingAttemptOutcome.BOOKED,
+    BookingAttemptOutcome.WAITLISTED,
+    BookingAttemptOutcome.ALREADY_BOOKED,
+}
+RETRYABLE_BOOKING_ATTEMPT_OUTCOMES = {
+    BookingAttemptOutcome.NOT_OPEN_YET,
+    BookingAttemptOutcome.TRANSIENT,
+}
+
+
+@dataclass
+class PreparedBooking:
+    """
+    Authenticated booking request built ahead of opening time, so only sending it remains
+    """
+
+    client: HttpClient
+    request: requests.PreparedRequest
+    classify_response: Callable[[requests.Response], BookingAttemptOutcome]
+    # notifies the user of the booking, returning whether any notification was sent
+    on_booked: Callable[[], bool]
 
 
 class Provider(BaseModel):
@@ -17,6 +76,16 @@ class Provider(BaseModel):
     find_class: Callable[
         [Class], Union[RezervoClass, BookingError, AuthenticationError]
     ]
+    find_classes: Callable[
+        [list[Class]], list[Union[RezervoClass, BookingError, AuthenticationError]]
+    ]
+    authenticate_booking: Callable[
+        [IntegrationUser, ConfigValue], Union[BookingAuth, AuthenticationError]
+    ]
+    prepare_booking: Callable[
+        [IntegrationUser, RezervoClass, ConfigValue, BookingAuth],
+        Union[PreparedBooking, BookingError],
+    ]
     book_class: Callable[
         [IntegrationUser, RezervoClass, ConfigValue],
         Union[None, BookingError, AuthenticationError],
@@ -26,4 +95,55 @@ class Provider(BaseModel):
         Union[None, BookingError, AuthenticationError],
     ]
     fetch_sessions: Callable[[Optional[UUID]], dict[UUID, list[UserSession]]]
+    fetch_schedule: Callable[[date, int], Optional[list[ScheduleRecord]]]
     rezervo_class_from_class_data: Callable[[Any], Optional[RezervoClass]]
+
+
+class AsyncProvider(BaseModel):
+    find_authed_class_by_id: Callable[
+        [IntegrationUser, ConfigValue, str],
+        Awaitable[Union[RezervoClass, BookingError, AuthenticationError]],
+    ]
+    find_class: Callable[
+        [Class], Awaitable[Union[RezervoClass, BookingError, AuthenticationError]]
+    ]
+    book_class: Callable[
+        [IntegrationUser, RezervoClass, ConfigValue],
+        Awaitable[Union[None, BookingError, AuthenticationError]],
+    ]
+    cancel_booking: Callable[
+        [IntegrationUser, RezervoClass, ConfigValue],
+        Awaitable[Union[None, BookingError, AuthenticationError]],
+    ]
+    fetch_sessions: Callable[[Optional[UUID]], Awaitable[dict[UUID, list[UserSession]]]]
+
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# provider calls still block on their requests while waiting on upstream latency, so they are
+# run here instead of on the event loop (or on the threadpool shared with the rest of the API)
+provider_executor = ThreadPoolExecutor(
+    max_workers=PROVIDER_ASYNC_MAX_WORKERS, thread_name_prefix="provider"
+)
+
+
+def run_in_provider_executor(fn: Callable[P, T]) -> Callable[P, Awaitable[T]]:
+    async def run(*args: P.args, **kwargs: P.kwargs) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            provider_executor, partial(fn, *args, **kwargs)
+        )
+
+    return run
+
+
+def async_provider_from_provider(provider: Provider) -> AsyncProvider:
+    return AsyncProvider(
+        find_authed_class_by_id=run_in_provider_executor(
+            provider.find_authed_class_by_id
+        ),
+        find_class=run_in_provider_executor(provider.find_class),
+        book_class=run_in_provider_executor(provider.book_class),
+        cancel_booking=run_in_provider_executor(provider.cancel_booking),
+        fetch_sessions=run_in_provider_executor(provider.fetch_sessions),
+    )
@@ -0,0 +1,101 @@
+import threading
+import time
+from contextlib import contextmanager
+from enum import Enum, auto
+
+from rezervo.consts import (
+    HTTP_HOST_BURST,
+    HTTP_HOST_MAX_IN_FLIGHT,
+    HTTP_HOST_RATE_PER_SECOND,
+)
+
+
+class RequestPriority(Enum):
+    NORMAL = auto()
+    # bookings, which must never wait for background requests such as session pulls
+    BOOKING = auto()
+
+
+class HostLimiter:
+    """
+    Token bucket rate limit combined with a maximum number of in-flight requests, for
+    requests to a single upstream host.
+
+    Booking requests have a reserved lane: they wait neither for tokens nor for in-flight
+    slots, as they are already bounded by the users and burst attempts of a class opening.
+    They still count towards both limits, which delays subsequent normal requests instead.
+    The token debt is capped at `burst`, so normal requests are never delayed for longer
+    than it takes to refill `burst + 1` tokens.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_in_flight: int,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate_per_second
+        )
+        self._updated_at = now
+
+    def _acquire_normal(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.in_flight >= self.max_in_flight:
+                    self._condition.wait()
+                    continue
+                if self._tokens < 1:
+                    self._condition.wait((1 - self._tokens) / self.rate_per_second)
+                    continue
+                self._tokens -= 1
+                self.in_flight += 1
+                return
+
+    def _acquire_priority(self):
+        with self._condition:
+            self._refill(time.monotonic())
+            self._tokens = max(-self.burst, self._tokens - 1)
+            self.in_flight += 1
+
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def acquire(self, priority: RequestPriority = RequestPriority.NORMAL):
+        if priority is RequestPriority.BOOKING:
+            self._acquire_priority()
+        else:
+            self._acquire_normal()
+        try:
+            yield
+        finally:
+            self._release()
+
+
+_host_limiters: dict[str, HostLimiter] = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(host: str) -> HostLimiter:
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = HostLimiter(
+                HTTP_HOST_RATE_PER_SECOND,
+                HTTP_HOST_BURST,
+                HTTP_HOST_MAX_IN_FLIGHT,
+            )
+        return _host_limiters[host]
@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, timedelta
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from rezervo.utils.logging_utils import console
+
+V = TypeVar("V")
+
+
+class ScheduleCache(Generic[V]):
+    """
+    Thread-safe TTL cache of schedule days, shared by all schedule fetches in the process.
+
+    Days are cached individually per key (e.g. business unit or studio), so overlapping
+    windows are served from days that have already been fetched. Concurrent requests for
+    days that are currently being fetched wait for that request to complete instead of
+    fetching the same days again (single-flight).
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._days: dict[tuple[Hashable, date], tuple[float, V]] = {}
+        self._in_flight: dict[tuple[Hashable, date], Future[Optional[V]]] = {}
+        SCHEDULE_CACHES.append(self)
+
+    def get(
+        self,
+        key: Hashable,
+        from_date: date,
+        days: int,
+        fetch: Callable[[date, int], dict[date, V]],
+    ) -> list[V]:
+        """
+        Retrieve `days` consecutive days starting at `from_date`, calling `fetch` with the
+        smallest window covering all days that are neither cached nor already in flight.
+
+        Days missing from the result of `fetch` are not cached, and are left out of the
+        returned list.
+        """
+        dates = [from_date + timedelta(days=i) for i in range(days)]
+        values: dict[date, V] = {}
+        awaited: dict[date, Future[Optional[V]]] = {}
+        owned: dict[date, Future[Optional[V]]] = {}
+        with self._lock:
+            now = time.monotonic()
+            for d in dates:
+                cached = self._days.get((key, d))
+                if cached is not None and cached[0] > now:
+                    values[d] = cached[1]
+                    continue
+                in_flight = self._in_flight.get((key, d))
+                if in_flight is not None:
+                    awaited[d] = in_flight
+                    continue
+                owned[d] = Future()
+                self._in_flight[(key, d)] = owned[d]
+            self.hits += len(values) + len(awaited)
+            self.misses += len(owned)
+        if len(owned) > 0:
+            self._fetch_owned(key, owned, fetch)
+        for d, future in {**owned, **awaited}.items():
+            value = future.result()
+            if value is not None:
+                values[d] = value
+        return [values[d] for d in dates if d in values]
+
+    def _fetch_owned(
+        self,
+        key: Hashable,
+        owned: dict[date, Future[Optional[V]]],
+        fetch: Callable[[date, int], dict[date, V]],
+    ):
+        first_date = min(owned.keys())
+        last_date = max(owned.keys())
+        try:
+            fetched = fetch(first_date, (last_date - first_date).days + 1)
+        except Exception as e:
+            with self._lock:
+                for d, future in owned.items():
+                    del self._in_flight[(key, d)]
+                    future.set_exception(e)
+            raise
+        with self._lock:
+            now = time.monotonic()
+            self._days = {k: v for k, v in self._days.items() if v[0] > now}
+            for d, value in fetched.items():
+                self._days[(key, d)] = (now + self.ttl_seconds, value)
+            for d, future in owned.items():
+                del self._in_flight[(key, d)]
+                future.set_result(fetched.get(d))
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
+
+
+SCHEDULE_CACHES: list[ScheduleCache] = []
+
+
+def log_schedule_cache_stats():
+    for cache in SCHEDULE_CACHES:
+        console.print(
+            f"Schedule cache '{cache.name}': {cache.hits} hits, {cache.misses} misses"
+        )
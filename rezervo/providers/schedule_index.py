@@ -0,0 +1,82 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Generic, Hashable, Iterable, Optional, TypeVar
+
+from rezervo.schemas.config.user import Class
+from rezervo.schemas.schedule import ScheduleRecord
+
+T = TypeVar("T")
+
+RecurrenceKey = tuple[int, int, int, int]
+
+
+def recurrence_key(
+    activity_id: int, weekday: int, hour: int, minute: int
+) -> RecurrenceKey:
+    return activity_id, weekday, hour, minute
+
+
+class ScheduleIndex(Generic[T]):
+    """
+    Lookup tables over a fetched schedule, built once to avoid repeated linear scans.
+
+    Classes are indexed by id, by activity and by recurrence, i.e. the activity, weekday and
+    local start time used to describe classes in user configs. Lookups preserve the order
+    of the original schedule.
+    """
+
+    def __init__(
+        self,
+        classes: Iterable[T],
+        class_id: Callable[[T], Hashable],
+        activity_id: Callable[[T], int],
+        local_start_time: Callable[[T], datetime],
+    ):
+        self.classes: list[T] = []
+        self._by_id: dict[Hashable, T] = {}
+        self._by_activity: dict[int, list[T]] = defaultdict(list)
+        self._by_recurrence: dict[RecurrenceKey, list[T]] = defaultdict(list)
+        for c in classes:
+            self.classes.append(c)
+            self._by_id[class_id(c)] = c
+            activity = activity_id(c)
+            self._by_activity[activity].append(c)
+            start_time = local_start_time(c)
+            self._by_recurrence[
+                recurrence_key(
+                    activity, start_time.weekday(), start_time.hour, start_time.minute
+                )
+            ].append(c)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def get(self, class_id: Hashable) -> Optional[T]:
+        return self._by_id.get(class_id)
+
+    def find_by_activity(self, activity_id: int) -> list[T]:
+        return self._by_activity.get(activity_id, [])
+
+    def find(self, activity_id: int, weekday: int, hour: int, minute: int) -> list[T]:
+        return self._by_recurrence.get(
+            recurrence_key(activity_id, weekday, hour, minute), []
+        )
+
+    def find_by_config(self, _class_config: Class) -> list[T]:
+        return self.find(
+            _class_config.activity,
+            _class_config.weekday,
+            _class_config.time.hour,
+            _class_config.time.minute,
+        )
+
+
+def schedule_record_index(
+    records: Iterable[ScheduleRecord],
+) -> ScheduleIndex[ScheduleRecord]:
+    return ScheduleIndex(
+        records,
+        lambda c: c.id,
+        lambda c: c.activity_id,
+        lambda c: c.start,
+    )
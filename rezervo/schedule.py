@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from rezervo.active_integrations import ACTIVE_INTEGRATIONS, get_integration
+from rezervo.consts import PLANNED_SESSIONS_NEXT_WHOLE_WEEKS, SCHEDULE_SYNC_PAST_DAYS
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.schemas.config.user import IntegrationIdentifier
+from rezervo.utils.logging_utils import err
+from rezervo.utils.time_utils import total_days_for_next_whole_weeks
+
+
+def sync_integration_schedule(integration: IntegrationIdentifier):
+    today = datetime.now().date()
+    from_date = today - timedelta(days=SCHEDULE_SYNC_PAST_DAYS)
+    to_date = today + timedelta(
+        days=total_days_for_next_whole_weeks(PLANNED_SESSIONS_NEXT_WHOLE_WEEKS)
+    )
+    classes = get_integration(integration).fetch_schedule(
+        from_date, (to_date - from_date).days
+    )
+    if classes is None:
+        err.log(
+            f"Failed to fetch {integration.value} schedule, keeping stored schedule"
+        )
+        return
+    with SessionLocal() as db:
+        crud.replace_class_schedule(db, integration, from_date, to_date, classes)
+
+
+def sync_schedules(integration: Optional[IntegrationIdentifier] = None):
+    if integration is not None:
+        sync_integration_schedule(integration)
+        return
+    for i in ACTIVE_INTEGRATIONS.keys():
+        sync_integration_schedule(i)
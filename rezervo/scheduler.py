@@ -0,0 +1,304 @@
+import heapq
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional, Union
+from uuid import UUID
+
+from rezervo import models
+from rezervo.active_integrations import ACTIVE_INTEGRATIONS
+from rezervo.booking import book_configured_class, book_configured_classes
+from rezervo.consts import (
+    SCHEDULER_CONFIG_POLL_INTERVAL_SECONDS,
+    SCHEDULER_RESOLVE_INTERVAL_SECONDS,
+)
+from rezervo.database import crud
+from rezervo.database.database import SessionLocal
+from rezervo.errors import AuthenticationError, BookingError
+from rezervo.providers.common import find_classes
+from rezervo.schemas.config.config import Cron
+from rezervo.schemas.config.user import IntegrationConfig, IntegrationIdentifier
+from rezervo.schemas.schedule import RezervoClass
+from rezervo.utils.logging_utils import console, err
+from rezervo.utils.time_utils import local_timezone
+
+# (user, integration, class config index, class id, precheck)
+BookingPlanKey = tuple[UUID, IntegrationIdentifier, int, str, bool]
+
+
+@dataclass(frozen=True, order=True)
+class BookingPlan:
+    fire_at: datetime
+    user_id: UUID = field(compare=False)
+    integration: IntegrationIdentifier = field(compare=False)
+    class_index: int = field(compare=False)
+    class_id: str = field(compare=False)
+    opening_time: datetime = field(compare=False)
+    class_start: datetime = field(compare=False)
+    precheck: bool = field(compare=False, default=False)
+
+    @property
+    def key(self) -> BookingPlanKey:
+        return (
+            self.user_id,
+            self.integration,
+            self.class_index,
+            self.class_id,
+            self.precheck,
+        )
+
+
+@dataclass
+class BookingConfig:
+    user_id: UUID
+    cron: Cron
+    integration_config: IntegrationConfig
+
+
+def load_booking_configs() -> list[BookingConfig]:
+    """
+    Load the active class configs of every integration user, along with their cron config
+    """
+    booking_configs = []
+    with SessionLocal() as db:
+        for user in db.query(models.User).all():
+            config = crud.get_user_config_by_id(db, user.id)
+            if config is None:
+                continue
+            for integration in ACTIVE_INTEGRATIONS.keys():
+                integration_config = crud.get_integration_config(
+                    db, integration, user.id
+                )
+                if (
+                    integration_config is None
+                    or not integration_config.active
+                    or integration_config.classes is None
+                ):
+                    continue
+                booking_configs.append(
+                    BookingConfig(
+                        user_id=user.id,
+                        cron=config.config.cron,
+                        integration_config=integration_config,
+                    )
+                )
+    return booking_configs
+
+
+def resolve_booking_plans(booking_configs: list[BookingConfig]) -> list[BookingPlan]:
+    """
+    Plan the booking (and precheck) of the upcoming instance of every configured class, at the
+    same times as the booking cron jobs would run
+    """
+    configs_by_integration: dict[
+        IntegrationIdentifier, list[BookingConfig]
+    ] = defaultdict(list)
+    for booking_config in booking_configs:
+        configs_by_integration[
+            IntegrationIdentifier(booking_config.integration_config.integration)
+        ].append(booking_config)
+    plans = []
+    for integration, integration_booking_configs in configs_by_integration.items():
+        # resolve the classes of all users together, such that the schedule is only loaded once
+        classes = find_classes(
+            integration,
+            [
+                class_config
+                for booking_config in integration_booking_configs
+                for class_config in booking_config.integration_config.classes
+            ],
+        )
+        offset = 0
+        for booking_config in integration_booking_configs:
+            class_count = len(booking_config.integration_config.classes)
+            plans.extend(
+                plan_classes(
+                    booking_config, integration, classes[offset : offset + class_count]
+                )
+            )
+            offset += class_count
+    return plans
+
+
+def plan_classes(
+    booking_config: BookingConfig,
+    integration: IntegrationIdentifier,
+    classes: list[Union[RezervoClass, BookingError, AuthenticationError]],
+) -> list[BookingPlan]:
+    cron_config = booking_config.cron
+    plans = []
+    for i, _class in enumerate(classes):
+        if isinstance(_class, (BookingError, AuthenticationError)):
+            err.log("Failed to fetch class info for booking schedule")
+            continue
+        opening_time = datetime.fromisoformat(_class.bookingOpensAt)
+        class_start = local_timezone().localize(
+            datetime.fromisoformat(_class.from_field)
+        )
+        plans.append(
+            BookingPlan(
+                fire_at=opening_time
+                - timedelta(minutes=cron_config.preparation_minutes),
+                user_id=booking_config.user_id,
+                integration=integration,
+                class_index=i,
+                class_id=str(_class.id),
+                opening_time=opening_time,
+                class_start=class_start,
+            )
+        )
+        if cron_config.precheck_hours is not None and cron_config.precheck_hours > 0:
+            plans.append(
+                BookingPlan(
+                    fire_at=opening_time - timedelta(hours=cron_config.precheck_hours),
+                    user_id=booking_config.user_id,
+                    integration=integration,
+                    class_index=i,
+                    class_id=str(_class.id),
+                    opening_time=opening_time,
+                    class_start=class_start,
+                    precheck=True,
+                )
+            )
+    return plans
+
+
+class BookingScheduler:
+    """
+    Long-running replacement for the per-class booking cron jobs.
+
+    Booking plans are kept in a heap ordered by fire time. Configured classes are only resolved
+    against the schedule again when configs change, when a planned class has started (to plan its
+    next instance), when `reload` is called, or at a long interval to pick up schedule changes.
+    Due plans run in their own threads within this process, reusing its pooled connections and
+    caches.
+    """
+
+    def __init__(self):
+        self._heap: list[BookingPlan] = []
+        self._started: set[BookingPlanKey] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._booking_configs: Optional[list[BookingConfig]] = None
+        self._resolve_requested = True
+        self._next_resolve_at = datetime.now().astimezone()
+
+    def reload(self):
+        self._resolve_requested = True
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _load(self, now: datetime):
+        try:
+            booking_configs = load_booking_configs()
+            if (
+                not self._resolve_requested
+                and booking_configs == self._booking_configs
+                and now < self._next_resolve_at
+            ):
+                return
+            self._resolve_requested = False
+            plans = resolve_booking_plans(booking_configs)
+        except Exception as e:
+            err.log("Failed to load booking plans, keeping current plans", e)
+            # retry at the next poll
+            self._next_resolve_at = now
+            return
+        self._booking_configs = booking_configs
+        self._next_resolve_at = min(
+            [now + timedelta(seconds=SCHEDULER_RESOLVE_INTERVAL_SECONDS)]
+            + [p.class_start for p in plans if p.class_start > now]
+        )
+        with self._lock:
+            self._heap = [
+                p
+                for p in plans
+                if p.key not in self._started
+                # skip plans that were missed, unless booking can still be attempted
+                and (p.fire_at > now or (not p.precheck and p.opening_time > now))
+            ]
+            heapq.heapify(self._heap)
+            # forget started plans for classes that are no longer planned
+            planned_keys = {p.key for p in plans}
+            self._started &= planned_keys
+        console.print(f"Loaded {len(self._heap)} booking plans")
+
+    def _pop_due(self, now: datetime) -> list[BookingPlan]:
+        due = []
+        with self._lock:
+            while len(self._heap) > 0 and self._heap[0].fire_at <= now:
+                plan = heapq.heappop(self._heap)
+                self._started.add(plan.key)
+                due.append(plan)
+        return due
+
+    def _next_fire_at(self) -> Optional[datetime]:
+        with self._lock:
+            return self._heap[0].fire_at if len(self._heap) > 0 else None
+
+    def _start(self, plan: BookingPlan):
+        console.print(
+            f"Starting {'precheck' if plan.precheck else 'booking'} of class "
+            f"{plan.class_index} for {plan.user_id} ({plan.integration.value}), "
+            f"opening at {plan.opening_time}"
+        )
+        threading.Thread(
+            target=book_configured_class,
+            args=(plan.integration, plan.user_id, plan.class_index, plan.precheck),
+            name=f"booking-{plan.integration.value}-{plan.class_id}",
+        ).start()
+
+    def _start_group(self, plans: list[BookingPlan]):
+        plan = plans[0]
+        console.print(
+            f"Starting booking of class {plan.class_id} for {len(plans)} users "
+            f"({plan.integration.value}), opening at {plan.opening_time}"
+        )
+        threading.Thread(
+            target=book_configured_classes,
+            args=(plan.integration, [(p.user_id, p.class_index) for p in plans]),
+            name=f"booking-{plan.integration.value}-{plan.class_id}",
+        ).start()
+
+    def _start_due(self, plans: list[BookingPlan]):
+        # bookings of the same class opening are sent together from a single thread group,
+        # such that all users are ready at the same instant over shared connections
+        groups: dict[
+            tuple[IntegrationIdentifier, str, datetime], list[BookingPlan]
+        ] = defaultdict(list)
+        for plan in plans:
+            if plan.precheck:
+                self._start(plan)
+                continue
+            groups[(plan.integration, plan.class_id, plan.opening_time)].append(plan)
+        for group in groups.values():
+            if len(group) == 1:
+                self._start(group[0])
+            else:
+                self._start_group(group)
+
+    def run(self):
+        next_poll_at = datetime.now().astimezone()
+        while not self._stopped.is_set():
+            now = datetime.now().astimezone()
+            if self._resolve_requested or now >= next_poll_at:
+                self._load(now)
+                next_poll_at = now + timedelta(
+                    seconds=SCHEDULER_CONFIG_POLL_INTERVAL_SECONDS
+                )
+            self._start_due(self._pop_due(now))
+            next_fire_at = self._next_fire_at()
+            wake_at = (
+                min(next_fire_at, next_poll_at)
+                if next_fire_at is not None
+                else next_poll_at
+            )
+            self._wake.wait(
+                max(0.0, (wake_at - datetime.now().astimezone()).total_seconds())
+            )
+            self._wake.clear()
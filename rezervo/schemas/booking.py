@@ -1,5 +1,15 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
 from pydantic import BaseModel
 
+from rezervo.schemas.base import OrmBase
+from rezervo.schemas.config.user import IntegrationIdentifier
+
+# outcome of successful booking runs, failed runs have the name of their error as outcome
+BOOKED_OUTCOME = "BOOKED"
+
 
 class BookingPayload(BaseModel):
     class_id: str
@@ -7,3 +17,36 @@ class BookingPayload(BaseModel):
 
 class BookingCancellationPayload(BaseModel):
     class_id: str
+
+
+class BookingTimeline(OrmBase):
+    user_id: UUID
+    integration: IntegrationIdentifier
+    class_id: Optional[str] = None
+    opening_time: Optional[datetime] = None
+    outcome: Optional[str] = None
+    started_at: datetime
+    config_loaded_at: Optional[datetime] = None
+    class_found_at: Optional[datetime] = None
+    authenticated_at: Optional[datetime] = None
+    woke_up_at: Optional[datetime] = None
+    request_sent_at: Optional[datetime] = None
+    response_received_at: Optional[datetime] = None
+    notified_at: Optional[datetime] = None
+    clock_skew_ms: Optional[int] = None
+
+
+class LatencyPercentiles(BaseModel):
+    p50: Optional[float]
+    p95: Optional[float]
+    p99: Optional[float]
+
+
+class BookingLatencyStats(BaseModel):
+    integration: IntegrationIdentifier
+    runs: int
+    booked: int
+    # time from opening until the (first) booking request was sent
+    send_delay_ms: LatencyPercentiles
+    # time from sending the (first) booking request until the booking succeeded or gave up
+    response_time_ms: LatencyPercentiles
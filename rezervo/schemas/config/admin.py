@@ -13,3 +13,5 @@ class Notifications(OrmBase):
 
 class AdminConfig(OrmBase):
     notifications: Optional[Notifications] = None
+    # access to instance-wide statistics, e.g. booking latencies
+    is_admin: bool = False
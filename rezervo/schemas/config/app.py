@@ -1,5 +1,8 @@
+import enum
 from typing import Optional
 
+from pydantic import Field
+
 from rezervo.schemas.base import OrmBase
 
 CONFIG_FILE = "config.json"
@@ -9,10 +12,23 @@ class Auth(OrmBase):
     max_attempts: int = 0
 
 
+class BookingStrategy(enum.Enum):
+    # attempts in quick succession from booking opening, then exponential backoff
+    BURST = "burst"
+    BACKOFF = "backoff"
+
+
 class Booking(OrmBase):
     timezone: str
     max_attempts: int = 10
     max_waiting_minutes: int = 60
+    # when to send the booking request relative to booking opening, negative to send it early
+    opening_offset_ms: int = 0
+    strategy: BookingStrategy = BookingStrategy.BURST
+    # number of attempts in the burst (counted towards max_attempts), and the interval between them
+    burst_attempts: int = Field(5, ge=1)
+    burst_interval_ms: int = Field(150, ge=0)
+    burst_jitter_ms: int = Field(50, ge=0)
 
 
 class Cron(OrmBase):
@@ -1,4 +1,6 @@
-from typing import Optional
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -7,6 +9,7 @@ from rezervo import models
 from rezervo.models import SessionState
 from rezervo.schemas.base import OrmBase
 from rezervo.schemas.config.user import IntegrationIdentifier
+from rezervo.utils.time_utils import local_timezone
 
 
 class RezervoInstructor(BaseModel):
@@ -35,6 +38,29 @@ class RezervoClass(BaseModel):
         allow_population_by_field_name = True
 
 
+@dataclass(frozen=True, slots=True)
+class ScheduleRecord:
+    """
+    Compact representation of a scheduled class, used when handling whole schedules.
+
+    Timestamps are parsed once on ingestion. Records are converted to `RezervoClass` at the
+    API and database boundaries.
+    """
+
+    integration: IntegrationIdentifier
+    id: int
+    name: str
+    activity_id: int
+    start: datetime  # timezone aware, in local time
+    end: datetime  # timezone aware, in local time
+    studio_id: int
+    studio_name: str
+    instructors: tuple[str, ...]
+    user_status: Optional[str]
+    bookable: bool
+    booking_opens_at: datetime  # timezone aware
+
+
 class RezervoDay(BaseModel):
     dayName: str
     date: str
@@ -59,6 +85,8 @@ class UserSession(OrmBase):
     user_id: UUID
     status: SessionState
     class_data: RezervoClass
+    booking_reference: Optional[str] = None
+    booking_type: Optional[str] = None
 
 
 class UserNameSessionStatus(BaseModel):
@@ -76,4 +104,66 @@ def session_model_from_user_session(user_session: UserSession):
         status=user_session.status,
         class_data=data,
         integration=user_session.integration,
+        booking_reference=user_session.booking_reference,
+        booking_type=user_session.booking_type,
+    )
+
+
+def local_iso_from_datetime(dt: datetime) -> str:
+    return dt.replace(tzinfo=None).isoformat(sep=" ")
+
+
+def rezervo_class_from_schedule_record(record: ScheduleRecord) -> RezervoClass:
+    return RezervoClass(
+        integration=record.integration,
+        id=record.id,
+        name=record.name,
+        activityId=record.activity_id,
+        from_field=local_iso_from_datetime(record.start),
+        to=local_iso_from_datetime(record.end),
+        instructors=[RezervoInstructor(name=name) for name in record.instructors],
+        studio=RezervoStudio(id=record.studio_id, name=record.studio_name),
+        userStatus=record.user_status,
+        bookable=record.bookable,
+        bookingOpensAt=record.booking_opens_at.isoformat(),
+    )
+
+
+def schedule_record_from_class_data(class_data: dict[str, Any]) -> ScheduleRecord:
+    tz = local_timezone()
+    start = tz.localize(datetime.fromisoformat(class_data["from_field"]))
+    booking_opens_at = datetime.fromisoformat(class_data["bookingOpensAt"])
+    return ScheduleRecord(
+        integration=IntegrationIdentifier(class_data["integration"]),
+        id=class_data["id"],
+        name=class_data["name"],
+        activity_id=class_data["activityId"],
+        start=start,
+        end=tz.localize(datetime.fromisoformat(class_data["to"])),
+        studio_id=class_data["studio"]["id"],
+        studio_name=class_data["studio"]["name"],
+        instructors=tuple(i["name"] for i in class_data["instructors"]),
+        user_status=class_data["userStatus"],
+        # bookable status is only valid at the time of fetching, so it must be refreshed
+        bookable=booking_opens_at <= datetime.now().astimezone() < start,
+        booking_opens_at=booking_opens_at,
+    )
+
+
+def class_schedule_model_from_schedule_record(record: ScheduleRecord):
+    data = rezervo_class_from_schedule_record(record).dict()
+    data["integration"] = record.integration.value
+    return models.ClassSchedule(
+        integration=record.integration,
+        class_id=str(record.id),
+        start_date=record.start.date(),
+        class_data=data,
+    )
+
+
+def rezervo_class_from_class_schedule_model(
+    class_schedule: models.ClassSchedule,
+) -> RezervoClass:
+    return rezervo_class_from_schedule_record(
+        schedule_record_from_class_data(class_schedule.class_data)
     )
@@ -1,16 +1,35 @@
+import asyncio
 from typing import Optional
 from uuid import UUID
 
-from rezervo.active_integrations import ACTIVE_INTEGRATIONS, get_integration
+from rezervo.active_integrations import (
+    ACTIVE_INTEGRATIONS,
+    get_async_integration,
+    get_integration,
+)
 from rezervo.database import crud
 from rezervo.database.database import SessionLocal
 from rezervo.schemas.config.user import IntegrationIdentifier
+from rezervo.schemas.schedule import UserSession
 
 
 def pull_integration_sessions(
     integration: IntegrationIdentifier, user_id: Optional[UUID] = None
 ):
     sessions = get_integration(integration).fetch_sessions(user_id)
+    store_integration_sessions(integration, sessions)
+
+
+async def pull_integration_sessions_async(
+    integration: IntegrationIdentifier, user_id: Optional[UUID] = None
+):
+    sessions = await get_async_integration(integration).fetch_sessions(user_id)
+    await asyncio.to_thread(store_integration_sessions, integration, sessions)
+
+
+def store_integration_sessions(
+    integration: IntegrationIdentifier, sessions: dict[UUID, list[UserSession]]
+):
     with SessionLocal() as db:
         for uid, user_sessions in sessions.items():
             crud.upsert_user_integration_sessions(db, uid, integration, user_sessions)
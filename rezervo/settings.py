@@ -20,6 +20,8 @@ class Settings(BaseSettings):
     JWT_ISSUER: str | None = None
 
     CRON_JOB_COMMENT_PREFIX: str = "rezervo"
+    # Book classes with the long-running `rezervo scheduler` instead of per-class cron jobs
+    BOOKING_SCHEDULER_ENABLED: bool = False
 
     AUTH0_MANAGEMENT_API_CLIENT_ID: str | None = None
     AUTH0_MANAGEMENT_API_CLIENT_SECRET: str | None = None
@@ -27,6 +29,11 @@ class Settings(BaseSettings):
     WEB_PUSH_EMAIL: str | None = None
     WEB_PUSH_PRIVATE_KEY: str | None = None
 
+    # Upstream base urls, e.g. to point providers at a local fake upstream (`rezervo fake-upstream serve`)
+    IBOOKING_WEBSITE_BASE_URL: str = "https://www.sit.no"
+    IBOOKING_API_BASE_URL: str = "https://ibooking.sit.no"
+    BRP_BASE_URL_TEMPLATE: str = "https://{subdomain}.brpsystems.com"
+
     class Config:
         env_file = find_dotenv(".env")
         env_file_encoding = "utf-8"
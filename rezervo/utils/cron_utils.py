@@ -8,9 +8,10 @@ from crontab import CronItem, CronTab
 
 from rezervo import models
 from rezervo.errors import AuthenticationError, BookingError
-from rezervo.providers.common import find_class
+from rezervo.providers.common import find_classes
 from rezervo.schemas.config.config import Config, Cron
 from rezervo.schemas.config.user import Class, IntegrationConfig, IntegrationIdentifier
+from rezervo.schemas.schedule import RezervoClass
 from rezervo.settings import get_settings
 
 
@@ -28,26 +29,34 @@ def build_cron_jobs_from_config(
     if not integration_config.active or integration_config.classes is None:
         return []
     jobs = []
-    for i, c in enumerate(integration_config.classes):
+    classes = find_classes(
+        IntegrationIdentifier(integration_config.integration),
+        integration_config.classes,
+    )
+    for i, (c, _class) in enumerate(zip(integration_config.classes, classes)):
+        if isinstance(_class, BookingError) or isinstance(_class, AuthenticationError):
+            print("Failed to fetch class info for booking schedule")
+            continue
         if (
             conf.config.cron.precheck_hours is not None
             and conf.config.cron.precheck_hours > 0
         ):
-            p = build_cron_job_for_class(
-                i,
-                c,
-                integration_config.integration,
-                conf.config.cron,
-                user,
-                precheck=True,
+            jobs.append(
+                build_cron_job_for_class(
+                    i,
+                    c,
+                    _class,
+                    integration_config.integration,
+                    conf.config.cron,
+                    user,
+                    precheck=True,
+                )
+            )
+        jobs.append(
+            build_cron_job_for_class(
+                i, c, _class, integration_config.integration, conf.config.cron, user
             )
-            if p is not None:
-                jobs.append(p)
-        j = build_cron_job_for_class(
-            i, c, integration_config.integration, conf.config.cron, user
         )
-        if j is not None:
-            jobs.append(j)
     return jobs
 
 
@@ -60,6 +69,7 @@ def build_cron_comment_prefix_for_user_integration(
 def build_cron_job_for_class(
     index: int,
     _class_config: Class,
+    _class: RezervoClass,
     integration: IntegrationIdentifier,
     cron_config: Cron,
     user: models.User,
@@ -73,12 +83,6 @@ def build_cron_job_for_class(
         f"{_class_config.display_name}{' --- [precheck]' if precheck else ''}",
         pre_comment=True,
     )
-    _class = find_class(IntegrationIdentifier(integration), _class_config)
-    if isinstance(_class, BookingError) or isinstance(
-        _class_config, AuthenticationError
-    ):
-        print("Failed to fetch class info for booking schedule")
-        return None
     j.setall(
         *generate_booking_schedule(
             datetime.fromisoformat(_class.bookingOpensAt),
@@ -141,6 +145,13 @@ def generate_pull_sessions_command(cron_config: Cron) -> str:
     )
 
 
+def generate_sync_schedule_command(cron_config: Cron) -> str:
+    return (
+        f"cd {cron_config.rezervo_dir} || exit 1; "
+        f"{cron_config.python_path}/rezervo schedule sync >> {cron_config.log_path} 2>&1"
+    )
+
+
 def upsert_booking_crontab(
     config: Config, integration_config: IntegrationConfig, user: models.User
 ):
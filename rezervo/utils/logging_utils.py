@@ -1,3 +1,6 @@
+import threading
+from contextlib import nullcontext
+
 from rich.console import Console
 
 err = Console(stderr=True, style="bold red")
@@ -6,4 +9,9 @@ console = Console()
 
 
 def stat(message: str, spinner: str = "bouncingBall"):
+    # only one status can be displayed at a time, so other threads (e.g. concurrent bookings
+    # in the scheduler) print the message instead
+    if threading.current_thread() is not threading.main_thread():
+        console.print(message)
+        return nullcontext()
     return console.status(message, spinner=spinner)
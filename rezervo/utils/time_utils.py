@@ -1,4 +1,44 @@
 import datetime
+import time
+from functools import lru_cache
+
+import pytz
+
+from rezervo.consts import LOCAL_TIMEZONE, PRECISE_TIMER_SPIN_NS
+
+
+@lru_cache
+def get_timezone(name: str) -> datetime.tzinfo:
+    return pytz.timezone(name)
+
+
+def local_timezone():
+    return get_timezone(LOCAL_TIMEZONE)
+
+
+def monotonic_ns_at(target: datetime.datetime) -> int:
+    """
+    Convert a wall-clock time to a `time.monotonic_ns` deadline, which is unaffected by later
+    changes to the system clock
+    """
+    now_ns = time.monotonic_ns()
+    delta = target - datetime.datetime.now(datetime.timezone.utc)
+    return now_ns + round(delta.total_seconds() * 1e9)
+
+
+def sleep_until_monotonic_ns(deadline_ns: int):
+    """
+    Sleep coarsely until shortly before the deadline, and then busy-wait until it is reached,
+    to avoid oversleeping by up to a scheduler time slice
+    """
+    while True:
+        remaining_ns = deadline_ns - time.monotonic_ns()
+        if remaining_ns <= PRECISE_TIMER_SPIN_NS:
+            break
+        time.sleep((remaining_ns - PRECISE_TIMER_SPIN_NS) / 1e9)
+    while time.monotonic_ns() < deadline_ns:
+        # yield, to not hold the GIL while other threads send requests
+        time.sleep(0)
 
 
 def readable_seconds(s: float):